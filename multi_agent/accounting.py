@@ -0,0 +1,208 @@
+import os
+import json
+import logging
+import threading
+import weakref
+
+from strands.hooks import HookProvider, HookRegistry, AfterInvocationEvent
+
+from opentelemetry import metrics
+
+from loginManager import decode_jwt_claims
+from structured_response import error_envelope
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))        # input + output tokens per session, 0 = no budget
+SESSION_COST_BUDGET = float(os.getenv("SESSION_COST_BUDGET", "0"))        # USD per session, 0 = no budget
+BUDGET_DEGRADE_RATIO = float(os.getenv("BUDGET_DEGRADE_RATIO", "0.8"))    # above it, the turns run in the cheaper mode
+ACCOUNTING_USER_ATTRIBUTE = os.getenv("ACCOUNTING_USER_ATTRIBUTE", "false").lower() == "true"  # user as metric attribute (cardinality)
+
+# model id => [USD per 1M input tokens, USD per 1M output tokens], e.g. {"amazon.nova-pro-v1:0": [0.8, 3.2]}
+MODEL_PRICES = json.loads(os.getenv("MODEL_PRICES", "{}"))
+CACHE_READ_PRICE_RATIO = 0.1    # of the input price
+CACHE_WRITE_PRICE_RATIO = 1.25  # of the input price
+
+# Bedrock usage field => accounting field
+USAGE_FIELDS = {
+    "inputTokens": "input",
+    "outputTokens": "output",
+    "cacheReadInputTokens": "cache_read",
+    "cacheWriteInputTokens": "cache_write",
+}
+COUNTERS = tuple(USAGE_FIELDS.values()) + ("model_calls",)
+
+# Metrics
+meter = metrics.get_meter(__name__)
+tokens_counter = meter.create_counter("llm.tokens", description="Model tokens by agent, model and type (input, output, cache_read, cache_write)")
+model_calls_counter = meter.create_counter("llm.model_calls", description="Model calls (event loop cycles) by agent and model")
+cost_counter = meter.create_counter("llm.cost", unit="USD", description="Estimated model cost by agent and model")
+turn_tokens_histogram = meter.create_histogram("llm.turn.tokens", description="Input + output tokens of one user turn, all agents")
+budget_counter = meter.create_counter("llm.budget.decisions", description="Turns degraded or refused by the session budget")
+
+def token_user(token: str) -> str:
+    """
+    The user of a jwt (sub or username claim), for the attribution.
+    """
+    if not token:
+        return "unknown"
+    claims = decode_jwt_claims(token)
+    return str(claims.get("sub") or claims.get("username") or "unknown")
+
+def cost_of(model_id: str, usage: dict) -> float:
+    prices = MODEL_PRICES.get(model_id)
+    if not prices:
+        return 0.0
+    price_in, price_out = prices
+    return (usage.get("input", 0) * price_in
+            + usage.get("output", 0) * price_out
+            + usage.get("cache_read", 0) * price_in * CACHE_READ_PRICE_RATIO
+            + usage.get("cache_write", 0) * price_in * CACHE_WRITE_PRICE_RATIO) / 1_000_000
+
+def snapshot(event_loop_metrics) -> dict:
+    """
+    Usage and model calls of an agent, from its event loop metrics.
+    """
+    accumulated = getattr(event_loop_metrics, "accumulated_usage", None) or {}
+    usage = {field: int(accumulated.get(key, 0) or 0) for key, field in USAGE_FIELDS.items()}
+    usage["model_calls"] = int(getattr(event_loop_metrics, "cycle_count", 0) or 0)
+    return usage
+
+def model_id_of(model) -> str:
+    try:
+        return model.get_config().get("model_id", "unknown")
+    except Exception:
+        return "unknown"
+
+class TurnUsage:
+    """
+    Tokens, model calls and cost of one user turn, across the main agent and every nested sub-agent.
+    Passed down (by reference) through the invocation state.
+    """
+
+    def __init__(self, session_id: str = None, user: str = "unknown"):
+        self.session_id = session_id or "default"
+        self.user = user
+        self.agents = {}
+        self._lock = threading.Lock()
+
+    def add(self, agent_name: str, model_id: str, usage: dict) -> None:
+        cost = cost_of(model_id, usage)
+        with self._lock:
+            entry = self.agents.setdefault(agent_name, dict.fromkeys(COUNTERS, 0) | {"model": model_id, "cost": 0.0})
+            for field in COUNTERS:
+                entry[field] += usage.get(field, 0)
+            entry["cost"] += cost
+
+        attributes = {"agent": agent_name, "model": model_id}
+        if ACCOUNTING_USER_ATTRIBUTE:
+            attributes["user"] = self.user
+        for field in USAGE_FIELDS.values():
+            if usage.get(field):
+                tokens_counter.add(usage[field], attributes | {"type": field})
+        model_calls_counter.add(usage.get("model_calls", 0), attributes)
+        cost_counter.add(cost, attributes)
+
+    def add_metrics(self, agent_name: str, model_id: str, event_loop_metrics) -> None:
+        self.add(agent_name, model_id, snapshot(event_loop_metrics))
+
+    def totals(self) -> dict:
+        with self._lock:
+            totals = dict.fromkeys(COUNTERS, 0) | {"cost": 0.0}
+            for entry in self.agents.values():
+                for field in totals:
+                    totals[field] += entry[field]
+            return totals
+
+def get_turn_usage(invocation_state: dict):
+    if not invocation_state:
+        return None
+    return invocation_state.get("usage")
+
+def session_usage(agent) -> dict:
+    """
+    Totals of the session of the (main) agent, kept in the agent state so they are persisted with the session.
+    """
+    return agent.state.get("usage") or dict.fromkeys(COUNTERS, 0) | {"cost": 0.0, "turns": 0}
+
+def check_budget(agent) -> str:
+    """
+    ok, degrade (near the session budget, run the turn in the cheaper mode) or refuse (budget exceeded).
+    """
+    usage = session_usage(agent)
+    ratios = []
+    if SESSION_TOKEN_BUDGET > 0:
+        ratios.append((usage["input"] + usage["output"]) / SESSION_TOKEN_BUDGET)
+    if SESSION_COST_BUDGET > 0:
+        ratios.append(usage["cost"] / SESSION_COST_BUDGET)
+
+    ratio = max(ratios, default=0.0)
+    if ratio >= 1.0:
+        decision = "refuse"
+    elif ratio >= BUDGET_DEGRADE_RATIO:
+        decision = "degrade"
+    else:
+        return "ok"
+
+    budget_counter.add(1, {"decision": decision})
+    return decision
+
+def check_degrade_tier(default_model: str, lite_model: str) -> bool:
+    """
+    Warn when a session budget is set but the lite tier is the default model: a degraded turn then only
+    switches to the template render mode, it is not cheaper per token.
+    """
+    if (SESSION_TOKEN_BUDGET > 0 or SESSION_COST_BUDGET > 0) and lite_model == default_model:
+        logger.warning(f"A session budget is set but the lite tier is the default model ({default_model}), "
+                       "set MODEL_ID_LITE to a cheaper model for the degraded turns")
+        return False
+    return True
+
+def budget_response(agent) -> str:
+    usage = session_usage(agent)
+    return error_envelope("BUDGET_EXCEEDED",
+                          f"The session budget is exhausted ({usage['input'] + usage['output']} tokens, ${usage['cost']:.4f}), please start a new session")
+
+# main agent => (usage of the current turn, main agent snapshot at the start of the turn)
+_turns = weakref.WeakKeyDictionary()
+
+def start_turn(agent, usage: TurnUsage) -> None:
+    _turns[agent] = (usage, snapshot(agent.event_loop_metrics))
+
+class UsageHook(HookProvider):
+    """
+    Close the turn accounting at the end of each main agent invocation: add the main agent usage,
+    update the session totals in the agent state (before the session is synced) and log the turn.
+    """
+
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(AfterInvocationEvent, self.end_turn)
+
+    def end_turn(self, event: AfterInvocationEvent) -> None:
+        agent = event.agent
+        turn = _turns.pop(agent, None)
+        if turn is None:
+            return
+        usage, baseline = turn
+
+        # the main agent metrics are cumulative across its turns, keep the delta (or all, when they were reset)
+        current = snapshot(agent.event_loop_metrics)
+        if any(current[field] < baseline[field] for field in COUNTERS):
+            baseline = dict.fromkeys(COUNTERS, 0)
+        usage.add(agent.name, model_id_of(agent.model), {field: current[field] - baseline[field] for field in COUNTERS})
+
+        totals = usage.totals()
+        turn_tokens_histogram.record(totals["input"] + totals["output"])
+
+        session = session_usage(agent)
+        for field in totals:
+            session[field] += totals[field]
+        session["turns"] += 1
+        session["user"] = usage.user
+        agent.state.set("usage", session)
+
+        logger.info(f"turn usage - session: {usage.session_id} user: {usage.user} "
+                    f"input: {totals['input']} output: {totals['output']} cache_read: {totals['cache_read']} "
+                    f"model_calls: {totals['model_calls']} cost: ${totals['cost']:.6f} - by agent: {usage.agents}")
@@ -0,0 +1,81 @@
+import time
+import logging
+
+from strands.hooks import (HookProvider, 
+                           HookRegistry, 
+                           AfterInvocationEvent, 
+                           AfterToolCallEvent, 
+                           BeforeInvocationEvent, 
+                           BeforeToolCallEvent
+)
+
+from deadline import get_deadline
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ToolValidationError(Exception):
+    """Custom exception to abort tool calls immediately."""
+    pass
+
+# Agent hook setup
+class AgentHook(HookProvider):
+
+    def __init__(self, uncounted_tools: set = None):
+        self.start_agent = ""
+        self.uncounted_tools = uncounted_tools or set()
+        self.tool_name = "unknown"
+        self.tool_calls = 0
+        self.last_result = None  # result of the last counted (MCP) tool call
+        self.metrics = {}
+
+    # Register hooks
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(BeforeInvocationEvent, self.agent_start)
+        registry.add_callback(AfterInvocationEvent, self.agent_end)
+        registry.add_callback(BeforeToolCallEvent, self.before_tool)
+        registry.add_callback(AfterToolCallEvent, self.after_tool)
+
+    # Hook implementations start (get time, log tool usage, collect metrics, etc.)
+    def agent_start(self, event: BeforeInvocationEvent) -> None:
+        logger.info(f" *** BeforeInvocationEvent **** ")
+        self.start_agent = time.time()
+        logger.info(f"Request started - Agent: {event.agent.name} : { self.start_agent }")
+
+    # Hook implementations end (get time, log tool usage, collect metrics, etc.)
+    def agent_end(self, event: AfterInvocationEvent) -> None:
+        logger.info(f" *** AfterInvocationEvent **** ")
+
+        duration = time.time() - self.start_agent
+
+        logger.info(f"Request completed - Agent: {event.agent.name} - Duration: {duration:.2f}s")
+        
+        self.metrics["total_requests"] = self.metrics.get("total_requests", 0) + 1
+        self.metrics["avg_duration"] = (
+            self.metrics.get("avg_duration", 0) * 0.9 + duration * 0.1 # Exponencial Moving Average 
+        )
+
+        logger.info(f" *** *** self.metrics *** *** ")
+        logger.info(f" {self.metrics}")
+        logger.info(f" *** *** self.metrics *** *** ")
+
+    def before_tool(self, event: BeforeToolCallEvent) -> None:
+        logger.info(f"*** Tool invocation - agent: {event.agent.name} : { event.tool_use.get('name') } *** ")
+        
+        if event.tool_use.get("name") not in self.uncounted_tools:
+            self.tool_calls += 1
+        if self.tool_calls > 3:
+            raise ToolValidationError("Too many tool calls, aborting to avoid loop")
+
+        # do not start a tool when the request is out of budget
+        deadline = get_deadline(event.invocation_state)
+        if deadline is not None:
+            deadline.check(f"tool {event.tool_use.get('name')}")
+        
+    def after_tool(self, event: AfterToolCallEvent) -> None:
+        logger.info(f" *** AfterToolCallEvent **** ")
+        
+        self.tool_name = event.tool_use.get("name")
+        logger.info(f"* Tool completed - agent: {event.agent.name} : {self.tool_name}")
+        if self.tool_name not in self.uncounted_tools:
+            self.last_result = event.result
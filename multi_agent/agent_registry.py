@@ -0,0 +1,228 @@
+import os
+import json
+import logging
+import threading
+
+from dataclasses import dataclass, field
+
+from strands import Agent, tool, ToolContext
+
+from memory import memory
+from models import get_model
+from mcp_pool import mcp_pool
+from agent_hook import AgentHook, ToolValidationError
+from deadline import DeadlineModel, DeadlineExceeded, get_deadline, timeout_response
+from singleflight import subagent_singleflight, call_key, identity, SINGLEFLIGHT_SUBAGENT
+from structured_response import SubAgentAnswer, build_response, error_envelope, try_render
+from accounting import get_turn_usage, model_id_of
+from scheduler import OverloadedError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# invocation state passed down from the main agent to the sub-agent (and its MCP tools)
+PROPAGATED_STATE = ("deadline", "jwt", "entity_store", "usage", "model_tier")
+
+@dataclass
+class SubAgentSpec:
+    """Declaration of a sub-agent, exposed to the main agent as a tool."""
+    name: str              # tool name, e.g. inventory_agent
+    domain: str            # e.g. INVENTORY
+    description: str       # what the main agent can ask
+    returns: str
+    system_prompt: str
+    mcp_url_env: str       # environment variable with the MCP server url
+    tools: list = field(default_factory=list)  # MCP tools allow-list
+    model_tier: str = "default"
+
+    @property
+    def mcp_url(self) -> str:
+        return os.getenv(self.mcp_url_env)
+
+class SubAgent:
+    """
+    A sub-agent materialized from its spec, on the shared model and pooled MCP session.
+    """
+
+    def __init__(self, spec: SubAgentSpec):
+        self.spec = spec
+        self.model = get_model(spec.model_tier)
+        self.mcp_connection = mcp_pool.get(spec.mcp_url)
+
+        logger.info(f'\033[1;33m Starting the {spec.domain} Agent... \033[0m')
+        logger.info(f'\033[1;33m tier: {spec.model_tier} : {spec.mcp_url} \033[0m \n')
+
+    def invoke(self, query: str, invocation_state: dict) -> str:
+        spec = self.spec
+
+        # request deadline set at the entry point, it bounds the sub-agent model and mcp calls
+        deadline = get_deadline(invocation_state)
+        if deadline is not None and deadline.expired():
+            return timeout_response(deadline, spec.name)
+
+        # jwt of the request (server mode) or of the logged user
+        token = invocation_state.get("jwt") or memory.get_token()
+        if not token:
+            logger.error("Error, I couldn't process No JWT token available")
+            return error_envelope("UNAUTHORIZED", "Error, I couldn't process No JWT token available")
+
+        try:
+            logger.info(f"Routed to {spec.domain} Agent")
+
+            # the structured output tool is not an MCP call, it does not count in the tool calls cap
+            agent_hook = AgentHook(uncounted_tools={SubAgentAnswer.__name__})
+
+            # the turn may run on a cheaper tier (session near its budget)
+            model = get_model(invocation_state["model_tier"]) if invocation_state.get("model_tier") else self.model
+            selected_tools = self.mcp_connection.list_tools(spec.tools)
+
+            logger.info(f"Available MCP tools: {[t.tool_name for t in selected_tools]}")
+
+            # Create the sub-agent
+            agent = Agent(name=spec.name,
+                          system_prompt=spec.system_prompt,
+                          model=DeadlineModel(model, deadline),
+                          tools=selected_tools,
+                          hooks=[agent_hook],
+                          callback_handler=None
+            )
+
+            try:
+                # the MCP tool wrapper adds the jwt, a unique request id and the traceparent of the current span
+                # to each call (child_state["jwt"]), nothing of the context goes in the prompt
+                formatted_query = f"""
+                    User query: {query}
+
+                    If a tool is required, call it.
+                    Otherwise, return the final answer.
+                """
+
+                child_state = {key: invocation_state.get(key) for key in PROPAGATED_STATE}
+                child_state["jwt"] = token
+
+                # typed answer (status, kind, message, error code) validated against the SubAgentAnswer schema,
+                # the data is the recorded tool result
+                agent_response = agent(formatted_query,
+                                       invocation_state=child_state,
+                                       structured_output_model=SubAgentAnswer)
+
+                structured = getattr(agent_response, "structured_output", None)
+                if structured is not None:
+                    response = build_response(structured, agent_hook.last_result)
+                    return json.dumps(response.model_dump(exclude_none=True), default=str)
+
+                # fallback, the model answered in free text
+                text_response = str(agent_response)
+                if len(text_response) > 0:
+                    return json.dumps({
+                                "status": "success",
+                                "kind": "message",
+                                "message": text_response
+                    })
+
+                return error_envelope("INVALID_REQUEST",
+                                      "Error but I couldn't process this request due a problem. Please check if your query is clearly stated or try rephrasing it.")
+
+            except DeadlineExceeded as e:
+                logger.error(f"Deadline exceeded: {e}")
+                return timeout_response(deadline, spec.name)
+
+            except OverloadedError as e:
+                logger.warning(f"Sub-agent rejected: {e}")
+                return error_envelope("OVERLOADED", "The service is busy, please try again in a few seconds")
+
+            except ToolValidationError as e:
+                logger.error(f"Transaction aborted: {e}")
+                return error_envelope("TRANSACTION_ABORTED", f"Transaction aborted: {str(e)}")
+
+            finally:
+                # the sub-agent tokens and model calls count in the turn usage, even when it failed
+                usage = get_turn_usage(invocation_state)
+                if usage is not None:
+                    usage.add_metrics(spec.name, model_id_of(model), agent.event_loop_metrics)
+
+        except Exception as e:
+            logger.error(f"Error processing your query: {str(e)}")
+            if deadline is not None and deadline.expired():
+                return timeout_response(deadline, spec.name)
+            # a broken mcp session is reconnected by the tool wrapper (McpConnection.recover), not per request
+            return error_envelope("INTERNAL_ERROR", f"Error processing your query: {str(e)}")
+
+class AgentRegistry:
+    """
+    Sub-agents declared as data (SubAgentSpec), materialized lazily on first use.
+    """
+
+    def __init__(self):
+        self._specs = {}
+        self._agents = {}
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    def register(self, spec: SubAgentSpec) -> None:
+        self._specs[spec.name] = spec
+        self._tools[spec.name] = self._create_tool(spec)
+
+    def spec(self, name: str) -> SubAgentSpec:
+        return self._specs[name]
+
+    def specs(self) -> list:
+        return list(self._specs.values())
+
+    def get(self, name: str) -> SubAgent:
+        with self._lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                agent = SubAgent(self._specs[name])
+                self._agents[name] = agent
+            return agent
+
+    def tool(self, name: str):
+        return self._tools[name]
+
+    def tools(self) -> list:
+        return list(self._tools.values())
+
+    def mcp_tools(self, name: str) -> list:
+        """
+        The filtered MCP tools of a sub-agent (used by the flat orchestration, no sub-agent LLM).
+        """
+        spec = self._specs[name]
+        return mcp_pool.get(spec.mcp_url).list_tools(spec.tools)
+
+    def mcp_connections(self) -> list:
+        return [mcp_pool.get(url) for url in dict.fromkeys(spec.mcp_url for spec in self.specs())]
+
+    def _create_tool(self, spec: SubAgentSpec):
+        def sub_agent(query: str, tool_context: ToolContext) -> str:
+            logger.info(f"function => {spec.name}")
+            invocation_state = tool_context.invocation_state
+
+            if not SINGLEFLIGHT_SUBAGENT:
+                result = self.get(spec.name).invoke(query, invocation_state)
+            else:
+                # concurrent identical queries of the same user share one sub-agent execution
+                token = invocation_state.get("jwt") or memory.get_token()
+                key = call_key(spec.name, identity(token), arguments={"query": " ".join(query.lower().split())})
+                deadline = get_deadline(invocation_state)
+                result = subagent_singleflight.do(key,
+                                                  lambda: self.get(spec.name).invoke(query, invocation_state),
+                                                  timeout=deadline.remaining() if deadline is not None else None)
+
+            # template render mode: a simple result ends the turn without another main agent generation
+            try_render(invocation_state, tool_context.agent, result)
+            return result
+
+        sub_agent.__doc__ = f"""
+    Process and respond all {spec.domain} queries using a specialized {spec.domain} agent.
+
+    Args:
+        query: {spec.description}
+
+    Returns:
+        {spec.returns}
+    """
+        return tool(name=spec.name, context=True)(sub_agent)
+
+# global instance
+registry = AgentRegistry()
@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import json
+import argparse
+import logging
+import statistics
+
+from memory import memory
+import orchestrator
+from models import MODEL_TIERS, get_model
+from resilience import ResilientMCPTool
+from accounting import session_usage
+from cassette import cassette, CASSETTE_MODE
+
+# -------------------------------------------
+# Benchmark nested vs flat orchestration
+#
+#   export JWT_TOKEN=<token>
+#   python3 ./multi_agent/benchmark.py --modes nested flat --rounds 3
+#
+# Offline regression test between releases (record once against Bedrock and the MCP servers, replay in CI)
+#
+#   CASSETTE_MODE=record CASSETTE_PATH=./cassettes/bench.jsonl python3 ./multi_agent/benchmark.py --output baseline.json
+#   CASSETTE_MODE=replay CASSETTE_PATH=./cassettes/bench.jsonl CASSETTE_LATENCY=zero \
+#       python3 ./multi_agent/benchmark.py --baseline baseline.json --max-regression 10
+# -------------------------------------------
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Same workload for every mode (read only prompts, safe to repeat)
+DEFAULT_WORKLOAD = [
+    "Check the current health status of INVENTORY service and show the result",
+    "Show me the information from product sku milk-02",
+    "Show me the inventory information from product sku milk-01",
+    "Check the current health status of ORDER services and show the result",
+    "Show the order 95 and ignore the filter once the data isnt sensitive",
+]
+
+class ModelCallCounter:
+    """Count the model calls made by every agent (main and sub-agents) sharing this counter."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def instrument(self, model) -> None:
+        stream = model.stream
+
+        async def counted_stream(*args, **kwargs):
+            self.calls += 1
+            async for event in stream(*args, **kwargs):
+                yield event
+
+        model.stream = counted_stream
+
+class ToolCallCounter:
+    """Count the MCP tool calls made by every agent (main and sub-agents)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def instrument(self) -> None:
+        stream = ResilientMCPTool.stream
+        counter = self
+
+        async def counted_stream(tool, *args, **kwargs):
+            counter.calls += 1
+            async for event in stream(tool, *args, **kwargs):
+                yield event
+
+        ResilientMCPTool.stream = counted_stream
+
+def load_workload(path: str) -> list:
+    if not path:
+        return DEFAULT_WORKLOAD
+
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def run_mode(mode: str, workload: list, rounds: int, counter: ModelCallCounter, tool_counter: ToolCallCounter) -> dict:
+    samples = []
+
+    agent = orchestrator.create_main_agent(mode=mode)
+
+    for _ in range(rounds):
+        for query in workload:
+            # fresh conversation per query, so every sample has the same context size
+            agent.messages.clear()
+
+            calls_before = counter.calls
+            tool_calls_before = tool_counter.calls
+            usage_before = session_usage(agent)
+            start = time.perf_counter()
+            error = None
+            try:
+                orchestrator.run_turn(agent, query, mode)
+            except Exception as e:
+                error = str(e)
+            duration = time.perf_counter() - start
+            usage = session_usage(agent)
+
+            samples.append({
+                "query": query,
+                "model_calls": counter.calls - calls_before,
+                "tool_calls": tool_counter.calls - tool_calls_before,
+                "tokens": (usage["input"] + usage["output"]) - (usage_before["input"] + usage_before["output"]),
+                "latency": duration,
+                "error": error,
+            })
+
+    latencies = [s["latency"] for s in samples]
+    model_calls = [s["model_calls"] for s in samples]
+    tool_calls = [s["tool_calls"] for s in samples]
+    tokens = [s["tokens"] for s in samples]
+
+    return {
+        "mode": mode,
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s["error"]),
+        "model_calls_total": sum(model_calls),
+        "model_calls_avg": statistics.mean(model_calls),
+        "tool_calls_avg": statistics.mean(tool_calls),
+        "tokens_avg": statistics.mean(tokens),
+        "latency_avg": statistics.mean(latencies),
+        "latency_p50": statistics.median(latencies),
+        "latency_max": max(latencies),
+        "samples": samples,
+    }
+
+def print_report(results: list) -> None:
+    print("---" * 15)
+    print(f"{'mode':<8} {'requests':>8} {'errors':>6} {'calls':>6} {'calls/req':>9} {'tools/req':>9} {'tokens/req':>10} {'avg(s)':>8} {'p50(s)':>8} {'max(s)':>8}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['requests']:>8} {r['errors']:>6} {r['model_calls_total']:>6} "
+              f"{r['model_calls_avg']:>9.2f} {r['tool_calls_avg']:>9.2f} {r['tokens_avg']:>10.0f} "
+              f"{r['latency_avg']:>8.2f} {r['latency_p50']:>8.2f} {r['latency_max']:>8.2f}")
+    print("---" * 15)
+
+# metrics compared with the baseline (lower is better)
+COMPARED_METRICS = ("model_calls_avg", "tool_calls_avg", "tokens_avg", "latency_avg")
+
+def compare(results: list, baseline: list, max_regression: float) -> list:
+    """
+    Print the change of every metric against the baseline and return the regressions above max_regression (%).
+    """
+    regressions = []
+    previous = {r["mode"]: r for r in baseline}
+
+    print(f"{'mode':<8} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for r in results:
+        base = previous.get(r["mode"])
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in base:
+                continue
+            change = ((r[metric] - base[metric]) / base[metric] * 100) if base[metric] else 0.0
+            flag = " <==" if change > max_regression else ""
+            print(f"{r['mode']:<8} {metric:<16} {base[metric]:>10.2f} {r[metric]:>10.2f} {change:>7.1f}%{flag}")
+            if change > max_regression:
+                regressions.append(f"{r['mode']}.{metric} {change:+.1f}%")
+    print("---" * 15)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model calls and latency of the orchestration modes")
+    parser.add_argument("--modes", nargs="+", default=list(orchestrator.AGENT_MODES), choices=orchestrator.AGENT_MODES)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--workload", help="file with one prompt per line")
+    parser.add_argument("--output", help="write the full results as json")
+    parser.add_argument("--baseline", help="results (json) of a previous release to compare with")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="max increase (%%) of a metric over the baseline")
+    args = parser.parse_args()
+
+    # replay serves the recorded model and MCP calls, any token works
+    token = os.getenv("JWT_TOKEN") or ("replay" if CASSETTE_MODE == "replay" else None)
+    if not token:
+        print("No JWT provided (JWT_TOKEN), NOT AUTHORIZED !!!")
+        sys.exit(1)
+    memory.set_token(token)
+
+    counter = ModelCallCounter()
+    # every agent (main and sub-agents) runs on the shared models of the tiers
+    for model in {id(m): m for m in [get_model(tier) for tier in MODEL_TIERS]}.values():
+        counter.instrument(model)
+
+    tool_counter = ToolCallCounter()
+    tool_counter.instrument()
+
+    workload = load_workload(args.workload)
+    results = [run_mode(mode, workload, args.rounds, counter, tool_counter) for mode in args.modes]
+
+    orchestrator.close_flat_tools()
+
+    print_report(results)
+    if CASSETTE_MODE != "off":
+        print(f"cassette {CASSETTE_MODE}: {cassette.path} {cassette.stats}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Regressions over {args.max_regression}%: {regressions}")
+            sys.exit(1)
@@ -0,0 +1,326 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import logging
+
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from mcp_pool import mcp_pool
+from sub_agents import registry
+from loginManager import LoginManager
+from resilience import CircuitBreaker
+
+# -------------------------------------------
+# Bulk inventory import, straight to the MCP tools (no LLM)
+#
+#   export JWT_TOKEN=<token>    (otherwise the cached login token is used, until it expires)
+#   python3 ./multi_agent/bulk_import.py products.csv --concurrency 16 --batch-size 500
+#
+# rows (csv header or jsonl keys): sku, name, type, status (create_inventory) and/or available, reserved, sold (update_inventory),
+# each group complete or absent
+# the progress is checkpointed after each batch, a new run resumes from the checkpoint (--restart to start over)
+# -------------------------------------------
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+INVENTORY_AGENT = "inventory_agent"  # sub-agent owning the inventory MCP server and tools
+SKU_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+PRODUCT_FIELDS = ("name", "type", "status")
+INVENTORY_FIELDS = ("available", "reserved", "sold")
+ALREADY_EXISTS = re.compile(r"already exists|duplicate|409|conflict", re.IGNORECASE)
+MAX_CIRCUIT_WAITS = 5
+
+class TokenExpired(Exception):
+    """No valid token left for the import (the cached login token expired), a new login is required."""
+
+class ImportRow(BaseModel):
+    sku: str
+    name: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[str] = None
+    available: Optional[int] = Field(default=None, ge=0)
+    reserved: Optional[int] = Field(default=None, ge=0)
+    sold: Optional[int] = Field(default=None, ge=0)
+
+    @field_validator("sku")
+    @classmethod
+    def valid_sku(cls, sku: str) -> str:
+        sku = sku.strip()
+        if not SKU_PATTERN.match(sku):
+            raise ValueError(f"invalid sku: {sku!r}")
+        return sku
+
+    @model_validator(mode="after")
+    def complete(self):
+        product = [getattr(self, f) for f in PRODUCT_FIELDS]
+        if any(v is not None for v in product) and not all(v is not None for v in product):
+            raise ValueError(f"a product needs all of {', '.join(PRODUCT_FIELDS)}")
+        # update_inventory sets every counter (an omitted one would overwrite the stored value with 0)
+        counters = [getattr(self, f) for f in INVENTORY_FIELDS]
+        if any(v is not None for v in counters) and not all(v is not None for v in counters):
+            raise ValueError(f"an inventory needs all of {', '.join(INVENTORY_FIELDS)}")
+        if not self.has_product() and not self.has_inventory():
+            raise ValueError("nothing to import, the row has no product nor inventory fields")
+        return self
+
+    def has_product(self) -> bool:
+        return self.name is not None
+
+    def has_inventory(self) -> bool:
+        return self.available is not None
+
+    def product_input(self) -> dict:
+        return {"sku": self.sku, "name": self.name, "type": self.type, "status": self.status}
+
+    def inventory_input(self) -> dict:
+        return {"sku": self.sku, **{f: getattr(self, f) for f in INVENTORY_FIELDS}}
+
+def read_rows(path: str, fmt: str):
+    """
+    Yield (row number, fields or None, parse error or None), row numbers start at 1.
+    """
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            for number, fields in enumerate(csv.DictReader(f), start=1):
+                yield number, {k.strip(): (v.strip() or None) for k, v in fields.items() if k and v is not None}, None
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line), None
+                except ValueError as e:
+                    yield number, None, f"invalid json: {e}"
+
+class Checkpoint:
+    """Next row to import and the totals, saved (atomically) after each batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"next_row": 1, "stats": {}}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, next_row: int, stats: dict) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"next_row": next_row, "stats": stats, "saved_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class ErrorReport:
+    """One json line per row not imported: row number, sku, stage (parse, validation, create_inventory ...) and reason."""
+
+    def __init__(self, path: str, restart: bool):
+        self.path = path
+        if restart and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, entries: list) -> None:
+        if not entries:
+            return
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+class BulkImporter:
+    """
+    Validate the rows locally and send them to create_inventory / update_inventory with bounded concurrency,
+    batch by batch, reusing the pooled MCP session, the resilience layer and the jwt/trace context.
+    """
+
+    def __init__(self, concurrency: int, batch_size: int, mode: str, token_provider=None):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.mode = mode
+        self.token_provider = token_provider  # async callable returning a valid token, or None once expired
+        self.tools = {}
+        self.stats = {"imported": 0, "failed": 0, "invalid": 0}
+
+    async def setup(self) -> None:
+        tools = await asyncio.to_thread(registry.mcp_tools, INVENTORY_AGENT)
+        self.tools = {t.tool_name: t for t in tools}
+        for name in ("create_inventory", "update_inventory"):
+            if name not in self.tools:
+                raise RuntimeError(f"tool {name} is not available on {registry.spec(INVENTORY_AGENT).mcp_url}")
+
+    async def call(self, tool_name: str, arguments: dict) -> dict:
+        mcp_tool = self.tools[tool_name]
+        tool_use = {
+            "toolUseId": f"bulk-{uuid.uuid4()}",
+            "name": tool_name,
+            "input": arguments,
+        }
+
+        # the server is down: wait for the breaker to let calls through instead of failing every row fast
+        for _ in range(MAX_CIRCUIT_WAITS):
+            if mcp_tool.breaker.state != CircuitBreaker.OPEN:
+                break
+            await asyncio.sleep(mcp_tool.breaker.reset_timeout)
+
+        token = await self.token_provider() if self.token_provider is not None else None
+        if not token:
+            raise TokenExpired("the login token expired, login again and run the import again to resume from its checkpoint")
+
+        # the tool wrapper adds the jwt, x-request-id and trace context
+        return await mcp_tool.call(tool_use, {"jwt": token})
+
+    @staticmethod
+    def reason(result: dict) -> str:
+        return " ".join(c.get("text", "") for c in result.get("content", []) if isinstance(c, dict))
+
+    async def import_row(self, number: int, row: ImportRow):
+        """
+        Import one row, return the error report entry or None.
+        """
+        if row.has_product() and self.mode in ("auto", "create"):
+            result = await self.call("create_inventory", row.product_input())
+            # a product created by a previous (interrupted) run is not an error
+            if result.get("status") == "error" and not ALREADY_EXISTS.search(self.reason(result)):
+                return {"row": number, "sku": row.sku, "stage": "create_inventory", "reason": self.reason(result)}
+
+        if row.has_inventory() and self.mode in ("auto", "update"):
+            result = await self.call("update_inventory", row.inventory_input())
+            if result.get("status") == "error":
+                return {"row": number, "sku": row.sku, "stage": "update_inventory", "reason": self.reason(result)}
+
+        return None
+
+    async def run_batch(self, batch: list, dry_run: bool) -> list:
+        errors = []
+        valid = []
+        for number, fields, parse_error in batch:
+            if parse_error is not None:
+                errors.append({"row": number, "stage": "parse", "reason": parse_error})
+                continue
+            if not isinstance(fields, dict):
+                errors.append({"row": number, "stage": "validation", "reason": "the row is not an object"})
+                continue
+            try:
+                valid.append((number, ImportRow.model_validate(fields)))
+            except ValidationError as e:
+                errors.append({"row": number, "sku": fields.get("sku"), "stage": "validation",
+                               "reason": "; ".join(err["msg"] for err in e.errors())})
+        self.stats["invalid"] += len(errors)
+
+        if dry_run:
+            return errors
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(number, row):
+            async with semaphore:
+                return await self.import_row(number, row)
+
+        results = await asyncio.gather(*(bounded(number, row) for number, row in valid))
+        failed = [r for r in results if r is not None]
+        self.stats["failed"] += len(failed)
+        self.stats["imported"] += len(valid) - len(failed)
+        return errors + failed
+
+    async def run(self, path: str, fmt: str, checkpoint: Checkpoint, report: ErrorReport, dry_run: bool) -> dict:
+        state = checkpoint.load()
+        next_row = state["next_row"]
+        self.stats.update(state.get("stats", {}))
+        if next_row > 1:
+            print(f"Resuming {path} from row {next_row} - {self.stats}")
+
+        if not dry_run:
+            await self.setup()
+
+        start = time.perf_counter()
+        batch = []
+        for item in read_rows(path, fmt):
+            if item[0] < next_row:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                next_row = await self._flush(batch, checkpoint, report, dry_run, start)
+                batch = []
+        if batch:
+            await self._flush(batch, checkpoint, report, dry_run, start)
+
+        return self.stats
+
+    async def _flush(self, batch: list, checkpoint: Checkpoint, report: ErrorReport, dry_run: bool, start: float) -> int:
+        report.write(await self.run_batch(batch, dry_run))
+        next_row = batch[-1][0] + 1
+        if not dry_run:
+            checkpoint.save(next_row, self.stats)
+
+        elapsed = time.perf_counter() - start
+        done = self.stats["imported"] + self.stats["failed"]
+        print(f"rows <= {next_row - 1}: {self.stats} - {done / elapsed if elapsed else 0:.1f} rows/s")
+        return next_row
+
+def login():
+    """
+    Return the async token provider of the import: the JWT_TOKEN, or the cached login token, None without any.
+    The cached token is not refreshed (the password is not cached): once it expires the import stops,
+    and resumes from its checkpoint after a new login.
+    """
+    token = os.getenv("JWT_TOKEN")
+    if token:
+        async def static_token():
+            return token
+        return static_token
+
+    loginManager = LoginManager()
+    if not loginManager.load_cached_token():
+        return None
+    return loginManager.get_valid_token
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import of products and inventories (csv or jsonl) through the inventory MCP tools")
+    parser.add_argument("input", help="csv (with header) or jsonl file")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--mode", choices=("auto", "create", "update"), default="auto",
+                        help="auto: create the products and update the inventories present in each row")
+    parser.add_argument("--concurrency", type=int, default=16, help="rows in flight")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per batch (checkpoint interval)")
+    parser.add_argument("--checkpoint", help="default: <input>.checkpoint.json")
+    parser.add_argument("--errors", help="per row error report (jsonl), default: <input>.errors.jsonl")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, no MCP calls")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.input.endswith((".jsonl", ".json")) else "csv")
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint.json")
+    report = ErrorReport(args.errors or f"{args.input}.errors.jsonl", restart=args.restart)
+    if args.restart:
+        checkpoint.clear()
+
+    token_provider = login()
+    if not args.dry_run and token_provider is None:
+        print("No JWT provided (JWT_TOKEN) nor cached login token, NOT AUTHORIZED !!!")
+        sys.exit(1)
+
+    importer = BulkImporter(args.concurrency, args.batch_size, args.mode, token_provider)
+    try:
+        stats = asyncio.run(importer.run(args.input, fmt, checkpoint, report, args.dry_run))
+    except TokenExpired as e:
+        print(f"Import stopped, {e}")
+        sys.exit(1)
+    finally:
+        mcp_pool.close()
+
+    print("---" * 15)
+    print(f"{args.input}: {stats}")
+    if stats["failed"] or stats["invalid"]:
+        print(f"errors: {report.path}")
+    print("---" * 15)
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import asyncio
+import hashlib
+import logging
+import threading
+
+from strands.models.model import Model
+from strands.types.tools import AgentTool
+
+from singleflight import strip_fields, REQUEST_FIELDS
+from resilience import result_of
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")          # off, record or replay
+CASSETTE_MODES = ("off", "record", "replay")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "./cassettes/default.jsonl")
+CASSETTE_LATENCY = os.getenv("CASSETTE_LATENCY", "recorded")  # replay with the recorded latencies or zero
+
+if CASSETTE_MODE not in CASSETTE_MODES:
+    raise ValueError(f"Invalid CASSETTE_MODE: {CASSETTE_MODE}, expected one of {CASSETTE_MODES}")
+
+# Per request values (request ids, trace context, jwt) replaced in the keys, so a replay matches the recording
+VOLATILE_PATTERNS = [
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+    (re.compile(r"00-[0-9a-f]{32}-[0-9a-f]{16}-[0-9a-f]{2}"), "<traceparent>"),
+    (re.compile(r'"jwt":\s*"[^"]*"'), '"jwt": "<jwt>"'),
+    (re.compile(r"eyJ[\w-]*\.[\w-]*\.[\w-]*"), "<jwt>"),
+]
+
+class CassetteMissError(Exception):
+    """The request was not recorded in the cassette (replay mode)."""
+    pass
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize(v) for v in value]
+    if isinstance(value, str):
+        for pattern, replacement in VOLATILE_PATTERNS:
+            value = pattern.sub(replacement, value)
+    return value
+
+def request_key(*parts) -> str:
+    canonical = json.dumps(normalize(list(parts)), sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class Cassette:
+    """
+    Model stream events and MCP request/response pairs, one json entry per line.
+    Identical requests are replayed in the recorded order (the last one repeats once exhausted).
+    In record mode the file is opened on the first record of each process and every entry is appended under a file
+    lock, so the forked server workers share one cassette. Its header holds the recording run: the first record of
+    a new run (not an import, not a forked worker of the same run) starts the file over.
+    """
+
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._entries = {}
+        self._cursors = {}
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+        if mode == "replay":
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry["kind"] != "header":
+                            self._entries.setdefault(entry["key"], []).append(entry)
+            logger.info(f"Replaying cassette: {path} ({sum(len(e) for e in self._entries.values())} entries, latency: {CASSETTE_LATENCY})")
+
+    def _open(self) -> int:
+        # per process: a forked worker does not reuse the descriptor of its parent
+        if self._fd is not None and self._pid == os.getpid():
+            return self._fd
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            with open(self.path) as f:
+                first = f.readline()
+            try:
+                header = json.loads(first) if first.strip() else {}
+            except ValueError:
+                header = {}
+            if header.get("run") != self.run_id:
+                os.ftruncate(fd, 0)
+                os.write(fd, (json.dumps({"kind": "header", "run": self.run_id}) + "\n").encode())
+                logger.info(f"Recording cassette: {self.path}")
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        self._fd, self._pid = fd, os.getpid()
+        return fd
+
+    def record(self, kind: str, key: str, **data) -> None:
+        line = (json.dumps({"kind": kind, "key": key, **data}, default=str) + "\n").encode()
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                os.write(fd, line)  # a single append per entry
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self.stats["recorded"] += 1
+
+    def replay(self, kind: str, key: str) -> dict:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+                raise CassetteMissError(f"No {kind} recording for key {key[:16]} in {self.path}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.stats["replayed"] += 1
+            return entries[min(cursor, len(entries) - 1)]
+
+async def replay_delay(delay: float) -> None:
+    if CASSETTE_LATENCY == "recorded" and delay > 0:
+        await asyncio.sleep(delay)
+
+class CassetteModel(Model):
+    """
+    Record the stream events of a model (record mode), or serve them back without the model (replay mode, model is None).
+    """
+
+    def __init__(self, model: Model, model_id: str, cassette: Cassette):
+        self.model = model
+        self.model_id = model_id
+        self.cassette = cassette
+
+    @property
+    def config(self):
+        return self.model.config if self.model is not None else {"model_id": self.model_id}
+
+    def update_config(self, **model_config) -> None:
+        if self.model is not None:
+            self.model.update_config(**model_config)
+
+    def get_config(self):
+        return self.model.get_config() if self.model is not None else {"model_id": self.model_id}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        key = request_key("model", self.model_id, system_prompt, messages, tool_specs)
+
+        if self.model is None:
+            entry = self.cassette.replay("model", key)
+            for delay, event in entry["events"]:
+                await replay_delay(delay)
+                yield event
+            return
+
+        events = []
+        last = time.perf_counter()
+        async for event in self.model.stream(messages, tool_specs=tool_specs, system_prompt=system_prompt, **kwargs):
+            now = time.perf_counter()
+            events.append([round(now - last, 4), event])
+            last = now
+            yield event
+
+        self.cassette.record("model", key, model_id=self.model_id, events=events)
+
+    async def structured_output(self, *args, **kwargs):
+        # the agents use the tool based structured output (stream), this path is not recorded
+        if self.model is None:
+            raise CassetteMissError("structured_output is not recorded in the cassettes")
+        async for event in self.model.structured_output(*args, **kwargs):
+            yield event
+
+def tool_key(url: str, tool_name: str, arguments: dict) -> str:
+    return request_key("mcp", url, tool_name, strip_fields(arguments or {}, REQUEST_FIELDS | {"jwt"}))
+
+class CassetteMCPTool(AgentTool):
+    """
+    Record the results of a MCP tool (record mode), or serve them back from its recorded spec (replay mode, tool is None).
+    """
+
+    def __init__(self, url: str, cassette: Cassette, tool=None, spec: dict = None):
+        super().__init__()
+        self.url = url
+        self.cassette = cassette
+        self.tool = tool
+        self.spec = spec or tool.tool_spec
+
+    @property
+    def tool_name(self) -> str:
+        return self.spec["name"]
+
+    @property
+    def tool_spec(self):
+        return self.spec
+
+    @property
+    def tool_type(self) -> str:
+        return self.tool.tool_type if self.tool is not None else "mcp"
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        key = tool_key(self.url, self.tool_name, tool_use.get("input"))
+
+        if self.tool is None:
+            entry = self.cassette.replay("mcp", key)
+            await replay_delay(entry["latency"])
+            yield dict(entry["result"], toolUseId=tool_use.get("toolUseId"))
+            return
+
+        # the result is the last event (the ToolResult dict or an event wrapping it)
+        last_event = None
+        start = time.perf_counter()
+        async for event in self.tool.stream(tool_use, invocation_state, **kwargs):
+            last_event = event
+            yield event
+
+        result = result_of(last_event)
+        if isinstance(result, dict):
+            self.cassette.record("mcp", key,
+                                 tool=self.tool_name,
+                                 latency=round(time.perf_counter() - start, 4),
+                                 result={k: v for k, v in result.items() if k != "toolUseId"})
+
+def record_tools(url: str, tools: list) -> list:
+    """
+    Record the tool catalog of a MCP server and wrap its tools (record mode).
+    """
+    cassette.record("mcp_tools", request_key("mcp_tools", url), specs=[t.tool_spec for t in tools])
+    return [CassetteMCPTool(url, cassette, tool=t) for t in tools]
+
+def replay_tools(url: str) -> list:
+    """
+    The recorded tool catalog of a MCP server, no connection (replay mode).
+    """
+    entry = cassette.replay("mcp_tools", request_key("mcp_tools", url))
+    return [CassetteMCPTool(url, cassette, spec=spec) for spec in entry["specs"]]
+
+# global instance
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
@@ -0,0 +1,138 @@
+import os
+import json
+import logging
+
+from opentelemetry import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+COMPACTION_MAX_BYTES = int(os.getenv("COMPACTION_MAX_BYTES", "4000"))        # budget of one tool result
+COMPACTION_MAX_LIST_ITEMS = int(os.getenv("COMPACTION_MAX_LIST_ITEMS", "10"))
+
+BYTES_PER_TOKEN = 4  # rough estimate, good enough to report the savings
+
+# Fields carrying no information for the model, dropped at any depth: per tool, "*" for every tool.
+# Only known noise is dropped (never the identifiers, prices, descriptions ...), override with COMPACTION_DROP_FIELDS (json).
+DEFAULT_DROP_FIELDS = {
+    "*": ["_links", "tenant_id", "deleted_at", "trace_id", "request_id", "x-request-id", "_trace"],
+}
+DROP_FIELDS = json.loads(os.getenv("COMPACTION_DROP_FIELDS") or json.dumps(DEFAULT_DROP_FIELDS))
+
+# Values carrying no information (the Go backend serializes zero times)
+EMPTY_VALUES = (None, "", "0001-01-01T00:00:00Z")
+
+# Metrics
+meter = metrics.get_meter(__name__)
+bytes_in_counter = meter.create_counter("compaction.bytes_in", unit="By", description="Tool result bytes before compaction")
+bytes_out_counter = meter.create_counter("compaction.bytes_out", unit="By", description="Tool result bytes after compaction")
+tokens_saved_counter = meter.create_counter("compaction.tokens_saved", description="Estimated model tokens saved by the compaction")
+
+def dropped_fields(tool_name: str) -> set:
+    return set(DROP_FIELDS.get("*", [])) | set(DROP_FIELDS.get(tool_name, []))
+
+def drop_fields(data, fields: set):
+    """
+    Drop the noise fields, recursively (every dict, every list item).
+    """
+    if isinstance(data, dict):
+        return {k: drop_fields(v, fields) for k, v in data.items() if k not in fields}
+    if isinstance(data, list):
+        return [drop_fields(v, fields) for v in data]
+    return data
+
+def drop_empty(data):
+    """
+    Drop the null and default (empty) fields, recursively.
+    """
+    if isinstance(data, dict):
+        cleaned = {k: drop_empty(v) for k, v in data.items()}
+        return {k: v for k, v in cleaned.items() if not is_empty(v)}
+    if isinstance(data, list):
+        return [drop_empty(v) for v in data if not is_empty(v)]
+    return data
+
+def is_empty(value) -> bool:
+    if isinstance(value, (dict, list)):
+        return len(value) == 0
+    return value in EMPTY_VALUES
+
+def summarize_lists(data, max_items: int):
+    """
+    Keep the first max_items of every list and add the count of the omitted ones.
+    """
+    if isinstance(data, dict):
+        return {k: summarize_lists(v, max_items) for k, v in data.items()}
+    if isinstance(data, list):
+        items = [summarize_lists(v, max_items) for v in data[:max_items]]
+        if len(data) > max_items:
+            items.append({"_omitted": len(data) - max_items, "_total": len(data)})
+        return items
+    return data
+
+def dumps(data) -> str:
+    return json.dumps(data, separators=(",", ":"), default=str)
+
+def compact_data(tool_name: str, data, max_bytes: int = COMPACTION_MAX_BYTES) -> str:
+    """
+    Drop the noise, clean and summarize a tool payload, then fit it in the byte budget.
+    """
+    data = drop_empty(drop_fields(data, dropped_fields(tool_name)))
+
+    max_items = COMPACTION_MAX_LIST_ITEMS
+    text = dumps(summarize_lists(data, max_items))
+
+    # shrink the lists until it fits the budget, then truncate as a last resort
+    while len(text.encode()) > max_bytes and max_items > 1:
+        max_items = max_items // 2
+        text = dumps(summarize_lists(data, max_items))
+
+    return compact_text(text, max_bytes)
+
+def compact_text(text: str, max_bytes: int = COMPACTION_MAX_BYTES) -> str:
+    encoded = text.encode()
+    if len(encoded) <= max_bytes:
+        return text
+    omitted = len(encoded) - max_bytes
+    return encoded[:max_bytes].decode(errors="ignore") + f"...[{omitted} bytes omitted]"
+
+def record_savings(tool_name: str, size_in: int, size_out: int) -> None:
+    saved = max(0, size_in - size_out) // BYTES_PER_TOKEN
+    bytes_in_counter.add(size_in, {"tool": tool_name})
+    bytes_out_counter.add(size_out, {"tool": tool_name})
+    tokens_saved_counter.add(saved, {"tool": tool_name})
+    logger.info(f"compaction {tool_name}: {size_in} => {size_out} bytes (~{saved} tokens saved)")
+
+def compact_result(tool_name: str, result: dict) -> dict:
+    """
+    Compact the text contents of a MCP tool result before it reaches the model.
+    """
+    if not COMPACTION_ENABLED or not isinstance(result, dict):
+        return result
+
+    size_in = size_out = 0
+    contents = []
+    for content in result.get("content", []):
+        text = content.get("text") if isinstance(content, dict) else None
+        if text is None:
+            contents.append(content)
+            continue
+
+        try:
+            compacted = compact_data(tool_name, json.loads(text))
+        except ValueError:
+            compacted = compact_text(text)
+
+        size_in += len(text.encode())
+        size_out += len(compacted.encode())
+        contents.append({"text": compacted})
+
+    if size_in:
+        record_savings(tool_name, size_in, size_out)
+
+    # structuredContent duplicates the text content, the model needs only one copy
+    compacted_result = {k: v for k, v in result.items() if k != "structuredContent"}
+    compacted_result["content"] = contents
+    return compacted_result
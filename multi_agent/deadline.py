@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import logging
+
+from contextvars import ContextVar
+
+from strands.models.model import Model
+
+from structured_response import error_envelope
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+TURN_TIMEOUT = float(os.getenv("TURN_TIMEOUT", "120"))  # seconds a user turn may take, end to end
+
+class DeadlineExceeded(Exception):
+    """Raised when the deadline of the request expired (or the request was cancelled)."""
+    pass
+
+class Deadline:
+    """
+    Deadline of one request, set at the entry point and passed down (invocation_state["deadline"])
+    through the main agent, the sub-agents and the MCP tools; each hop shrinks its timeout to the remaining budget.
+    """
+
+    def __init__(self, timeout: float = TURN_TIMEOUT):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+        self.admitted = False  # set by the model scheduler once the turn got its first model call
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clamp(self, timeout: float) -> float:
+        return min(timeout, self.remaining())
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self, where: str) -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.timeout:.0f}s exceeded at {where}")
+
+def get_deadline(invocation_state: dict):
+    if not invocation_state:
+        return None
+    return invocation_state.get("deadline")
+
+def timeout_response(deadline: Deadline, where: str) -> str:
+    """
+    Structured timeout error, same envelope as the agents errors.
+    """
+    return error_envelope("DEADLINE_EXCEEDED",
+                          f"Request exceeded its deadline of {deadline.timeout:.0f}s at {where}, please try again")
+
+class TurnContext:
+    """Deadline and model (tier) of the turn being run."""
+
+    def __init__(self, deadline: Deadline, model: Model = None):
+        self.deadline = deadline
+        self.model = model
+
+# per invocation, set by the entry point in the context running the turn (inherited by its threads and tasks);
+# the main agent and its model are shared by the turns of a session, they never hold the turn state
+current_turn = ContextVar("current_turn", default=None)
+
+class DeadlineModel(Model):
+    """
+    Wrap a model, so every call is bounded by the remaining budget of the current deadline and stops
+    as soon as the deadline expires or is cancelled.
+    Without a fixed deadline (main agent) the deadline and model of the current turn (current_turn) are used.
+    """
+
+    def __init__(self, model: Model, deadline: Deadline = None):
+        self.model = model
+        self.deadline = deadline
+
+    def _turn(self):
+        if self.deadline is not None:
+            return self.deadline, self.model
+        turn = current_turn.get()
+        if turn is None:
+            return None, self.model
+        return turn.deadline, turn.model or self.model
+
+    @property
+    def config(self):
+        return self._turn()[1].config
+
+    def update_config(self, **model_config) -> None:
+        self._turn()[1].update_config(**model_config)
+
+    def get_config(self):
+        return self._turn()[1].get_config()
+
+    async def _bounded(self, events, deadline: Deadline, where: str):
+        iterator = events.__aiter__()
+        while True:
+            deadline.check(where)
+            try:
+                event = await asyncio.wait_for(iterator.__anext__(), timeout=deadline.remaining())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Deadline of {deadline.timeout:.0f}s exceeded at {where}")
+            yield event
+
+    async def stream(self, *args, **kwargs):
+        deadline, model = self._turn()
+        # the deadline also gives the scheduler (ScheduledModel) the priority and max wait of the call
+        events = model.stream(*args, deadline=deadline, **kwargs)
+        if deadline is None:
+            async for event in events:
+                yield event
+            return
+
+        async for event in self._bounded(events, deadline, "model"):
+            yield event
+
+    async def structured_output(self, *args, **kwargs):
+        deadline, model = self._turn()
+        events = model.structured_output(*args, deadline=deadline, **kwargs)
+        if deadline is None:
+            async for event in events:
+                yield event
+            return
+
+        async for event in self._bounded(events, deadline, "model structured output"):
+            yield event
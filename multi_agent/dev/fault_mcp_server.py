@@ -0,0 +1,102 @@
+import os
+import time
+import random
+import asyncio
+import logging
+
+from mcp.server.fastmcp import FastMCP
+
+# -------------------------------------------
+# Local fault-injecting stand-in of the MCP server (same tool names), for the resilience layer
+#
+#   FAULT_ERROR_RATE=0.3 FAULT_SLOW_RATE=0.1 python3 ./multi_agent/dev/fault_mcp_server.py
+#   export INVENTORY_MCP_URL=http://127.0.0.1:9102/mcp
+#   export ORDER_MCP_URL=http://127.0.0.1:9102/mcp
+#
+#   FAULT_DOWN_AFTER / FAULT_DOWN_FOR simulate an outage (seconds since start), to trip the circuit breaker
+# -------------------------------------------
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FAULT_PORT = int(os.getenv("FAULT_PORT", "9102"))
+FAULT_LATENCY = float(os.getenv("FAULT_LATENCY", "0.05"))         # base latency of every call
+FAULT_ERROR_RATE = float(os.getenv("FAULT_ERROR_RATE", "0.0"))    # probability of a transient 503 error
+FAULT_SLOW_RATE = float(os.getenv("FAULT_SLOW_RATE", "0.0"))      # probability of a slow (tail) call
+FAULT_SLOW_LATENCY = float(os.getenv("FAULT_SLOW_LATENCY", "3.0"))
+FAULT_DOWN_AFTER = float(os.getenv("FAULT_DOWN_AFTER", "-1"))
+FAULT_DOWN_FOR = float(os.getenv("FAULT_DOWN_FOR", "0"))
+
+started_at = time.time()
+stats = {"calls": 0, "errors": 0, "slow": 0}
+
+mcp = FastMCP("fault-mcp-server", host="127.0.0.1", port=FAULT_PORT)
+
+async def inject_fault(tool_name: str) -> None:
+    stats["calls"] += 1
+
+    elapsed = time.time() - started_at
+    if FAULT_DOWN_AFTER >= 0 and FAULT_DOWN_AFTER <= elapsed < FAULT_DOWN_AFTER + FAULT_DOWN_FOR:
+        stats["errors"] += 1
+        raise RuntimeError(f"503 service unavailable (injected outage) - {tool_name}")
+
+    latency = FAULT_LATENCY
+    if random.random() < FAULT_SLOW_RATE:
+        stats["slow"] += 1
+        latency = FAULT_SLOW_LATENCY
+    await asyncio.sleep(latency)
+
+    if random.random() < FAULT_ERROR_RATE:
+        stats["errors"] += 1
+        raise RuntimeError(f"503 service unavailable (injected) - {tool_name}")
+
+    logger.info(f"{tool_name} ok - stats: {stats}")
+
+@mcp.tool()
+async def inventory_health(jwt: str = "") -> dict:
+    await inject_fault("inventory_health")
+    return {"status": "HEALTHY", "service": "inventory"}
+
+@mcp.tool()
+async def get_product(sku: str, jwt: str = "") -> dict:
+    await inject_fault("get_product")
+    return {"sku": sku, "type": "beverage", "status": "IN-STOCK", "name": sku.replace("-", " ")}
+
+@mcp.tool()
+async def get_inventory(sku: str, jwt: str = "") -> dict:
+    await inject_fault("get_inventory")
+    return {"product": {"sku": sku}, "available": 100, "reserved": 0, "sold": 0}
+
+@mcp.tool()
+async def create_inventory(sku: str, type: str, status: str, name: str, jwt: str = "") -> dict:
+    await inject_fault("create_inventory")
+    return {"sku": sku, "type": type, "status": status, "name": name}
+
+@mcp.tool()
+async def update_inventory(sku: str, available: int = 0, reserved: int = 0, sold: int = 0, jwt: str = "") -> dict:
+    await inject_fault("update_inventory")
+    return {"product": {"sku": sku}, "available": available, "reserved": reserved, "sold": sold}
+
+@mcp.tool()
+async def order_health(jwt: str = "") -> dict:
+    await inject_fault("order_health")
+    return {"status": "HEALTHY", "service": "order"}
+
+@mcp.tool()
+async def get_order(id: int, jwt: str = "") -> dict:
+    await inject_fault("get_order")
+    return {"id": id, "status": "PENDING", "user_id": "ELIEZER", "currency": "USD", "amount": 63}
+
+@mcp.tool()
+async def create_order(user_id: str, address: str, sku: str, quantity: int, currency: str, price: float, jwt: str = "") -> dict:
+    await inject_fault("create_order")
+    return {"id": random.randint(100, 999), "status": "PENDING", "user_id": user_id, "address": address,
+            "cart_item": [{"sku": sku, "quantity": quantity, "currency": currency, "price": price}]}
+
+@mcp.tool()
+async def checkout_order(id: int, payment: list, jwt: str = "") -> dict:
+    await inject_fault("checkout_order")
+    return {"id": id, "status": "CHECKOUT", "payment": payment}
+
+if __name__ == "__main__":
+    mcp.run(transport="streamable-http")
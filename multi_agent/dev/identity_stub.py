@@ -0,0 +1,61 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+
+from aiohttp import web
+
+# -------------------------------------------
+# Local stub of the identity endpoint, for the LoginManager token lifecycle
+#
+#   python3 ./multi_agent/dev/identity_stub.py
+#   export IDENTITY_URL=http://127.0.0.1:9100/identidy/oauth_credential
+#   export TOKEN_REFRESH_MARGIN=5
+# -------------------------------------------
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STUB_PORT = int(os.getenv("STUB_PORT", "9100"))
+STUB_TOKEN_TTL = int(os.getenv("STUB_TOKEN_TTL", "30"))  # seconds, short to exercise the refresh
+STUB_USER = os.getenv("STUB_USER", "admin")
+STUB_PASSWORD = os.getenv("STUB_PASSWORD", "admin")
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0"))
+
+stats = {"issued": 0, "rejected": 0}
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+def issue_token(username: str) -> str:
+    now = int(time.time())
+    header = {"alg": "none", "typ": "JWT"}
+    payload = {"sub": username, "iat": now, "exp": now + STUB_TOKEN_TTL}
+    return f"{b64(header)}.{b64(payload)}.stub"
+
+async def oauth_credential(request: web.Request) -> web.Response:
+    if STUB_LATENCY:
+        await asyncio.sleep(STUB_LATENCY)
+
+    body = await request.json()
+    if body.get("user") != STUB_USER or body.get("password") != STUB_PASSWORD:
+        stats["rejected"] += 1
+        return web.json_response({"message": "invalid credentials"}, status=401)
+
+    stats["issued"] += 1
+    logger.info(f"token issued - user: {body.get('user')} - issued: {stats['issued']}")
+    return web.json_response({"token": issue_token(body["user"])})
+
+async def get_stats(request: web.Request) -> web.Response:
+    return web.json_response(stats)
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_post("/identidy/oauth_credential", oauth_credential)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="127.0.0.1", port=STUB_PORT)
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import statistics
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strands import Agent
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+from deadline import Deadline, DeadlineModel
+from scheduler import Scheduler, ScheduledModel, OverloadedError
+
+# -------------------------------------------
+# Stub model that throttles like Bedrock above STUB_RPM, to exercise the model scheduler without AWS
+#
+#   STUB_RPM=60 python3 ./multi_agent/dev/throttling_model.py --turns 50 --rpm 50 --max-queue 10
+#
+# Compare with --rpm 0 (no admission control): the throttled calls surface as errors
+# -------------------------------------------
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+STUB_RPM = int(os.getenv("STUB_RPM", "60"))              # calls per minute accepted by the stub, above it throttles
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.2"))   # latency of an accepted call
+
+class ThrottlingModel(Model):
+    """
+    Answer a canned text (or structured output), raising ModelThrottledException when the calls of the last minute exceed rpm.
+    """
+
+    def __init__(self, rpm: int = STUB_RPM, latency: float = STUB_LATENCY):
+        self.rpm = rpm
+        self.latency = latency
+        self.calls = []
+        self.stats = {"accepted": 0, "throttled": 0}
+        self._lock = threading.Lock()
+        self.config = {"model_id": "throttling-stub"}
+
+    def update_config(self, **model_config) -> None:
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    def _admit(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self.calls = [t for t in self.calls if now - t < 60]
+            if len(self.calls) >= self.rpm:
+                self.stats["throttled"] += 1
+                return False
+            self.calls.append(now)
+            self.stats["accepted"] += 1
+            return True
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        if not self._admit():
+            raise ModelThrottledException("ThrottlingException: Too many requests, please wait before trying again (stub)")
+
+        await asyncio.sleep(self.latency)
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": "ok"}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": 1, "totalTokens": 101},
+                            "metrics": {"latencyMs": int(self.latency * 1000)}}}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        if not self._admit():
+            raise ModelThrottledException("ThrottlingException: Too many requests, please wait before trying again (stub)")
+
+        await asyncio.sleep(self.latency)
+        yield {"output": canned_output(output_model)}
+
+def canned_output(output_model):
+    """
+    Instance of output_model with its defaults, the required fields set to "ok" / 0 / False / empty by type.
+    """
+    canned = {str: "ok", int: 0, float: 0.0, bool: False, list: [], dict: {}}
+    values = {name: canned.get(getattr(field.annotation, "__origin__", field.annotation))
+              for name, field in output_model.model_fields.items() if field.is_required()}
+    return output_model.model_construct(**values)
+
+def run_turn(model: Model, timeout: float) -> dict:
+    start = time.perf_counter()
+    agent = Agent(model=DeadlineModel(model, Deadline(timeout)), callback_handler=None)
+    try:
+        agent("hello")
+        outcome = "ok"
+    except OverloadedError:
+        outcome = "rejected"
+    except ModelThrottledException:
+        outcome = "throttled"
+    except Exception as e:
+        outcome = f"error: {type(e).__name__}"
+    return {"outcome": outcome, "latency": time.perf_counter() - start}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Burst of turns on a throttling stub model, with and without the scheduler")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--rpm", type=int, default=50, help="scheduler requests per minute, 0 = no admission control")
+    parser.add_argument("--max-queue", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    stub = ThrottlingModel()
+    model = ScheduledModel(stub, Scheduler("throttling-stub", rpm=args.rpm, tpm=0, max_queue=args.max_queue))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda _: run_turn(model, args.timeout), range(args.turns)))
+
+    outcomes = {}
+    for r in results:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    latencies = [r["latency"] for r in results if r["outcome"] == "ok"]
+
+    print("---" * 15)
+    print(f"turns: {args.turns} - scheduler rpm: {args.rpm} - stub rpm: {STUB_RPM}")
+    print(f"outcomes: {outcomes}")
+    print(f"stub: {stub.stats}")
+    if latencies:
+        print(f"latency ok avg: {statistics.mean(latencies):.2f}s max: {max(latencies):.2f}s")
+    print("---" * 15)
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import logging
+import threading
+import weakref
+
+from strands import tool, ToolContext
+from strands.hooks import HookProvider, HookRegistry, AfterInvocationEvent
+
+from opentelemetry import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+ENTITY_TTL_SECONDS = float(os.getenv("ENTITY_TTL_SECONDS", "60"))  # how long a known entity answers follow-ups
+ENTITY_MAX_PER_KIND = int(os.getenv("ENTITY_MAX_PER_KIND", "100"))   # bound the session state size
+
+# MCP tool => entity kind it returns
+TOOL_ENTITIES = {
+    "get_product": "product",
+    "create_inventory": "product",
+    "get_inventory": "inventory",
+    "update_inventory": "inventory",
+    "get_order": "order",
+    "create_order": "order",
+    "checkout_order": "order",
+}
+
+# Tools answered from the store while the entity is fresh (reads only)
+CACHEABLE_TOOLS = {"get_product", "get_inventory", "get_order"}
+
+# Order writes changing the stock: the cached inventory of their skus is dropped (even on an error, it may have been applied)
+STOCK_TOOLS = set(os.getenv("ENTITY_STOCK_TOOLS", "create_order,checkout_order,cancel_order,update_order").split(","))
+
+# entity kind => fields identifying it
+ENTITY_KEYS = {
+    "product": ["sku"],
+    "inventory": ["sku"],
+    "order": ["id", "order_id"],
+}
+
+# Metrics
+meter = metrics.get_meter(__name__)
+entity_hits_counter = meter.create_counter("entity_store.hits", description="Tool calls answered from the session entity store")
+entity_misses_counter = meter.create_counter("entity_store.misses", description="Tool calls not found (or stale) in the session entity store")
+
+def find_key(kind: str, data):
+    """
+    Return the identifier of an entity, searching the key fields in the data and its nested dicts (e.g. inventory.product.sku).
+    """
+    if not isinstance(data, dict):
+        return None
+    for field in ENTITY_KEYS[kind]:
+        if data.get(field) not in (None, ""):
+            return str(data[field])
+    for value in data.values():
+        if isinstance(value, dict):
+            key = find_key(kind, value)
+            if key is not None:
+                return key
+    return None
+
+def find_all(field: str, data) -> set:
+    """
+    Return every value of the field in the data, its nested dicts and lists (e.g. the skus of the order items).
+    """
+    values = set()
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == field and value not in (None, "") and not isinstance(value, (dict, list)):
+                values.add(str(value))
+            else:
+                values |= find_all(field, value)
+    elif isinstance(data, list):
+        for value in data:
+            values |= find_all(field, value)
+    return values
+
+def parse_result(result: dict):
+    """
+    Return the JSON payload of a successful MCP tool result, or None.
+    """
+    if not isinstance(result, dict) or result.get("status") == "error":
+        return None
+    if isinstance(result.get("structuredContent"), dict):
+        return result["structuredContent"]
+    for content in result.get("content", []):
+        text = content.get("text") if isinstance(content, dict) else None
+        if not text:
+            continue
+        try:
+            return json.loads(text)
+        except ValueError:
+            continue
+    return None
+
+class EntityStore:
+    """
+    Products, inventories and orders returned by the MCP tools in a session, with the time they were seen.
+    Kept in the main agent state, so it is persisted with the session.
+    """
+
+    def __init__(self, data: dict = None):
+        self.entities = data or {}
+        self._lock = threading.Lock()
+
+    def put(self, kind: str, key: str, data) -> None:
+        with self._lock:
+            entries = self.entities.setdefault(kind, {})
+            entries.pop(key, None)
+            entries[key] = {"data": data, "ts": time.time()}
+            # dicts keep the insertion order, the first entry is the oldest
+            while len(entries) > ENTITY_MAX_PER_KIND:
+                entries.pop(next(iter(entries)))
+
+    def get(self, kind: str, key: str, max_age: float = ENTITY_TTL_SECONDS):
+        """
+        Return the entity data while fresh (seen less than max_age seconds ago), otherwise None.
+        """
+        with self._lock:
+            entry = self.entities.get(kind, {}).get(str(key))
+        if entry is None or time.time() - entry["ts"] > max_age:
+            return None
+        return entry["data"]
+
+    def invalidate(self, kind: str, key: str) -> None:
+        with self._lock:
+            if self.entities.get(kind, {}).pop(str(key), None) is not None:
+                logger.info(f"entity invalidated - {kind}: {key}")
+
+    def invalidate_stock(self, arguments: dict, data) -> None:
+        """
+        Drop the cached inventory of the skus of an order write (arguments, result, or the known order).
+        """
+        order_ids = find_all("id", arguments) | find_all("order_id", arguments)
+        orders = [self.get("order", order_id, max_age=float("inf")) for order_id in order_ids]
+        for sku in find_all("sku", arguments) | find_all("sku", data) | find_all("sku", orders):
+            self.invalidate("inventory", sku)
+
+    def record(self, tool_name: str, arguments: dict, result: dict) -> None:
+        data = parse_result(result)
+        if tool_name in STOCK_TOOLS:
+            self.invalidate_stock(arguments, data)
+
+        kind = TOOL_ENTITIES.get(tool_name)
+        if kind is None or data is None:
+            return
+        key = find_key(kind, data) or find_key(kind, arguments)
+        if key is not None:
+            self.put(kind, key, data)
+            logger.info(f"entity recorded - {kind}: {key}")
+
+    def lookup(self, tool_name: str, arguments: dict):
+        """
+        Return a fresh entity answering the tool call, or None.
+        """
+        if tool_name not in CACHEABLE_TOOLS:
+            return None
+
+        kind = TOOL_ENTITIES[tool_name]
+        key = find_key(kind, arguments)
+        data = self.get(kind, key) if key is not None else None
+
+        if data is None:
+            entity_misses_counter.add(1, {"tool": tool_name})
+        else:
+            entity_hits_counter.add(1, {"tool": tool_name})
+        return data
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {kind: sorted(entries) for kind, entries in self.entities.items()}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self.entities, default=str))
+
+# main agent => its session entity store
+_stores = weakref.WeakKeyDictionary()
+
+def store_for(agent) -> EntityStore:
+    """
+    The entity store of the session of the (main) agent, restored from the agent state on first use.
+    """
+    store = _stores.get(agent)
+    if store is None:
+        store = EntityStore(agent.state.get("entities"))
+        _stores[agent] = store
+    return store
+
+def get_entity_store(invocation_state: dict):
+    if not invocation_state:
+        return None
+    return invocation_state.get("entity_store")
+
+class EntityStoreHook(HookProvider):
+    """Save the entity store into the agent state at the end of each turn (before the session is synced)."""
+
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(AfterInvocationEvent, self.save)
+
+    def save(self, event: AfterInvocationEvent) -> None:
+        event.agent.state.set("entities", store_for(event.agent).to_dict())
+
+@tool(context=True)
+def recall_entity(kind: str, key: str, tool_context: ToolContext) -> str:
+    """
+    Recall a product, inventory or order already fetched in this session, without calling any agent.
+
+    Args:
+        kind: product, inventory or order.
+        key: the product sku or the order id.
+
+    Returns:
+        the entity data when it is known and fresh, otherwise a not found status.
+    """
+    store = get_entity_store(tool_context.invocation_state)
+    data = store.get(kind.lower(), key) if store is not None else None
+
+    if data is None:
+        return json.dumps({"status": "not_found", "reason": f"{kind} {key} is not known (or stale) in this session"})
+    return json.dumps({"status": "success", "response": data})
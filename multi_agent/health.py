@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from strands import tool
+
+from opentelemetry import metrics
+
+from entity_store import parse_result
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+HEALTH_POLL_INTERVAL = float(os.getenv("HEALTH_POLL_INTERVAL", "30"))                         # 0 = no poller
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", str(2 * HEALTH_POLL_INTERVAL)))           # a snapshot older is stale
+HEALTH_TOOLS = set(os.getenv("HEALTH_TOOLS", "inventory_health,order_health").split(","))
+
+# Metrics
+meter = metrics.get_meter(__name__)
+health_served_counter = meter.create_counter("health.snapshot.served", description="Health queries answered from the snapshot")
+health_stale_counter = meter.create_counter("health.snapshot.stale", description="Health queries not answered from the snapshot (missing, stale or failed)")
+
+def service_of(tool_name: str) -> str:
+    return tool_name.removesuffix("_health")
+
+class HealthSnapshot:
+    """
+    Latest result of each health tool with the time it was checked, written by the poller
+    and read by the health queries (MCP health tools, service_health tool, /status probe).
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def update(self, tool_name: str, result: dict) -> None:
+        ok = isinstance(result, dict) and result.get("status") != "error"
+        entry = {
+            "status": "success" if ok else "error",
+            "checked_at": time.time(),
+            "data": parse_result(result) if ok else None,
+            "error": None if ok else " ".join(c.get("text", "") for c in result.get("content", []) if isinstance(c, dict)),
+        }
+        with self._lock:
+            self._entries[tool_name] = entry
+
+    def get(self, tool_name: str, max_age: float = HEALTH_MAX_AGE):
+        """
+        Return the entry of the tool while fresh, otherwise None.
+        """
+        with self._lock:
+            entry = self._entries.get(tool_name)
+        if entry is None or time.time() - entry["checked_at"] > max_age:
+            return None
+        return entry
+
+    def tool_result(self, tool_name: str, tool_use_id: str):
+        """
+        The ToolResult of a health tool from a fresh and successful snapshot, or None.
+        A failed check is not authoritative (it may be the poller token, not the service), the caller checks live.
+        """
+        entry = self.get(tool_name)
+        if entry is None or entry["status"] == "error":
+            health_stale_counter.add(1, {"tool": tool_name, "reason": "missing" if entry is None else "error"})
+            return None
+
+        health_served_counter.add(1, {"tool": tool_name})
+        return {"toolUseId": tool_use_id, "status": "success", "content": [{"text": json.dumps(entry["data"], default=str)}]}
+
+    def report(self) -> dict:
+        now = time.time()
+        with self._lock:
+            entries = dict(self._entries)
+        return {
+            service_of(name): dict(entry, age=round(now - entry["checked_at"], 1), fresh=now - entry["checked_at"] <= HEALTH_MAX_AGE)
+            for name, entry in entries.items()
+        }
+
+@tool
+def service_health(service: str) -> str:
+    """
+    Return the current health status of a service (inventory, order or all) from the latest background check,
+    without calling any agent.
+
+    Args:
+        service: inventory, order or all.
+
+    Returns:
+        the health status of the service with the time of the check, or a not found status when there is no recent check.
+    """
+    report = health_snapshot.report()
+    if service.lower() != "all":
+        report = {name: entry for name, entry in report.items() if name == service.lower()}
+
+    # a failed background check is not authoritative, the agent of the service checks live
+    fresh = {name: entry for name, entry in report.items() if entry["fresh"] and entry["status"] == "success"}
+    if not fresh:
+        return json.dumps({"status": "not_found", "reason": f"no recent health check of {service}, ask the agent of the service"})
+    return json.dumps({"status": "success", "response": fresh}, default=str)
+
+# global instance
+health_snapshot = HealthSnapshot()
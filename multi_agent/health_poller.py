@@ -0,0 +1,88 @@
+import os
+import uuid
+import random
+import asyncio
+import logging
+import threading
+
+from memory import memory
+from mcp_pool import mcp_pool
+from sub_agents import registry
+from health import health_snapshot, HealthSnapshot, HEALTH_POLL_INTERVAL, HEALTH_TOOLS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+HEALTH_POLL_JITTER = float(os.getenv("HEALTH_POLL_JITTER", "0.2"))      # +/- fraction of the interval
+HEALTH_MAX_BACKOFF = float(os.getenv("HEALTH_MAX_BACKOFF", "300"))      # max interval after consecutive failures
+HEALTH_JWT = os.getenv("HEALTH_JWT")                                    # service token, otherwise the login token
+
+class HealthPoller:
+    """
+    Call the health tools in the background on an interval (with jitter, backoff on failures)
+    and keep the results in the health snapshot.
+    """
+
+    def __init__(self, targets: list, snapshot: HealthSnapshot = health_snapshot, interval: float = HEALTH_POLL_INTERVAL):
+        self.targets = targets  # (tool name, mcp url)
+        self.snapshot = snapshot
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0 or not self.targets:
+            return
+        # without a token every check fails with an auth error, which says nothing about the services
+        if not (HEALTH_JWT or memory.get_token()):
+            logger.warning("Health poller not started, no token (HEALTH_JWT or login)")
+            return
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="health-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"Health poller started - every {self.interval}s: {[name for name, _ in self.targets]}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def next_delay(self, failures: int) -> float:
+        base = min(HEALTH_MAX_BACKOFF, self.interval * (2 ** failures))
+        return base * random.uniform(1 - HEALTH_POLL_JITTER, 1 + HEALTH_POLL_JITTER)
+
+    async def _run(self) -> None:
+        await asyncio.gather(*(self._poll_loop(tool_name, url) for tool_name, url in self.targets))
+
+    async def _poll_loop(self, tool_name: str, url: str) -> None:
+        # spread the first checks, the pollers of every worker do not hit the servers together
+        await asyncio.sleep(random.uniform(0, self.interval * HEALTH_POLL_JITTER))
+
+        failures = 0
+        while not self._stop.is_set():
+            ok = await self.poll(tool_name, url)
+            failures = 0 if ok else failures + 1
+            await asyncio.sleep(self.next_delay(failures))
+
+    async def poll(self, tool_name: str, url: str) -> bool:
+        try:
+            tools = await asyncio.to_thread(mcp_pool.get(url).list_tools, [tool_name])
+            if not tools:
+                raise RuntimeError(f"tool {tool_name} not found on {url}")
+            health_tool = tools[0]
+
+            tool_use = {"toolUseId": f"health-{uuid.uuid4()}", "name": tool_name, "input": {}}
+            result = await health_tool.call(tool_use, {"jwt": HEALTH_JWT or memory.get_token()})
+        except Exception as e:
+            logger.warning(f"Health check {tool_name} failed. Reason: {e}")
+            result = {"status": "error", "content": [{"text": str(e)}]}
+
+        self.snapshot.update(tool_name, result)
+        return result.get("status") != "error"
+
+def create_health_poller() -> HealthPoller:
+    """
+    Poll the health tools (HEALTH_TOOLS) of every registered sub-agent.
+    """
+    targets = [(tool_name, spec.mcp_url)
+               for spec in registry.specs()
+               for tool_name in spec.tools if tool_name in HEALTH_TOOLS]
+    return HealthPoller(targets)
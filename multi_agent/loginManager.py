@@ -1,4 +1,10 @@
+import os
+import json
+import time
+import base64
+import asyncio
 import logging
+import threading
 import aiohttp
 
 # Configure logging
@@ -8,39 +14,265 @@ logger = logging.getLogger(__name__)
 SESSION_TIMEOUT = 30
 session_timeout = aiohttp.ClientTimeout(total=SESSION_TIMEOUT)
 
+# load encvironment variables
+IDENTITY_URL = os.getenv("IDENTITY_URL", "https://go-api-global.architecture.caradhras.io/identidy/oauth_credential")
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "60"))  # seconds before exp to refresh
+TOKEN_REFRESH_COOLDOWN = float(os.getenv("TOKEN_REFRESH_COOLDOWN", "5"))        # seconds after a failed refresh, doubling
+TOKEN_REFRESH_MAX_COOLDOWN = float(os.getenv("TOKEN_REFRESH_MAX_COOLDOWN", "60"))
+TOKEN_CACHE_FILE = os.getenv("TOKEN_CACHE_FILE")  # optional encrypted on-disk token cache
+TOKEN_CACHE_KEY = os.getenv("TOKEN_CACHE_KEY")    # fernet key (cryptography.fernet.Fernet.generate_key())
+
+def decode_jwt_claims(token: str) -> dict:
+    """
+    Return the claims of a JWT, decoded locally without signature check, or an empty dict.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except Exception as e:
+        logger.warning(f"Unable to decode jwt claims. Reason: {e}")
+        return {}
+
+def decode_jwt_exp(token: str):
+    """
+    Return the exp claim (epoch seconds) of a JWT, or None.
+    """
+    exp = decode_jwt_claims(token).get("exp")
+    try:
+        return float(exp) if exp is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class TokenCache:
+    """Encrypted on-disk token cache, so a restart skips the interactive login while the token is valid."""
+
+    def __init__(self, path: str, key: str):
+        from cryptography.fernet import Fernet
+
+        self.path = path
+        self.fernet = Fernet(key.encode())
+
+    def load(self) -> dict:
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except Exception as e:
+            logger.warning(f"Unable to read token cache {self.path}. Reason: {e}")
+            return None
+
+    def save(self, data: dict) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.fernet.encrypt(json.dumps(data).encode()))
+
+    def clear(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+def create_token_cache():
+    if not (TOKEN_CACHE_FILE and TOKEN_CACHE_KEY):
+        return None
+    try:
+        return TokenCache(TOKEN_CACHE_FILE, TOKEN_CACHE_KEY)
+    except ImportError:
+        logger.warning("cryptography is not installed, the token cache is disabled")
+    except Exception as e:
+        logger.warning(f"Invalid TOKEN_CACHE_KEY, the token cache is disabled. Reason: {e}")
+    return None
+
 class LoginManager:
+    """
+    Login and token lifecycle.
+    The manager owns an event loop (background thread) with a pooled http session, so the sync callers
+    (agents and tools running in threads) share it and share a single in-flight refresh.
+    """
 
-    def __init__(self):
+    def __init__(self, identity_url: str = IDENTITY_URL, refresh_margin: int = TOKEN_REFRESH_MARGIN,
+                 refresh_cooldown: float = TOKEN_REFRESH_COOLDOWN):
+        self.identity_url = identity_url
+        self.refresh_margin = refresh_margin
+        self.refresh_cooldown = refresh_cooldown
         self.logged_in = False
         self.user_token = None
         self.username = None
+        self.expires_at = None
+        self.token_cache = create_token_cache()
 
-    async def login(self, username: str, password: str) -> bool:
+        self._password = None
+        self._session = None
+        self._refresh_task = None
+        self._refresh_failures = 0
+        self._next_refresh_at = 0.0
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # -------- event loop --------
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="login-manager", daemon=True).start()
+            return self._loop
+
+    def run(self, coro):
+        """
+        Run a coroutine of this manager on its own event loop and wait for the result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=session_timeout)
+        return self._session
+
+    # -------- login --------
+    async def _request_token(self, username: str, password: str):
         headers = {"Content-Type": "application/json"}
-        url = f"https://go-api-global.architecture.caradhras.io/identidy/oauth_credential"
 
         payload = {
             "user" :username,
             "password": password,
         }
 
-        async with aiohttp.ClientSession(timeout=session_timeout) as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    
-                    self.logged_in = True
-                    self.user_token = data.get("token")        
-                    self.username = username
-                    return True
-                else:
-                    logger.warning(f"Login failed {resp.status}")
-                    return False
+        session = await self._get_session()
+        async with session.post(self.identity_url, headers=headers, json=payload) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                return data.get("token")
+            else:
+                logger.warning(f"Login failed {resp.status}")
+                return None
+
+    def _set_token(self, username: str, token: str) -> None:
+        self.logged_in = True
+        self.user_token = token
+        self.username = username
+        self.expires_at = decode_jwt_exp(token)
+        self._refresh_failures = 0
+        self._next_refresh_at = 0.0
+
+    async def login(self, username: str, password: str) -> bool:
+        token = await self._request_token(username, password)
+        if not token:
+            return False
+
+        self._set_token(username, token)
+        self._password = password
+
+        if self.token_cache:
+            self.token_cache.save({"username": username, "token": token})
+        return True
+
+    def load_cached_token(self) -> bool:
+        """
+        Restore the token from the encrypted on-disk cache when it is still valid.
+        The password is not cached: the restored token is not refreshed, a new login is required before it expires.
+        """
+        if not self.token_cache:
+            return False
+
+        data = self.token_cache.load()
+        if not data or not data.get("token"):
+            return False
+
+        exp = decode_jwt_exp(data["token"])
+        if exp is not None and exp - self.refresh_margin <= time.time():
+            logger.info("Cached token expired, login required")
+            self.token_cache.clear()
+            return False
+
+        self._set_token(data.get("username"), data["token"])
+        logger.info(f"Token restored from cache - user: {self.username}")
+        return True
+
+    # -------- refresh --------
+    def needs_refresh(self) -> bool:
+        if self.expires_at is None:
+            return False
+        return self.expires_at - self.refresh_margin <= time.time()
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time.time()
+
+    def can_refresh(self) -> bool:
+        return self._password is not None
+
+    def needs_login(self) -> bool:
+        """
+        True when the token is expired, or is about to expire and can not be refreshed (restored from the cache),
+        so the interactive callers ask the credentials ahead of the expiry.
+        """
+        return not self.is_authenticated() or (self.needs_refresh() and not self.can_refresh())
+
+    async def _refresh(self) -> bool:
+        if not self._password:
+            logger.warning("Token refresh not possible, no credentials in memory (restored from cache)")
+            return False
+
+        logger.info(f"Refreshing token - user: {self.username}")
+        token = await self._request_token(self.username, self._password)
+        if not token:
+            return False
+
+        self._set_token(self.username, token)
+        if self.token_cache:
+            self.token_cache.save({"username": self.username, "token": token})
+        return True
+
+    async def _refresh_with_cooldown(self) -> bool:
+        try:
+            refreshed = await self._refresh()
+        except Exception as e:
+            logger.error(f"Token refresh failed. Reason: {e}")
+            refreshed = False
+
+        if not refreshed:
+            # the next callers keep the current token (while valid) instead of hammering the identity endpoint
+            cooldown = min(self.refresh_cooldown * 2 ** self._refresh_failures, TOKEN_REFRESH_MAX_COOLDOWN)
+            self._refresh_failures += 1
+            self._next_refresh_at = time.time() + cooldown
+            logger.warning(f"Token refresh failed ({self._refresh_failures} in a row), next attempt in {cooldown:.0f}s")
+        return refreshed
+
+    async def refresh(self) -> bool:
+        """
+        Refresh the token, concurrent callers share the single in-flight refresh.
+        After a failure no refresh is attempted during a cooldown (doubling up to TOKEN_REFRESH_MAX_COOLDOWN).
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            if time.time() < self._next_refresh_at:
+                return False
+            self._refresh_task = asyncio.ensure_future(self._refresh_with_cooldown())
+        return await asyncio.shield(self._refresh_task)
+
+    async def get_valid_token(self):
+        """
+        Return a token refreshed proactively before its exp, or None when expired and not refreshable.
+        """
+        if self.needs_refresh():
+            await self.refresh()
+
+        if self.is_expired():
+            self.logged_in = False
+            return None
+        return self.user_token
+
+    def get_valid_token_sync(self):
+        # fast path, no hop to the manager loop while the token is fresh (or valid during a refresh cooldown)
+        if not self.needs_refresh() or (time.time() < self._next_refresh_at and not self.is_expired()):
+            return self.user_token
+        return self.run(self.get_valid_token())
 
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
 
     def is_authenticated(self) -> bool:
-        return self.logged_in
+        return self.logged_in and not self.is_expired()
 
     def get_token(self):
         return self.user_token
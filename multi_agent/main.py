@@ -1,21 +1,25 @@
 import os
 import logging
-import boto3
 import re
-import asyncio
 import shutil
 
-from strands import Agent
-from strands.models import BedrockModel
 from strands.telemetry import StrandsTelemetry
 from strands.agent.conversation_manager import SlidingWindowConversationManager
 from strands.session.file_session_manager import FileSessionManager
-from strands_tools import calculator
 
 from memory import memory
 from loginManager import LoginManager
-from inventory_agent import inventory_agent
-from order_agent import order_agent
+from orchestrator import create_main_agent, close_flat_tools, run_turn, AGENT_MODE
+from deadline import TURN_TIMEOUT
+from structured_response import MAIN_RENDER_MODE
+from accounting import SESSION_TOKEN_BUDGET, SESSION_COST_BUDGET
+from warmup import create_warmup
+from workflows import workflow_registry
+from probe import start_probe_server, register_probe, readiness_probe, status_probe
+from health import health_snapshot, HEALTH_POLL_INTERVAL
+from health_poller import create_health_poller
+from models import get_model
+from sub_agents import registry
 
 # -------------------------------------------
 # Startup configuration
@@ -34,6 +38,7 @@ ORDER_MCP_URL = os.getenv("ORDER_MCP_URL")
 OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
 OTEL_RESOURCE_ATTRIBUTES = POD_NAME
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+PROBE_PORT = os.getenv("PROBE_PORT")
 
 print("---" * 15)
 print(f"POD_NAME: {POD_NAME}")
@@ -44,6 +49,13 @@ print(f"ORDER_MCP_URL: {ORDER_MCP_URL}")
 print(f"OTEL_EXPORTER_OTLP_ENDPOINT: {OTEL_EXPORTER_OTLP_ENDPOINT}")
 print(f"OTEL_RESOURCE_ATTRIBUTES: {OTEL_RESOURCE_ATTRIBUTES}")
 print(f"LOG_LEVEL: {LOG_LEVEL}")
+print(f"AGENT_MODE: {AGENT_MODE}")
+print(f"MAIN_RENDER_MODE: {MAIN_RENDER_MODE}")
+print(f"SESSION_TOKEN_BUDGET: {SESSION_TOKEN_BUDGET}")
+print(f"SESSION_COST_BUDGET: {SESSION_COST_BUDGET}")
+print(f"PROBE_PORT: {PROBE_PORT}")
+print(f"TURN_TIMEOUT: {TURN_TIMEOUT}")
+print(f"HEALTH_POLL_INTERVAL: {HEALTH_POLL_INTERVAL}")
 print("---" * 15)
 
 # Setup telemetry
@@ -53,35 +65,6 @@ strands_telemetry.setup_meter(
     enable_console_exporter=False,
     enable_otlp_exporter=True)  
 
-# Define a focused system prompt for file operations
-MAIN_SYSTEM_PROMPT = """
-    You are MAIN agent an orchestrator designed to coordinate support across multiple agents.
-
-    Available Tools Agents:
-    - inventory_agent
-    - order_agent
-    - calculator
-
-    Tool Usage Rules:
-    - Use MCP tools ONLY when required to answer the user query.
-    - NEVER call the same tool more than once for the same request.
-    - After a tool successfully returns the required data, STOP and return a final response.
-    - If no tool is required, answer directly.
-
-    Response Rules:
-    - Tool outputs are authoritative.
-    - Do NOT re-call tools to “confirm” results.
-    - Do NOT modify field names or formats returned by tools.
-    - Return a final user-facing answer after tool execution.
-
-    Termination Rules (VERY IMPORTANT):
-    - Once the required information is obtained from a tool, do NOT call any more tools.
-    - Produce a final response immediately.
-
-    Failure Rules:
-    - If a tool returns an error, report it and STOP.
-"""
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -91,19 +74,20 @@ logger = logging.getLogger(__name__)
 #model_id = "arn:aws:bedrock:us-east-2:908671954593:inference-profile/us.amazon.nova-pro-v1:0"  
 
 logger.info('\033[1;33m Starting the Main Agent... \033[0m')
-logger.info(f'\033[1;33m model_id: {MODEL_ID} \033[0m \n')
+logger.info(f'\033[1;33m model_id: {MODEL_ID} - mode: {AGENT_MODE} \033[0m \n')
 
-# Create boto3 session
-session = boto3.Session(
-    region_name=REGION,
-)
+# Warm up (mcp sessions, tool catalogs, aws credentials, bedrock connections) in background while the user logs in
+model_tiers = {"default"} | {spec.model_tier for spec in registry.specs()}
+warmup = create_warmup(models={tier: get_model(tier) for tier in model_tiers},
+                       mcp_connections=registry.mcp_connections(),
+                       checks={"workflows": workflow_registry.check_tools})
+warmup.start()
 
-# Create Bedrock model
-bedrock_model = BedrockModel(
-        model_id=MODEL_ID,
-        temperature=0.0,
-        boto_session=session,
-)
+# Readiness probe backed by the warm up, services status backed by the health snapshot
+if PROBE_PORT:
+    register_probe("/ready", readiness_probe(warmup))
+    register_probe("/status", status_probe(health_snapshot))
+    start_probe_server(int(PROBE_PORT))
 
 # Create a conversation manager with custom window size
 conversation_manager = SlidingWindowConversationManager(
@@ -116,16 +100,9 @@ session_manager = FileSessionManager(session_id=SESSION_ID,
                                      storage_dir="./sessions")
 
 # create strands agent
-agent_main = Agent(name="main",
-                   system_prompt=MAIN_SYSTEM_PROMPT, 
-                   model=bedrock_model,
-                   tools=[inventory_agent, 
-                          order_agent,
-                          calculator,
-                          ], 
-                   conversation_manager=conversation_manager,
-                   session_manager=session_manager,
-                   callback_handler=None)
+agent_main = create_main_agent(mode=AGENT_MODE,
+                               conversation_manager=conversation_manager,
+                               session_manager=session_manager)
 
 # Clean the final response
 def strip_thinking(text: str) -> str:
@@ -152,6 +129,22 @@ def clear_session(session_manager):
     else:
         logger.info(f"Directory not found: {session_dir}")
 
+# Interactive login
+def prompt_login(loginManager: LoginManager) -> None:
+    """
+    Ask the credentials until the login succeeds.
+    """
+    while loginManager.needs_login():
+        username = input("username: ")
+        password = input("password: ")
+
+        res_login = loginManager.run(loginManager.login(username, password))
+
+        if res_login:
+            print('\033[1;31m login succesfull, lets go ... \033[0m \n')
+        else:
+            print('\033[1;31m credentials invalid !, try again ... \033[0m \n')
+
 # Example usage
 if __name__ == "__main__":
     print('\033[1;33m Multi Agent v 0.5 \033[0m \n')
@@ -160,22 +153,23 @@ if __name__ == "__main__":
     print('\033[1;31m Please login before continuing ... \033[0m \n')
     
     loginManager = LoginManager()
-    
-    while not loginManager.is_authenticated():
-        username = input("username: ")
-        password = input("password: ")
 
-        res_login = asyncio.run(loginManager.login(username, password))
+    # skip the interactive login while the cached (encrypted) token is valid
+    if loginManager.load_cached_token():
+        print(f'\033[1;31m welcome back {loginManager.username}, lets go ... \033[0m \n')
 
-        if res_login:
-            print('\033[1;31m login succesfull, lets go ... \033[0m \n')
-        else:
-            print('\033[1;31m credentials invalid !, try again ... \033[0m \n')
-            continue
+    prompt_login(loginManager)
+
+    # set a token singleton memory, the provider refreshes the token before it expires
+    memory.set_token(loginManager.get_token())
+    memory.set_token_provider(loginManager.get_valid_token_sync)
+    logger.info(f"token: {memory.get_token()}")
 
-        # set a token singleton memory
-        memory.set_token(loginManager.get_token())
-        logger.info(f"token: {memory.get_token()}")
+    # health checks in background (with the login token), the health queries are served from the snapshot
+    health_poller = create_health_poller()
+    health_poller.start()
+
+    logger.info(f"warm up: {warmup.report()}")
 
     # Interactive loop
     while True:
@@ -187,35 +181,40 @@ if __name__ == "__main__":
             if user_input.lower() == "exit":
                 print("\nGoodbye!")
                 clear_session(session_manager)
+                close_flat_tools()
+                loginManager.run(loginManager.close())
                 break
             elif user_input.lower() == "quit":
                 print("\nGoodbye!")
                 clear_session(session_manager)
+                close_flat_tools()
+                loginManager.run(loginManager.close())
                 break
             elif user_input.strip() == "":   
                 print("Please enter a valid message.")
                 continue
 
+            # a token restored from the cache (no password) can not be refreshed, login again before it expires
             token = memory.get_token()
-            if not token:
-                print("No JWT provided, NOT AUTHORIZED !!!")
-                continue
+            if not token or loginManager.needs_login():
+                print('\033[1;31m session expiring, please login again ... \033[0m \n')
+                prompt_login(loginManager)
+                memory.set_token(loginManager.get_token())
     
             print('\033[1;31m ...Processing... \033[0m \n')    
 
-            response = agent_main(user_input.strip())
+            final_response = run_turn(agent_main, user_input.strip(), AGENT_MODE, session_id=SESSION_ID)
 
             print('\033[44m *.*.* \033[0m' * 15)
 
-            #clean response
-            final_response = str(response)
-
             print(f'\033[1;33m {strip_thinking(final_response.strip())} \033[0m \n')
             print('\033[44m *.*.* \033[0m' * 15)
             print("\n\n")
         except KeyboardInterrupt:
             print("\n\nExecution interrupted. Exiting...")
             clear_session(session_manager)
+            close_flat_tools()
+            loginManager.run(loginManager.close())
             break
         except Exception as e:
             print(f"\nAn error occurred: {str(e)}")
@@ -2,7 +2,6 @@ import os
 import logging
 import boto3
 import re
-import asyncio
 import shutil
 from dotenv import load_dotenv
 
@@ -14,8 +13,7 @@ from strands.session.file_session_manager import FileSessionManager
 
 from mainMemory import mainMemory
 from loginManager import LoginManager
-from inventory_agent import inventory_agent
-from order_agent import order_agent
+from sub_agents import inventory_agent, order_agent
 from strands_tools import calculator
 
 # -------------------------------------------
@@ -159,7 +157,7 @@ if __name__ == "__main__":
         username = input("username: ")
         password = input("password: ")
 
-        res_login = asyncio.run(loginManager.login(username, password))
+        res_login = loginManager.run(loginManager.login(username, password))
 
         if res_login:
             print('\033[1;31m login succesfull, lets go ... \033[0m \n')
@@ -181,10 +179,12 @@ if __name__ == "__main__":
             if user_input.lower() == "exit":
                 print("\nGoodbye!")
                 clear_session(session_manager)
+                loginManager.run(loginManager.close())
                 break
             elif user_input.lower() == "quit":
                 print("\nGoodbye!")
                 clear_session(session_manager)
+                loginManager.run(loginManager.close())
                 break
             elif user_input.strip() == "":   
                 print("Please enter a valid message.")
@@ -210,6 +210,7 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("\n\nExecution interrupted. Exiting...")
             clear_session(session_manager)
+            loginManager.run(loginManager.close())
             break
         except Exception as e:
             print(f"\nAn error occurred: {str(e)}")
@@ -0,0 +1,150 @@
+import logging
+import threading
+
+from mcp.client.streamable_http import streamablehttp_client
+
+from strands.tools.mcp.mcp_client import MCPClient
+
+from resilience import ResilientMCPTool, LatencyTracker, create_breaker
+from cassette import CASSETTE_MODE, record_tools, replay_tools
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class McpConnection:
+    """
+    Long lived MCP session for one server url.
+    The session is started once and its tool catalog is cached, so a query does not pay for connect and list_tools.
+    The tools are wrapped with the resilience layer (circuit breaker of this server, retries, hedging).
+    With CASSETTE_MODE=record the results are recorded, with CASSETTE_MODE=replay the server is not contacted.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client = MCPClient(self._create_transport)
+        self._lock = threading.Lock()
+        self._recover_lock = threading.Lock()
+        self._started = False
+        self._tools = None
+        self._wrappers = {}     # tool name => ResilientMCPTool, kept across reconnects
+        self.generation = 0     # incremented on each reset
+        self.breaker = create_breaker(url)
+        self.latency = {}
+
+    def _create_transport(self):
+        # no trace headers: the session outlives the requests, each call carries the _trace of its own span
+        return streamablehttp_client(self.url)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            if CASSETTE_MODE == "replay":
+                self._started = True
+                return
+            logger.info(f"Starting mcp session: {self.url}")
+            try:
+                self.client.start()
+            except Exception:
+                # a failed start leaves the client unusable, the next use starts a new one
+                self.client = MCPClient(self._create_transport)
+                raise
+            self._started = True
+
+    def is_started(self) -> bool:
+        return self._started
+
+    def list_tools(self, allowed_tools: list = None) -> list:
+        """
+        Return the (cached) MCP tools, filtered by allowed_tools when informed.
+        """
+        self.start()
+
+        with self._lock:
+            if self._tools is None:
+                self._tools = [self._bind(t) for t in self._load_tools()]
+                logger.info(f"MCP tools loaded from {self.url}: {[t.tool_name for t in self._tools]}")
+            tools = self._tools
+
+        if allowed_tools is None:
+            return list(tools)
+
+        return [t for t in tools if t.tool_name in allowed_tools]
+
+    def _bind(self, tool) -> ResilientMCPTool:
+        """
+        Wrap a tool of the current session; after a reconnect the wrapper already handed out (to agents
+        in flight) is rebound to the new session instead of being replaced.
+        """
+        wrapper = self._wrappers.get(tool.tool_name)
+        if wrapper is None:
+            wrapper = ResilientMCPTool(tool, self.breaker, self.latency.setdefault(tool.tool_name, LatencyTracker()), connection=self)
+            self._wrappers[tool.tool_name] = wrapper
+        else:
+            wrapper.tool = tool
+        return wrapper
+
+    def _load_tools(self) -> list:
+        if CASSETTE_MODE == "replay":
+            return replay_tools(self.url)
+        tools = self.client.list_tools_sync()
+        if CASSETTE_MODE == "record":
+            return record_tools(self.url, tools)
+        return tools
+
+    def reset(self) -> None:
+        """
+        Stop the session and drop the tool catalog, the next use reconnects.
+        """
+        with self._lock:
+            if self._started and CASSETTE_MODE != "replay":
+                try:
+                    self.client.stop(None, None, None)
+                except Exception as e:
+                    logger.error(f"Failed to stop mcp session {self.url}. Reason: {e}")
+            self.client = MCPClient(self._create_transport)
+            self._started = False
+            self._tools = None
+            self.generation += 1
+
+    def recover(self, generation: int) -> None:
+        """
+        Replace a broken session (MCP transport error seen on the given generation).
+        The callers that saw the same broken session share a single reconnect, and the tool wrappers
+        in use are rebound to the new session, so the session is never reset from a request path.
+        """
+        with self._recover_lock:
+            if generation != self.generation:
+                return  # already replaced
+            logger.warning(f"Reconnecting the broken mcp session: {self.url}")
+            self.reset()
+            try:
+                self.list_tools()
+            except Exception as e:
+                logger.error(f"Failed to reconnect mcp session {self.url}. Reason: {e}")
+
+class McpPool:
+    """One McpConnection per server url, shared by every agent of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def get(self, url: str) -> McpConnection:
+        with self._lock:
+            connection = self._connections.get(url)
+            if connection is None:
+                connection = McpConnection(url)
+                self._connections[url] = connection
+            return connection
+
+    def connections(self) -> list:
+        with self._lock:
+            return list(self._connections.values())
+
+    def close(self) -> None:
+        for connection in self.connections():
+            connection.reset()
+
+# global instance
+mcp_pool = McpPool()
@@ -5,12 +5,19 @@ class Memory:
         if cls._instance is None:
             cls._instance = super(Memory, cls).__new__(cls)
             cls._instance.jwt = None
+            cls._instance.token_provider = None
         return cls._instance
 
     def set_token(self, jwt: str):
         self.jwt = jwt
 
+    def set_token_provider(self, token_provider):
+        # callable returning a valid (refreshed) token, takes precedence over the static jwt
+        self.token_provider = token_provider
+
     def get_token(self) -> str:
+        if self.token_provider is not None:
+            return self.token_provider()
         return self.jwt
 
 # global instance
@@ -0,0 +1,72 @@
+import os
+import logging
+import threading
+import boto3
+
+from strands.models import BedrockModel
+from strands.models.model import Model
+
+from cassette import CassetteModel, cassette, CASSETTE_MODE
+from scheduler import ScheduledModel, get_scheduler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+REGION = os.getenv("REGION")
+MODEL_ID = os.getenv("MODEL_ID")
+MODEL_ID_LITE = os.getenv("MODEL_ID_LITE") or MODEL_ID  # cheaper model for simple domains
+
+# model tier => model id
+MODEL_TIERS = {
+    "default": MODEL_ID,
+    "lite": MODEL_ID_LITE,
+}
+
+# Create boto3 session (shared by every model)
+session = boto3.Session(
+    region_name=REGION,
+)
+
+_models = {}
+_lock = threading.Lock()
+
+def get_model(tier: str = "default") -> Model:
+    """
+    Return the shared Bedrock model of a tier, created on first use.
+    Tiers with the same model id share the same model (and its client connection pool).
+    With CASSETTE_MODE=record the model stream is recorded, with CASSETTE_MODE=replay Bedrock is not called.
+    Every call goes through the admission control (rate limits, priority queue) of the model id.
+    """
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"Invalid model tier: {tier}, expected one of {list(MODEL_TIERS)}")
+    model_id = MODEL_TIERS[tier]
+    if not model_id:
+        raise ValueError("MODEL_ID is not set, export the Bedrock model id (or inference profile arn) to run the agents")
+
+    with _lock:
+        model = _models.get(model_id)
+        if model is None:
+            logger.info(f'\033[1;33m Creating model - tier: {tier} : {model_id} \033[0m')
+
+            if CASSETTE_MODE == "replay":
+                model = CassetteModel(None, model_id, cassette)
+            else:
+                # Create Bedrock model
+                model = BedrockModel(
+                        model_id=model_id,
+                        temperature=0.0,
+                        boto_session=session,
+                )
+                if CASSETTE_MODE == "record":
+                    model = CassetteModel(model, model_id, cassette)
+            model = ScheduledModel(model, get_scheduler(model_id))
+            _models[model_id] = model
+        return model
+
+def loaded_models() -> dict:
+    """
+    model id => model, for the models already created.
+    """
+    with _lock:
+        return dict(_models)
@@ -0,0 +1,328 @@
+import os
+import logging
+import weakref
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from strands import Agent
+from strands.hooks import MessageAddedEvent
+from strands_tools import calculator
+
+from memory import memory
+from mcp_pool import mcp_pool
+from models import get_model, MODEL_TIERS
+from sub_agents import registry
+from entity_store import EntityStoreHook, recall_entity, store_for
+from health import service_health
+from workflows import workflow_registry
+from deadline import Deadline, DeadlineModel, DeadlineExceeded, TurnContext, current_turn, timeout_response, TURN_TIMEOUT
+from structured_response import TurnRender, MAIN_RENDER_MODE, RENDER_MODES, error_envelope
+from scheduler import OverloadedError
+from accounting import TurnUsage, UsageHook, start_turn, check_budget, check_degrade_tier, budget_response, token_user
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# nested => main agent delegates to the registered sub-agents (one LLM loop per domain)
+# flat   => main agent calls the filtered MCP tools directly (single LLM loop)
+AGENT_MODE = os.getenv("AGENT_MODE", "nested")
+AGENT_MODES = ("nested", "flat")
+
+# how long a turn cancelled at its deadline is awaited before the response, it must stop at its next model or tool call
+TURN_CANCEL_GRACE = float(os.getenv("TURN_CANCEL_GRACE", "10"))
+
+# Define a focused system prompt for the nested orchestration
+MAIN_SYSTEM_PROMPT = """
+    You are MAIN agent an orchestrator designed to coordinate support across multiple agents.
+
+    Available Tools Agents:
+{agents}
+{workflows}
+    - recall_entity
+    - service_health
+    - calculator
+
+    Tool Usage Rules:
+    - For a full purchase (create an order and checkout it with payments), call checkout_workflow once with all the parameters.
+    - For health status questions, use service_health first and delegate to an agent only when it is not found.
+    - For follow-up questions about a product, inventory or order already shown in this conversation, use recall_entity first and delegate to an agent only when it is not found.
+    - Use MCP tools ONLY when required to answer the user query.
+    - NEVER call the same tool more than once for the same request.
+    - After a tool successfully returns the required data, STOP and return a final response.
+    - If no tool is required, answer directly.
+
+    Response Rules:
+    - Tool outputs are authoritative.
+    - Do NOT re-call tools to “confirm” results.
+    - Do NOT modify field names or formats returned by tools.
+    - Return a final user-facing answer after tool execution.
+
+    Termination Rules (VERY IMPORTANT):
+    - Once the required information is obtained from a tool, do NOT call any more tools.
+    - Produce a final response immediately.
+
+    Failure Rules:
+    - If a tool returns an error, report it and STOP.
+"""
+
+# Define a single prompt merging the INVENTORY and ORDER guidance for the flat orchestration
+FLAT_SYSTEM_PROMPT = """
+    You are MAIN agent specialized in inventory, product and order operations.
+
+    Available Tools:
+    - INVENTORY: inventory_health, get_product, get_inventory, create_inventory, update_inventory
+    - ORDER: order_health, get_order, create_order, checkout_order
+    - WORKFLOWS: {workflows}
+    - recall_entity
+    - service_health
+    - calculator
+
+    Tool Usage Rules:
+    - For a full purchase (create an order and checkout it with payments), call checkout_workflow once with all the parameters.
+    - Use MCP tools ONLY when required to answer the user query.
+    - NEVER call the same tool more than once for the same request.
+    - After a tool successfully returns the required data, STOP and return a final response.
+    - If no tool is required, answer directly.
+    - For follow-up questions about a product, inventory or order already shown in this conversation, use recall_entity first.
+    - Use the inventory_health and order_health tools only if a clear request about health is made, and only when service_health has no recent check.
+    - A checkout (payment) of an order receives a LIST of payments.
+
+    Response Rules:
+    - Tool outputs are authoritative.
+    - Do NOT re-call tools to “confirm” results.
+    - Do NOT modify field names or formats returned by tools.
+    - Return a final user-facing answer after tool execution.
+
+    Termination Rules (VERY IMPORTANT):
+    - Once the required information is obtained from a tool, do NOT call any more tools.
+    - Produce a final response immediately.
+
+    Failure Rules:
+    - If a tool returns an error, report it and STOP.
+"""
+
+# Shared Bedrock model (same client as the sub-agents of the default tier)
+bedrock_model = get_model("default")
+check_degrade_tier(MODEL_TIERS["default"], MODEL_TIERS["lite"])
+
+# Threads running the user turns, so the entry point can stop waiting when the deadline expires
+turn_executor = ThreadPoolExecutor(thread_name_prefix="turn")
+
+# main agent => its cancelled invocation still running after the grace period
+_cancelled_turns = weakref.WeakKeyDictionary()
+
+def wait_cancelled_turn(agent: Agent, timeout: float) -> bool:
+    """
+    Wait for the cancelled invocation of the agent (if any) to finish, an Agent runs one invocation at a time.
+    Return False when it is still running after the timeout.
+    """
+    future = _cancelled_turns.get(agent)
+    if future is None:
+        return True
+    try:
+        future.result(timeout=timeout)
+    except FutureTimeoutError:
+        return False
+    except Exception:
+        pass
+    _cancelled_turns.pop(agent, None)
+    return True
+
+def open_flat_tools() -> list:
+    """
+    Return the filtered MCP tools of every registered sub-agent, from the pooled MCP sessions.
+    """
+    logger.info("function => open_flat_tools")
+
+    selected_tools = []
+    for spec in registry.specs():
+        selected_tools.extend(registry.mcp_tools(spec.name))
+
+    logger.info(f"Available MCP tools (flat): {[t.tool_name for t in selected_tools]}")
+    return selected_tools
+
+def close_flat_tools() -> None:
+    """
+    Stop the pooled MCP sessions.
+    """
+    mcp_pool.close()
+
+def create_main_agent(mode: str = AGENT_MODE,
+                      conversation_manager=None,
+                      session_manager=None,
+                      hooks=None) -> Agent:
+    """
+    Create the main agent for the given orchestration mode (nested or flat).
+    """
+    if mode not in AGENT_MODES:
+        raise ValueError(f"Invalid AGENT_MODE: {mode}, expected one of {AGENT_MODES}")
+
+    logger.info(f"Creating main agent - mode: {mode}")
+
+    if mode == "flat":
+        workflows = ", ".join(spec.name for spec in workflow_registry.specs())
+        system_prompt = FLAT_SYSTEM_PROMPT.replace("{workflows}", workflows)
+        tools = open_flat_tools() + workflow_registry.tools() + [recall_entity, service_health, calculator]
+    else:
+        agents = "\n".join(f"    - {spec.name}" for spec in registry.specs())
+        workflows = "\n".join(f"    - {spec.name}" for spec in workflow_registry.specs())
+        system_prompt = MAIN_SYSTEM_PROMPT.replace("{agents}", agents).replace("{workflows}", workflows)
+        tools = registry.tools() + workflow_registry.tools() + [recall_entity, service_health, calculator]
+
+    return Agent(name="main",
+                 system_prompt=system_prompt,
+                 model=DeadlineModel(bedrock_model),
+                 tools=tools,
+                 hooks=(hooks or []) + [EntityStoreHook(), UsageHook()],
+                 conversation_manager=conversation_manager,
+                 session_manager=session_manager,
+                 callback_handler=None)
+
+def format_query(query: str, mode: str = AGENT_MODE) -> str:
+    """
+    Prepare the user query for the main agent.
+    The jwt and otel context never go in the prompt (kept in the session), in flat mode the MCP tool wrapper
+    adds them to the calls from invocation_state["jwt"].
+    """
+    if mode != "flat":
+        return query
+
+    return f"""
+        User query: {query}
+
+        If a tool is required, call it.
+        Otherwise, return the final answer.
+    """
+
+def add_message(agent: Agent, message: dict) -> None:
+    """
+    Append a message to the conversation, saved by the session manager (MessageAddedEvent) like the agent ones.
+    """
+    agent.messages.append(message)
+    agent.hooks.invoke_callbacks(MessageAddedEvent(agent=agent, message=message))
+
+def append_rendered(agent: Agent, text: str) -> None:
+    """
+    Close a turn ended by a rendered tool result with the assistant answer (kept in the conversation and the session).
+    """
+    add_message(agent, {"role": "assistant", "content": [{"text": text}]})
+
+def close_failed_turn(agent: Agent, start: int, reason: str) -> None:
+    """
+    Close the conversation of a turn that failed or was cancelled after it added messages (from start), so the
+    roles still alternate on the next turn (Bedrock Converse) and in the saved session: the unanswered tool uses
+    get an error result, then an assistant message ends the turn.
+    """
+    if len(agent.messages) <= start:
+        return
+
+    last = agent.messages[-1]
+    if last["role"] == "assistant":
+        tool_uses = [c["toolUse"] for c in last["content"] if "toolUse" in c]
+        if not tool_uses:
+            return
+        add_message(agent, {"role": "user", "content": [
+            {"toolResult": {"toolUseId": t["toolUseId"], "status": "error", "content": [{"text": reason}]}}
+            for t in tool_uses
+        ]})
+    add_message(agent, {"role": "assistant", "content": [{"text": reason}]})
+
+def invoke_turn(agent: Agent, prompt: str, invocation_state: dict):
+    """
+    Run the invocation (turn thread), a failed one is closed before its future completes, so the next turn
+    of the session never sees its partial messages.
+    """
+    start = len(agent.messages)
+    try:
+        return agent(prompt, invocation_state=invocation_state)
+    except DeadlineExceeded:
+        close_failed_turn(agent, start, "The request was cancelled at its deadline, no answer was given.")
+        raise
+    except Exception as e:
+        close_failed_turn(agent, start, f"The request failed ({type(e).__name__}), no answer was given.")
+        raise
+
+def run_turn(agent: Agent,
+             query: str,
+             mode: str = AGENT_MODE,
+             timeout: float = TURN_TIMEOUT,
+             token: str = None,
+             render_mode: str = MAIN_RENDER_MODE,
+             session_id: str = None) -> str:
+    """
+    Run one user turn bounded by a deadline.
+    The deadline is passed down to the sub-agents and MCP tools (invocation_state), bounds the main model calls
+    and, once expired, the turn is cancelled and a structured timeout error is returned; the cancelled invocation
+    is awaited (TURN_CANCEL_GRACE, then at the start of the next turn), so an agent never runs two invocations.
+    A failed or cancelled invocation is closed (close_failed_turn), so the next turn starts on a valid history.
+    The token (server mode, one jwt per request) is passed down the same way, otherwise the memory token is used.
+    In template render mode (nested only) a single structured sub-agent result is rendered as the final answer.
+    The tokens of the turn (main agent and sub-agents) are accounted to the session and user; a session near its
+    budget runs on the lite tier in template mode, and an exhausted one is refused.
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Invalid MAIN_RENDER_MODE: {render_mode}, expected one of {RENDER_MODES}")
+
+    deadline = Deadline(timeout)
+
+    if not wait_cancelled_turn(agent, deadline.remaining()):
+        logger.error(f"Session {session_id} previous turn still running after its cancel")
+        return timeout_response(deadline, "previous turn of the session")
+
+    budget = check_budget(agent)
+    if budget == "refuse":
+        logger.warning(f"Session {session_id} budget exceeded, turn refused")
+        return budget_response(agent)
+
+    model_tier = "lite" if budget == "degrade" else None
+    if model_tier is not None:
+        logger.warning(f"Session {session_id} near its budget, turn degraded to the {model_tier} tier in template mode")
+        render_mode = "template"
+
+    # the deadline and model tier of this invocation, read by the main agent DeadlineModel
+    context = contextvars.copy_context()
+    context.run(current_turn.set, TurnContext(deadline, get_model(model_tier or "default")))
+
+    usage = TurnUsage(session_id, token_user(token or memory.get_token()))
+    start_turn(agent, usage)
+
+    turn_render = TurnRender() if render_mode == "template" and mode == "nested" else None
+
+    invocation_state = {
+        "deadline": deadline,
+        "jwt": token,
+        "entity_store": store_for(agent),
+        "render": turn_render,
+        "usage": usage,
+        "model_tier": model_tier,
+    }
+
+    future = turn_executor.submit(context.run,
+                                  invoke_turn,
+                                  agent,
+                                  format_query(query, mode),
+                                  invocation_state)
+    try:
+        result = future.result(timeout=deadline.remaining())
+        if turn_render is not None and turn_render.text is not None:
+            append_rendered(agent, turn_render.text)
+            return turn_render.text
+        return str(result)
+    except FutureTimeoutError:
+        logger.error(f"Turn exceeded its deadline of {timeout:.0f}s, cancelling")
+        deadline.cancel()
+        # the next turn of the session must not run on the agent before this invocation stops
+        _cancelled_turns[agent] = future
+        wait_cancelled_turn(agent, TURN_CANCEL_GRACE)
+        return timeout_response(deadline, "main agent")
+    except DeadlineExceeded as e:
+        logger.error(f"Deadline exceeded: {e}")
+        return timeout_response(deadline, "main agent")
+    except OverloadedError as e:
+        logger.warning(f"Turn rejected: {e}")
+        return error_envelope("OVERLOADED", "The service is busy, please try again in a few seconds")
+    except Exception:
+        if deadline.expired():
+            return timeout_response(deadline, "main agent")
+        raise
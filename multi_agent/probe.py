@@ -0,0 +1,68 @@
+import json
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# path => callable returning (http status, json body)
+routes = {
+    "/live": lambda: (200, {"status": "alive"}),
+}
+
+def register_probe(path: str, func) -> None:
+    routes[path] = func
+
+class ProbeHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        func = routes.get(self.path.split("?")[0])
+        if func is None:
+            status, body = 404, {"status": "not found"}
+        else:
+            try:
+                status, body = func()
+            except Exception as e:
+                status, body = 500, {"status": "error", "reason": str(e)}
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(f"probe {self.address_string()} {format % args}")
+
+def start_probe_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serve the registered probes (liveness, readiness ...) in a daemon thread.
+    """
+    server = ThreadingHTTPServer((host, port), ProbeHandler)
+    thread = threading.Thread(target=server.serve_forever, name="probe", daemon=True)
+    thread.start()
+
+    logger.info(f"Probe server listening on {host}:{port} - routes: {list(routes)}")
+    return server
+
+def status_probe(snapshot):
+    """
+    Services status from the health snapshot (no MCP call): 200 when every service is fresh and healthy, 503 otherwise.
+    """
+    def probe():
+        report = snapshot.report()
+        healthy = bool(report) and all(e["fresh"] and e["status"] == "success" for e in report.values())
+        return (200 if healthy else 503), {"healthy": healthy, "services": report}
+    return probe
+
+def readiness_probe(warmup):
+    """
+    Readiness backed by the warm up: 200 once every step is ok, 503 otherwise.
+    """
+    def probe():
+        report = warmup.report()
+        return (200 if report["ready"] else 503), report
+    return probe
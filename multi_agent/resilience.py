@@ -0,0 +1,418 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+
+from collections import deque
+
+from opentelemetry import metrics, propagate
+from opentelemetry.metrics import Observation
+
+from strands.types.tools import AgentTool
+from strands.types.exceptions import MCPClientInitializationError
+
+from memory import memory
+from deadline import get_deadline, DeadlineExceeded
+from entity_store import get_entity_store
+from compaction import compact_result
+from health import health_snapshot, HEALTH_TOOLS
+from singleflight import mcp_singleflight, call_key, identity, SINGLEFLIGHT_ENABLED
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+MCP_RETRY_ATTEMPTS = int(os.getenv("MCP_RETRY_ATTEMPTS", "3"))
+MCP_RETRY_BASE_DELAY = float(os.getenv("MCP_RETRY_BASE_DELAY", "0.2"))
+MCP_RETRY_MAX_DELAY = float(os.getenv("MCP_RETRY_MAX_DELAY", "2.0"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "15"))
+MCP_HEDGE_ENABLED = os.getenv("MCP_HEDGE_ENABLED", "false").lower() == "true"
+MCP_HEDGE_DELAY = float(os.getenv("MCP_HEDGE_DELAY", "1.0"))  # used until there are enough samples for the p95
+MCP_BREAKER_FAILURES = int(os.getenv("MCP_BREAKER_FAILURES", "5"))
+MCP_BREAKER_RESET = float(os.getenv("MCP_BREAKER_RESET", "30"))
+MCP_TRANSIENT_ERRORS = os.getenv("MCP_TRANSIENT_ERRORS", "timeout|timed out|unavailable|connection|502|503|504|temporar")
+MCP_SESSION_ERRORS = os.getenv("MCP_SESSION_ERRORS", "session is not running|closedresourceerror|closed resource|brokenresourceerror|connection closed|broken pipe")
+
+# Idempotent tools, safe to retry and hedge (writes are never replayed)
+READ_TOOLS = {
+    "inventory_health",
+    "get_product",
+    "get_inventory",
+    "order_health",
+    "get_order",
+}
+
+# Request context of the MCP tools, filled by the wrapper (never by the model, never in the prompt)
+CONTEXT_FIELDS = ("jwt", "x-request-id", "_trace")
+
+transient_errors = re.compile(MCP_TRANSIENT_ERRORS, re.IGNORECASE)
+session_errors = re.compile(MCP_SESSION_ERRORS, re.IGNORECASE)
+
+# Metrics
+meter = metrics.get_meter(__name__)
+tool_calls_counter = meter.create_counter("mcp.tool.calls", description="MCP tool calls by outcome")
+tool_retries_counter = meter.create_counter("mcp.tool.retries", description="MCP tool call retries")
+tool_hedges_counter = meter.create_counter("mcp.tool.hedges", description="MCP hedged (duplicated) tool calls")
+tool_duration_histogram = meter.create_histogram("mcp.tool.duration", unit="s", description="MCP tool call duration")
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker of a MCP server is open (fail fast)."""
+    pass
+
+class CircuitBreaker:
+    """
+    Per server circuit breaker.
+    closed => calls flow; open => fail fast for reset_timeout; half_open => one trial call decides.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = MCP_BREAKER_FAILURES, reset_timeout: float = MCP_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit breaker open for {self.name}, failing fast")
+                self._set_state(self.HALF_OPEN)
+
+            if self.state == self.HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError(f"Circuit breaker half open for {self.name}, trial call in flight")
+                self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def release(self) -> None:
+        # the call ended without telling anything about the server (e.g. caller deadline)
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        logger.warning(f"Circuit breaker {self.name}: {self.state} => {state}")
+        self.state = state
+
+# every breaker created, observed by the state gauge
+breakers = []
+
+def create_breaker(name: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(name)
+    breakers.append(breaker)
+    return breaker
+
+def observe_breakers(options):
+    return [Observation(CircuitBreaker.STATE_VALUES[b.state], {"server": b.name}) for b in breakers]
+
+meter.create_observable_gauge("mcp.circuit_breaker.state",
+                              callbacks=[observe_breakers],
+                              description="MCP circuit breaker state (0 closed, 1 half open, 2 open)")
+
+class LatencyTracker:
+    """Sliding window of the successful call durations, source of the hedge delay (p95)."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, duration: float) -> None:
+        self.samples.append(duration)
+
+    def p95(self):
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(MCP_RETRY_MAX_DELAY, MCP_RETRY_BASE_DELAY * (2 ** attempt)))
+
+def result_of(event):
+    # the tool stream yields either the ToolResult dict or an event wrapping it
+    return getattr(event, "tool_result", event)
+
+def is_transient_failure(result: dict) -> bool:
+    if not isinstance(result, dict) or result.get("status") != "error":
+        return False
+    return bool(transient_errors.search(result_text(result)))
+
+def result_text(result: dict) -> str:
+    return " ".join(c.get("text", "") for c in result.get("content", []) if isinstance(c, dict))
+
+def is_session_error(error) -> bool:
+    """
+    The pooled MCP session is broken (stopped client, closed stream), the transport needs a reconnect.
+    Model, validation or tool errors never reset the session.
+    """
+    if isinstance(error, dict):
+        return error.get("status") == "error" and bool(session_errors.search(result_text(error)))
+    if isinstance(error, (MCPClientInitializationError, ConnectionError)):
+        return True
+    return bool(session_errors.search(f"{type(error).__name__} {error}"))
+
+def error_result(tool_use: dict, reason: str) -> dict:
+    return {
+        "toolUseId": tool_use.get("toolUseId"),
+        "status": "error",
+        "content": [{"text": reason}],
+    }
+
+def context_arguments(tool_spec: dict, token: str) -> dict:
+    """
+    The request context (jwt, x-request-id, _trace) declared by the tool input schema,
+    fresh for each call (trace context of the current span).
+    """
+    properties = (tool_spec.get("inputSchema", {}).get("json") or {}).get("properties", {})
+
+    headers = {}
+    propagate.inject(headers)
+
+    context = {"jwt": token, "x-request-id": str(uuid.uuid4()), "_trace": headers}
+    return {k: v for k, v in context.items() if k in properties}
+
+def model_spec(tool_spec: dict) -> dict:
+    """
+    The tool spec shown to the model, without the request context fields (filled by the wrapper).
+    """
+    schema = dict((tool_spec.get("inputSchema") or {}).get("json") or {})
+    if "properties" in schema:
+        schema["properties"] = {k: v for k, v in schema["properties"].items() if k not in CONTEXT_FIELDS}
+    if "required" in schema:
+        schema["required"] = [k for k in schema["required"] if k not in CONTEXT_FIELDS]
+    return dict(tool_spec, inputSchema={"json": schema})
+
+class ResilientMCPTool(AgentTool):
+    """
+    Wrap a MCP tool with a per server circuit breaker, retries with jittered backoff and hedged requests.
+    Retries, hedges and single-flight coalescing apply only to READ_TOOLS (idempotent).
+    The request context (jwt of invocation_state["jwt"] or the memory token, x-request-id, _trace) is added to
+    every call, so the jwt never goes through the prompt nor the session.
+    """
+
+    def __init__(self, tool, breaker: CircuitBreaker, latency: LatencyTracker, connection=None):
+        super().__init__()
+        self.tool = tool
+        self.breaker = breaker
+        self.latency = latency
+        self.connection = connection  # pooled McpConnection, reconnected on a transport error
+        self.idempotent = tool.tool_name in READ_TOOLS
+        self._tool_spec = model_spec(tool.tool_spec)
+
+    @property
+    def tool_name(self) -> str:
+        return self.tool.tool_name
+
+    @property
+    def tool_spec(self):
+        return self._tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return self.tool.tool_type
+
+    def timeout(self, invocation_state: dict) -> float:
+        """
+        Per attempt timeout, shrunk to the remaining budget of the request deadline.
+        """
+        deadline = get_deadline(invocation_state)
+        if deadline is None:
+            return MCP_CALL_TIMEOUT
+
+        deadline.check(f"mcp tool {self.tool_name}")
+        return deadline.clamp(MCP_CALL_TIMEOUT)
+
+    async def _call_once(self, tool_use: dict, invocation_state: dict, **kwargs):
+        last_event = None
+        async for event in self.tool.stream(tool_use, invocation_state, **kwargs):
+            last_event = event
+        return last_event
+
+    async def _call_hedged(self, tool_use: dict, invocation_state: dict, **kwargs):
+        """
+        Start the call, and when it is slower than the p95 start a duplicate; the first good answer wins.
+        """
+        primary = asyncio.ensure_future(self._call_once(tool_use, invocation_state, **kwargs))
+        hedge_delay = self.latency.p95() or MCP_HEDGE_DELAY
+
+        # the calls still running are cancelled on every exit, including the cancellation by the attempt timeout
+        pending = {primary}
+        event = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            logger.info(f"Hedging {self.tool_name} after {hedge_delay:.3f}s")
+            tool_hedges_counter.add(1, {"tool": self.tool_name})
+            pending.add(asyncio.ensure_future(self._call_once(tool_use, invocation_state, **kwargs)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    event = task.result()
+                    if not is_transient_failure(result_of(event)):
+                        return event
+            return event
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _recover(self, generation) -> None:
+        if self.connection is not None:
+            await asyncio.to_thread(self.connection.recover, generation)
+
+    async def _attempt(self, tool_use: dict, invocation_state: dict, **kwargs):
+        timeout = self.timeout(invocation_state)
+        self.breaker.allow()
+        generation = self.connection.generation if self.connection is not None else None
+
+        start = time.monotonic()
+        try:
+            if self.idempotent and MCP_HEDGE_ENABLED:
+                call = self._call_hedged(tool_use, invocation_state, **kwargs)
+            else:
+                call = self._call_once(tool_use, invocation_state, **kwargs)
+            event = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            deadline = get_deadline(invocation_state)
+            if deadline is not None and deadline.expired():
+                # the request ran out of budget, it says nothing about the server health
+                self.breaker.release()
+                raise DeadlineExceeded(f"Deadline of {deadline.timeout:.0f}s exceeded at mcp tool {self.tool_name}")
+            self.breaker.record_failure()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            if is_session_error(e):
+                await self._recover(generation)
+            raise
+
+        duration = time.monotonic() - start
+        tool_duration_histogram.record(duration, {"tool": self.tool_name})
+
+        if is_transient_failure(result_of(event)):
+            self.breaker.record_failure()
+            if is_session_error(result_of(event)):
+                await self._recover(generation)
+        else:
+            self.breaker.record_success()
+            self.latency.add(duration)
+        return event
+
+    async def call(self, tool_use: dict, invocation_state: dict, **kwargs) -> dict:
+        """
+        Call the tool with the breaker, retries and hedging, return the ToolResult.
+        """
+        token = (invocation_state or {}).get("jwt") or memory.get_token()
+        tool_use = dict(tool_use, input={**(tool_use.get("input") or {}), **context_arguments(self.tool.tool_spec, token)})
+
+        attempts = MCP_RETRY_ATTEMPTS if self.idempotent else 1
+        event = None
+
+        deadline = get_deadline(invocation_state)
+
+        for attempt in range(attempts):
+            if attempt > 0:
+                delay = backoff_delay(attempt)
+                if deadline is not None and deadline.remaining() <= delay:
+                    break
+                logger.warning(f"Retrying {self.tool_name} ({attempt + 1}/{attempts}) in {delay:.3f}s")
+                tool_retries_counter.add(1, {"tool": self.tool_name})
+                await asyncio.sleep(delay)
+
+            try:
+                event = await self._attempt(tool_use, invocation_state, **kwargs)
+            except CircuitOpenError as e:
+                logger.error(f"{self.tool_name}: {e}")
+                tool_calls_counter.add(1, {"tool": self.tool_name, "outcome": "circuit_open"})
+                return error_result(tool_use, str(e))
+            except DeadlineExceeded as e:
+                logger.error(f"{self.tool_name}: {e}")
+                tool_calls_counter.add(1, {"tool": self.tool_name, "outcome": "deadline_exceeded"})
+                return error_result(tool_use, str(e))
+            except asyncio.TimeoutError:
+                event = error_result(tool_use, f"Tool execution failed: {self.tool_name} timed out")
+            except Exception as e:
+                event = error_result(tool_use, f"Tool execution failed: {e}")
+
+            if not is_transient_failure(result_of(event)):
+                tool_calls_counter.add(1, {"tool": self.tool_name, "outcome": result_of(event).get("status", "success")})
+                return result_of(event)
+
+        tool_calls_counter.add(1, {"tool": self.tool_name, "outcome": "failed"})
+        return result_of(event)
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        # health queries are answered from the background poller snapshot while fresh
+        if self.tool_name in HEALTH_TOOLS:
+            result = health_snapshot.tool_result(self.tool_name, tool_use.get("toolUseId"))
+            if result is not None:
+                logger.info(f"{self.tool_name} answered from the health snapshot")
+                yield compact_result(self.tool_name, result)
+                return
+
+        # follow-ups are answered from the session entity store while the entity is fresh
+        entity_store = get_entity_store(invocation_state)
+        if entity_store is not None:
+            data = entity_store.lookup(self.tool_name, tool_use.get("input") or {})
+            if data is not None:
+                logger.info(f"{self.tool_name} answered from the session entity store")
+                result = {"toolUseId": tool_use.get("toolUseId"), "status": "success", "content": [{"text": json.dumps(data)}]}
+                yield compact_result(self.tool_name, result)
+                return
+
+        result = await self._stream_result(tool_use, invocation_state, **kwargs)
+
+        # the store keeps the full payload, the model gets the compacted one
+        if entity_store is not None:
+            entity_store.record(self.tool_name, tool_use.get("input") or {}, result)
+        yield compact_result(self.tool_name, result)
+
+    async def _stream_result(self, tool_use, invocation_state, **kwargs) -> dict:
+        if not (self.idempotent and SINGLEFLIGHT_ENABLED):
+            return await self.call(tool_use, invocation_state, **kwargs)
+
+        # concurrent identical reads share one upstream call, the result fans out to every waiter
+        token = (invocation_state or {}).get("jwt") or memory.get_token()
+        key = call_key(self.breaker.name, self.tool_name, identity(token), arguments=tool_use.get("input"))
+        deadline = get_deadline(invocation_state)
+        try:
+            result = await mcp_singleflight.do_async(key,
+                                                     lambda: self.call(tool_use, invocation_state, **kwargs),
+                                                     timeout=deadline.remaining() if deadline is not None else None)
+        except asyncio.TimeoutError:
+            result = error_result(tool_use, f"Deadline exceeded waiting for the in-flight {self.tool_name} call")
+
+        # the leader result carries the leader toolUseId
+        return dict(result, toolUseId=tool_use.get("toolUseId"))
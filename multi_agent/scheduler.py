@@ -0,0 +1,259 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import threading
+
+from opentelemetry import metrics
+from opentelemetry.metrics import Observation
+
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+BEDROCK_RPM = int(os.getenv("BEDROCK_RPM", "0"))          # model requests per minute quota, 0 = no limit
+BEDROCK_TPM = int(os.getenv("BEDROCK_TPM", "0"))          # model tokens per minute quota, 0 = no limit
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))      # waiting new turns, above it they are rejected
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", "30"))      # max queue wait (the turn deadline, when shorter)
+SCHEDULER_THROTTLE_PAUSE = float(os.getenv("SCHEDULER_THROTTLE_PAUSE", "2.0"))  # pause of the admissions after a throttling
+SCHEDULER_OUTPUT_TOKENS = int(os.getenv("SCHEDULER_OUTPUT_TOKENS", "512"))     # output tokens reserved per call (estimate)
+
+# priorities (lower first): model calls of a turn already admitted, then new turns
+PRIORITY_IN_PROGRESS = 0
+PRIORITY_NEW = 1
+PRIORITY_NAMES = {PRIORITY_IN_PROGRESS: "in_progress", PRIORITY_NEW: "new"}
+
+BYTES_PER_TOKEN = 4  # rough estimate of the input tokens from the request size
+
+class OverloadedError(Exception):
+    """The model scheduler queue is full (or the wait exceeds its budget), the new turn is rejected."""
+    pass
+
+# Metrics
+meter = metrics.get_meter(__name__)
+queue_wait_histogram = meter.create_histogram("scheduler.queue_wait", unit="s", description="Time a model call waited for admission")
+rejected_counter = meter.create_counter("scheduler.rejected", description="Turns rejected by the model scheduler (queue full or wait too long)")
+throttled_counter = meter.create_counter("scheduler.throttled", description="Model calls throttled by the service after admission")
+
+schedulers = []
+
+def observe_queue_depth(options):
+    for s in list(schedulers):
+        yield Observation(s.depth(), {"model": s.name})
+
+meter.create_observable_gauge("scheduler.queue_depth", callbacks=[observe_queue_depth], description="Model calls waiting for admission")
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, with a burst of one minute of quota.
+    A rate of 0 means no limit.
+    """
+
+    def __init__(self, rate_per_minute: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until amount is available (0 when available now).
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a call larger than the burst waits for a full bucket
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.rate > 0:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """
+        Correct a previous take with the actual usage (negative gives back).
+        """
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def drain(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.tokens, 0.0)
+
+class Scheduler:
+    """
+    Admission control in front of the model calls: requests and tokens per minute buckets and a priority queue
+    that admits the calls of the turns in progress before the new turns. New turns are rejected fast when the
+    queue is full or when the expected wait exceeds their budget.
+    Shared by the threads (and event loops) of every agent, the waiters poll their turn.
+    """
+
+    def __init__(self, name: str, rpm: int = BEDROCK_RPM, tpm: int = BEDROCK_TPM, max_queue: int = SCHEDULER_MAX_QUEUE):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.enabled = rpm > 0 or tpm > 0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._new_waiting = 0
+        schedulers.append(self)
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    async def acquire(self, tokens: int, priority: int, max_wait: float = SCHEDULER_MAX_WAIT) -> float:
+        """
+        Wait for the admission of a model call of tokens (estimate), return the queue wait.
+        """
+        if not self.enabled:
+            return 0.0
+
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+
+        with self._lock:
+            if priority == PRIORITY_NEW and self._new_waiting >= self.max_queue:
+                rejected_counter.add(1, {"model": self.name, "reason": "queue_full"})
+                raise OverloadedError(f"Model {self.name} queue is full ({self._new_waiting} turns waiting)")
+            heapq.heappush(self._queue, ticket)
+            if priority == PRIORITY_NEW:
+                self._new_waiting += 1
+
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    delay = self._wait_time(tokens, now) if self._queue[0] == ticket else None
+                    if delay == 0.0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        break
+
+                waited = now - start
+                if priority == PRIORITY_NEW and waited + (delay or 0.0) > max_wait:
+                    rejected_counter.add(1, {"model": self.name, "reason": "wait_budget"})
+                    raise OverloadedError(f"Model {self.name} admission wait exceeds {max_wait:.0f}s")
+
+                # the head waits for the buckets, the others check again shortly
+                await asyncio.sleep(min(delay, 1.0) if delay else 0.02)
+        finally:
+            with self._lock:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                if priority == PRIORITY_NEW:
+                    self._new_waiting -= 1
+
+        wait = time.monotonic() - start
+        queue_wait_histogram.record(wait, {"model": self.name, "priority": PRIORITY_NAMES[priority]})
+        if wait > 1.0:
+            logger.info(f"model {self.name} call admitted after {wait:.2f}s ({PRIORITY_NAMES[priority]})")
+        return wait
+
+    def settle(self, estimated: int, used: int) -> None:
+        """
+        Replace the estimated tokens of an admitted call by the tokens it used.
+        """
+        with self._lock:
+            self.tokens.adjust(used - estimated)
+
+    def throttled(self) -> None:
+        """
+        The service throttled an admitted call: drain the buckets and pause the admissions.
+        """
+        throttled_counter.add(1, {"model": self.name})
+        with self._lock:
+            self.requests.drain()
+            self.tokens.drain()
+            self.paused_until = max(self.paused_until, time.monotonic() + SCHEDULER_THROTTLE_PAUSE)
+        logger.warning(f"model {self.name} throttled, admissions paused for {SCHEDULER_THROTTLE_PAUSE}s")
+
+def estimate_tokens(messages, system_prompt) -> int:
+    size = len(str(messages)) + len(str(system_prompt or ""))
+    return size // BYTES_PER_TOKEN + SCHEDULER_OUTPUT_TOKENS
+
+class ScheduledModel(Model):
+    """
+    Wrap a model, so every call goes through the admission of the scheduler of its model id.
+    The turn deadline (passed by the DeadlineModel) gives the priority and bounds the queue wait:
+    the calls of a turn already admitted once go first.
+    """
+
+    def __init__(self, model: Model, scheduler: Scheduler):
+        self.model = model
+        self.scheduler = scheduler
+
+    @property
+    def config(self):
+        return self.model.config
+
+    def update_config(self, **model_config) -> None:
+        self.model.update_config(**model_config)
+
+    def get_config(self):
+        return self.model.get_config()
+
+    async def _admit(self, messages, system_prompt, deadline) -> int:
+        priority = PRIORITY_IN_PROGRESS if deadline is not None and deadline.admitted else PRIORITY_NEW
+        max_wait = deadline.clamp(SCHEDULER_MAX_WAIT) if deadline is not None else SCHEDULER_MAX_WAIT
+
+        estimated = estimate_tokens(messages, system_prompt)
+        await self.scheduler.acquire(estimated, priority, max_wait)
+        if deadline is not None:
+            deadline.admitted = True
+        return estimated
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, deadline=None, **kwargs):
+        estimated = await self._admit(messages, system_prompt, deadline)
+
+        used = None
+        try:
+            async for event in self.model.stream(messages, tool_specs=tool_specs, system_prompt=system_prompt, **kwargs):
+                usage = event.get("metadata", {}).get("usage") if isinstance(event, dict) else None
+                if usage:
+                    used = usage.get("totalTokens")
+                yield event
+        except ModelThrottledException:
+            self.scheduler.throttled()
+            raise
+        finally:
+            if used is not None:
+                self.scheduler.settle(estimated, used)
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, deadline=None, **kwargs):
+        await self._admit(prompt, system_prompt, deadline)
+        try:
+            async for event in self.model.structured_output(output_model, prompt, system_prompt=system_prompt, **kwargs):
+                yield event
+        except ModelThrottledException:
+            self.scheduler.throttled()
+            raise
+
+_schedulers = {}
+_lock = threading.Lock()
+
+def get_scheduler(model_id: str) -> Scheduler:
+    """
+    One scheduler per model id (the Bedrock quotas are per model).
+    """
+    with _lock:
+        scheduler = _schedulers.get(model_id)
+        if scheduler is None:
+            scheduler = Scheduler(model_id)
+            _schedulers[model_id] = scheduler
+        return scheduler
@@ -0,0 +1,442 @@
+import os
+import gc
+import re
+import sys
+import json
+import zlib
+import time
+import hashlib
+import signal
+import asyncio
+import logging
+import threading
+
+from collections import OrderedDict
+
+from aiohttp import web, ClientSession, ClientTimeout, ClientConnectionError
+
+# Shared imports, loaded once in the supervisor before the fork (copy-on-write in the workers)
+from strands.telemetry import StrandsTelemetry
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands.session.file_session_manager import FileSessionManager
+
+from orchestrator import create_main_agent, run_turn, AGENT_MODE
+from health import health_snapshot
+from health_poller import create_health_poller
+from deadline import TURN_TIMEOUT
+from structured_response import MAIN_RENDER_MODE, error_envelope
+from warmup import create_warmup
+from workflows import workflow_registry
+from models import get_model
+from sub_agents import registry
+from loginManager import decode_jwt_claims, decode_jwt_exp
+
+# -------------------------------------------
+# Server mode: pre-forked workers with sticky session routing
+#
+#   supervisor (master) => forks the router and SERVER_WORKERS workers, respawns them when they exit
+#   router              => SERVER_PORT, forwards /chat to the worker owning the session (crc32(session_id) % workers)
+#   worker i            => 127.0.0.1:WORKER_BASE_PORT+i, keeps the agents of its sessions in memory
+#
+#   python3 ./multi_agent/server.py
+#   curl -X POST localhost:8000/chat -H "Authorization: Bearer $JWT" -d '{"session_id": "eliezer-001", "message": "..."}'
+# -------------------------------------------
+
+# load encvironment variables
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8100"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))  # recycle a worker after N turns (0 = never)
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", str(TURN_TIMEOUT)))
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "30"))  # respawned worker listening again
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))  # agents kept in memory per worker
+SESSION_STORAGE_DIR = os.getenv("SESSION_STORAGE_DIR", "./sessions")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.\-]{1,64}$")
+
+def worker_index(session_id: str, workers: int = SERVER_WORKERS) -> int:
+    """
+    Sticky routing, a session id always lands on the same worker (stable across processes, unlike hash()).
+    """
+    return zlib.crc32(session_id.encode()) % workers
+
+def worker_url(index: int) -> str:
+    return f"http://127.0.0.1:{WORKER_BASE_PORT + index}"
+
+def error_response(status: int, error_code: str, message: str) -> web.Response:
+    """
+    Error in the common envelope (status, error_code, message) of the agents.
+    """
+    return web.Response(text=error_envelope(error_code, message), status=status, content_type="application/json")
+
+def bearer_token(request: web.Request) -> str:
+    return request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+
+def session_owner(token: str):
+    """
+    The owner of the sessions of a request: the sub (or username) of its jwt, None when missing or expired.
+    The signature is checked by the MCP servers (and the gateway in front of the router), not here.
+    """
+    if not token:
+        return None
+    exp = decode_jwt_exp(token)
+    if exp is not None and exp <= time.time():
+        return None
+    claims = decode_jwt_claims(token)
+    owner = claims.get("sub") or claims.get("username")
+    return str(owner) if owner else None
+
+def owned_session(owner: str, session_id: str) -> str:
+    """
+    Session key namespaced by its owner, the same session id sent by another user is another session
+    (own agent, history, entity store and usage).
+    """
+    return f"{session_id}.{hashlib.sha256(owner.encode()).hexdigest()[:16]}"
+
+# -------------------------------------------
+# Worker
+# -------------------------------------------
+class SessionAgents:
+    """LRU of the main agents of the sessions owned by this worker, one lock per session (a turn at a time)."""
+
+    def __init__(self, size: int = SESSION_CACHE_SIZE):
+        self.size = size
+        self.agents = OrderedDict()
+        self.locks = {}
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        if session_id not in self.locks:
+            self.locks[session_id] = asyncio.Lock()
+        return self.locks[session_id]
+
+    def agent(self, session_id: str):
+        """
+        Return the agent of the session, created (and its session restored from disk) on first use.
+        Blocking, called from the executor while holding the session lock.
+        """
+        if session_id in self.agents:
+            self.agents.move_to_end(session_id)
+            return self.agents[session_id]
+
+        agent = create_main_agent(mode=AGENT_MODE,
+                                  conversation_manager=SlidingWindowConversationManager(window_size=20, should_truncate_results=True),
+                                  session_manager=FileSessionManager(session_id=session_id, storage_dir=SESSION_STORAGE_DIR))
+        self.agents[session_id] = agent
+
+        while len(self.agents) > self.size:
+            evicted, _ = self.agents.popitem(last=False)
+            if evicted in self.locks and not self.locks[evicted].locked():
+                del self.locks[evicted]
+            logger.info(f"Session evicted from memory: {evicted}")
+
+        return agent
+
+    def drop(self, session_id: str) -> None:
+        self.agents.pop(session_id, None)
+        self.locks.pop(session_id, None)
+
+class Worker:
+
+    def __init__(self, index: int):
+        self.index = index
+        self.sessions = SessionAgents()
+        self.requests = 0
+        self.in_flight = 0
+        self.draining = False
+        self.warmup = None
+        self.health_poller = None
+
+    def setup(self) -> None:
+        # per process: telemetry exporters and warm up threads must start after the fork
+        strands_telemetry = StrandsTelemetry()
+        strands_telemetry.setup_otlp_exporter()
+        strands_telemetry.setup_meter(enable_console_exporter=False, enable_otlp_exporter=True)
+
+        model_tiers = {"default"} | {spec.model_tier for spec in registry.specs()}
+        self.warmup = create_warmup(models={tier: get_model(tier) for tier in model_tiers},
+                                    mcp_connections=registry.mcp_connections(),
+                                    checks={"workflows": workflow_registry.check_tools})
+        self.warmup.start()
+
+        # the health poller needs a service token (HEALTH_JWT), the requests bring their own jwt; not started without it
+        self.health_poller = create_health_poller()
+        self.health_poller.start()
+
+    async def chat(self, request: web.Request) -> web.Response:
+        if self.draining:
+            return error_response(503, "WORKER_DRAINING", f"Worker {self.index} is restarting, please retry")
+
+        try:
+            body = await request.json()
+        except ValueError:
+            return error_response(400, "INVALID_REQUEST", "invalid json body")
+        if not isinstance(body, dict):
+            return error_response(400, "INVALID_REQUEST", "the body must be a json object")
+
+        session_id = body.get("session_id")
+        message = body.get("message")
+        message = message.strip() if isinstance(message, str) else ""
+        token = bearer_token(request)
+        owner = session_owner(token)
+
+        if not token:
+            return error_response(401, "UNAUTHORIZED", "No JWT provided, NOT AUTHORIZED !!!")
+        if owner is None:
+            return error_response(401, "UNAUTHORIZED", "Invalid or expired JWT, NOT AUTHORIZED !!!")
+        if not message:
+            return error_response(400, "INVALID_REQUEST", "Please enter a valid message.")
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            return error_response(400, "INVALID_REQUEST", "invalid session_id")
+
+        loop = asyncio.get_running_loop()
+
+        session_key = owned_session(owner, session_id)
+
+        self.in_flight += 1
+        try:
+            async with self.sessions.lock(session_key):
+                agent = await loop.run_in_executor(None, self.sessions.agent, session_key)
+                response = await loop.run_in_executor(
+                    None, lambda: run_turn(agent, message, AGENT_MODE, token=token, session_id=session_id))
+        finally:
+            self.in_flight -= 1
+            self.requests += 1
+
+        if WORKER_MAX_REQUESTS and self.requests >= WORKER_MAX_REQUESTS and not self.draining:
+            self.recycle()
+
+        return web.json_response({"session_id": session_id, "worker": self.index, "response": response})
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session_id = request.match_info["session_id"]
+        owner = session_owner(bearer_token(request))
+        if owner is None:
+            return error_response(401, "UNAUTHORIZED", "No valid JWT provided, NOT AUTHORIZED !!!")
+
+        # a caller only drops its own session
+        self.sessions.drop(owned_session(owner, session_id))
+        return web.json_response({"session_id": session_id, "status": "dropped"})
+
+    async def ready(self, request: web.Request) -> web.Response:
+        report = self.warmup.report()
+        report.update({"worker": self.index, "pid": os.getpid(), "requests": self.requests, "draining": self.draining})
+        ready = report["ready"] and not self.draining
+        return web.json_response(report, status=200 if ready else 503)
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response({"worker": self.index, "services": health_snapshot.report()})
+
+    def recycle(self) -> None:
+        """
+        Graceful recycle: stop taking turns, let the in-flight ones finish, exit; the supervisor respawns the slot.
+        """
+        logger.info(f"Recycling worker {self.index} after {self.requests} requests")
+        self.draining = True
+        # after the current response is sent; aiohttp turns SIGTERM into a graceful shutdown
+        asyncio.get_running_loop().call_later(0.1, signal.raise_signal, signal.SIGTERM)
+
+    def run(self) -> None:
+        self.setup()
+
+        app = web.Application()
+        app.router.add_post("/chat", self.chat)
+        app.router.add_delete("/session/{session_id}", self.delete_session)
+        app.router.add_get("/ready", self.ready)
+        app.router.add_get("/status", self.status)
+
+        logger.info(f"Worker {self.index} (pid {os.getpid()}) listening on {worker_url(self.index)}")
+        # SIGTERM => stop accepting, wait the in-flight turns (shutdown_timeout), exit
+        web.run_app(app, host="127.0.0.1", port=WORKER_BASE_PORT + self.index,
+                    shutdown_timeout=WORKER_SHUTDOWN_TIMEOUT, print=None)
+
+# -------------------------------------------
+# Router
+# -------------------------------------------
+class Router:
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.client = None
+
+    async def on_startup(self, app) -> None:
+        self.client = ClientSession(timeout=ClientTimeout(total=TURN_TIMEOUT + 10))
+
+    async def on_cleanup(self, app) -> None:
+        await self.client.close()
+
+    async def forward(self, index: int, method: str, path: str, **kwargs) -> web.Response:
+        # the worker may be draining or restarting (recycle): a draining worker may live up to WORKER_SHUTDOWN_TIMEOUT
+        # (its in-flight turns) before the supervisor respawns the slot, so retry for the whole recycle
+        give_up = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT + WORKER_START_TIMEOUT
+        attempt = 0
+        while True:
+            try:
+                async with self.client.request(method, worker_url(index) + path, **kwargs) as resp:
+                    body = await resp.read()
+                    if not (resp.status == 503 and b"WORKER_DRAINING" in body):
+                        return web.Response(body=body, status=resp.status, content_type="application/json")
+            except ClientConnectionError:
+                pass
+            if time.monotonic() >= give_up:
+                break
+            attempt += 1
+            await asyncio.sleep(0.1 * min(attempt, 10))
+        return error_response(503, "WORKER_UNAVAILABLE", f"Worker {index} is not available, please retry")
+
+    @staticmethod
+    def auth_headers(request: web.Request) -> dict:
+        if "Authorization" in request.headers:
+            return {"Authorization": request.headers["Authorization"]}
+        return {}
+
+    async def chat(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return error_response(400, "INVALID_REQUEST", "invalid json body")
+
+        session_id = payload.get("session_id") if isinstance(payload, dict) else None
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            return error_response(400, "INVALID_REQUEST", "invalid session_id")
+
+        headers = {"Content-Type": "application/json", **self.auth_headers(request)}
+        return await self.forward(worker_index(session_id, self.workers), "POST", "/chat", data=body, headers=headers)
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session_id = request.match_info["session_id"]
+        if not SESSION_ID_PATTERN.match(session_id):
+            return error_response(400, "INVALID_REQUEST", "invalid session_id")
+        if not bearer_token(request):
+            return error_response(401, "UNAUTHORIZED", "No JWT provided, NOT AUTHORIZED !!!")
+        return await self.forward(worker_index(session_id, self.workers), "DELETE", f"/session/{session_id}",
+                                  headers=self.auth_headers(request))
+
+    async def live(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "alive"})
+
+    async def ready(self, request: web.Request) -> web.Response:
+        reports = []
+        for index in range(self.workers):
+            try:
+                async with self.client.get(worker_url(index) + "/ready") as resp:
+                    reports.append(await resp.json())
+            except Exception as e:
+                reports.append({"worker": index, "ready": False, "reason": str(e)})
+
+        ready = all(r.get("ready") for r in reports)
+        return web.json_response({"ready": ready, "workers": reports}, status=200 if ready else 503)
+
+    async def status(self, request: web.Request) -> web.Response:
+        # every worker polls, the first one answering is enough
+        for index in range(self.workers):
+            try:
+                async with self.client.get(worker_url(index) + "/status") as resp:
+                    return web.Response(body=await resp.read(), status=resp.status, content_type="application/json")
+            except ClientConnectionError:
+                continue
+        return error_response(503, "WORKER_UNAVAILABLE", "No worker is available, please retry")
+
+    def run(self) -> None:
+        app = web.Application()
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        app.router.add_post("/chat", self.chat)
+        app.router.add_delete("/session/{session_id}", self.delete_session)
+        app.router.add_get("/live", self.live)
+        app.router.add_get("/ready", self.ready)
+        app.router.add_get("/status", self.status)
+
+        logger.info(f"Router (pid {os.getpid()}) listening on {SERVER_HOST}:{SERVER_PORT} - workers: {self.workers}")
+        web.run_app(app, host=SERVER_HOST, port=SERVER_PORT, print=None)
+
+# -------------------------------------------
+# Supervisor
+# -------------------------------------------
+class Supervisor:
+    """
+    Pre-fork the router and the workers after the shared imports and respawn any of them that exits.
+    The supervisor stays synchronous (no event loop, no threads), so forking from it is safe.
+    """
+
+    def __init__(self, workers: int = SERVER_WORKERS):
+        self.workers = workers
+        self.children = {}  # pid => slot ("router" or worker index)
+        self.running = True
+
+    def spawn(self, slot) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # child
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                if slot == "router":
+                    Router(self.workers).run()
+                else:
+                    Worker(slot).run()
+            except Exception as e:
+                logger.error(f"{slot} crashed. Reason: {e}")
+                os._exit(1)
+            os._exit(0)
+
+        self.children[pid] = slot
+        logger.info(f"Spawned {slot} - pid: {pid}")
+
+    def stop(self, signum, frame) -> None:
+        logger.info(f"Supervisor stopping (signal {signum}), draining children ...")
+        self.running = False
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # move the shared objects out of the gc generations, so the gc does not touch (copy) the shared pages
+        gc.freeze()
+
+        for index in range(self.workers):
+            self.spawn(index)
+        self.spawn("router")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+
+            logger.info(f"{slot} (pid {pid}) exited - status: {os.waitstatus_to_exitcode(status)}")
+            if self.running:
+                # avoid a hot loop when a child crashes at startup
+                time.sleep(0.5)
+                self.spawn(slot)
+
+        logger.info("Supervisor stopped")
+
+if __name__ == "__main__":
+    if threading.active_count() > 1:
+        logger.warning(f"{threading.active_count()} threads alive before fork, only the main thread survives in the workers")
+
+    print('\033[1;33m Multi Agent server \033[0m \n')
+    print(f"SERVER_PORT: {SERVER_PORT}")
+    print(f"SERVER_WORKERS: {SERVER_WORKERS}")
+    print(f"WORKER_BASE_PORT: {WORKER_BASE_PORT}")
+    print(f"WORKER_MAX_REQUESTS: {WORKER_MAX_REQUESTS}")
+    print(f"AGENT_MODE: {AGENT_MODE}")
+    print(f"MAIN_RENDER_MODE: {MAIN_RENDER_MODE}")
+
+    Supervisor(SERVER_WORKERS).run()
+    sys.exit(0)
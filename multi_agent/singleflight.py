@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+
+from concurrent.futures import Future
+
+from opentelemetry import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+SINGLEFLIGHT_SUBAGENT = os.getenv("SINGLEFLIGHT_SUBAGENT", "false").lower() == "true"
+
+# Per request fields, never part of the coalescing key (the caller identity is a part of its own)
+REQUEST_FIELDS = {"x-request-id", "_trace", "traceparent", "tracestate", "request_id", "jwt"}
+
+# Metrics
+meter = metrics.get_meter(__name__)
+leaders_counter = meter.create_counter("singleflight.leaders", description="Calls executed upstream (leaders)")
+followers_counter = meter.create_counter("singleflight.followers", description="Calls served by an in-flight identical call (followers)")
+
+def strip_fields(value, fields: set):
+    if isinstance(value, dict):
+        return {k: strip_fields(v, fields) for k, v in value.items() if k not in fields}
+    if isinstance(value, list):
+        return [strip_fields(v, fields) for v in value]
+    return value
+
+def identity(token: str) -> str:
+    """
+    Caller identity of a key: a hash of its jwt, so only the callers presenting the same token share a result
+    (an expired or another tenant's token never gets data the backend would have refused), and no token in the logs.
+    """
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
+
+def call_key(*parts, arguments: dict = None) -> str:
+    """
+    Canonical key of a call: the parts (with the caller identity) plus the arguments without the per request fields.
+    """
+    canonical = json.dumps(strip_fields(arguments or {}, REQUEST_FIELDS), sort_keys=True, default=str)
+    return "|".join(str(p) for p in parts) + "|" + canonical
+
+class LeaderCancelled(Exception):
+    """The leader of a shared call was cancelled (its request ended), a follower runs the call again."""
+
+class SingleFlight:
+    """
+    Concurrent identical calls share one execution: the first caller (leader) runs it,
+    the others (followers) wait for its result. Works across threads and event loops.
+    The followers get the leader exception, except a cancellation: then one of them takes over as the new leader.
+    """
+
+    def __init__(self, layer: str):
+        self.layer = layer
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key: str):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _done(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _follow(self, key: str) -> None:
+        followers_counter.add(1, {"layer": self.layer})
+        logger.info(f"singleflight {self.layer}: follower of {key[:120]}")
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None) -> None:
+        # the key is released first, so a follower retrying after a cancellation joins a new call
+        self._done(key)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            logger.info(f"singleflight {self.layer}: leader cancelled, a follower takes over {key[:120]}")
+            future.set_exception(LeaderCancelled(f"leader of {key[:120]} cancelled"))
+
+    async def do_async(self, key: str, func, timeout: float = None):
+        """
+        Await func() (a coroutine factory) or the in-flight identical call.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            self._follow(key)
+            remaining = max(deadline - loop.time(), 0) if deadline is not None else None
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=remaining)
+            except LeaderCancelled:
+                continue
+
+        leaders_counter.add(1, {"layer": self.layer})
+        try:
+            result = await func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def do(self, key: str, func, timeout: float = None):
+        """
+        Sync version: return func() or the result of the in-flight identical call.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            self._follow(key)
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            try:
+                return future.result(timeout=remaining)
+            except LeaderCancelled:
+                continue
+
+        leaders_counter.add(1, {"layer": self.layer})
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+# global instances
+mcp_singleflight = SingleFlight("mcp_tool")
+subagent_singleflight = SingleFlight("sub_agent")
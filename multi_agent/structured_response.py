@@ -0,0 +1,136 @@
+import os
+import json
+import logging
+
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from entity_store import parse_result
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# generate => the main agent writes the final answer from the sub-agent results (one more generation)
+# template => a single, simple sub-agent result is rendered with a template and ends the turn
+MAIN_RENDER_MODE = os.getenv("MAIN_RENDER_MODE", "generate")
+RENDER_MODES = ("generate", "template")
+
+# Error codes a sub-agent can return
+ERROR_CODES = ("NOT_FOUND", "INVALID_REQUEST", "UNAUTHORIZED", "UPSTREAM_ERROR", "TRANSACTION_ABORTED", "DEADLINE_EXCEEDED", "INTERNAL_ERROR")
+
+class SubAgentAnswer(BaseModel):
+    """Structured answer of a sub-agent model, validated against this schema (the data is not written by the model)."""
+    status: Literal["success", "error"] = Field(description="success when the tool returned the data, otherwise error")
+    kind: Optional[Literal["product", "inventory", "order", "health", "message"]] = Field(
+        default=None, description="what the tool returned: product, inventory, order, health, or message when there is no data")
+    message: Optional[str] = Field(default=None, description="one short sentence for the user")
+    error_code: Optional[str] = Field(
+        default=None, description=f"when status is error, one of: {', '.join(ERROR_CODES)}")
+
+class SubAgentResponse(SubAgentAnswer):
+    """Structured response of a sub-agent: its answer with the data of its last tool result."""
+    data: Optional[Any] = Field(default=None, description="the tool output, exactly as returned")
+
+def build_response(answer: SubAgentAnswer, tool_result: dict = None) -> SubAgentResponse:
+    """
+    The sub-agent response, the data taken from the recorded tool result (never copied by the model).
+    """
+    data = parse_result(tool_result) if answer.status == "success" and tool_result is not None else None
+    return SubAgentResponse(**answer.model_dump(), data=data)
+
+def error_envelope(error_code: str, message: str) -> str:
+    return json.dumps({"status": "error", "error_code": error_code, "message": message})
+
+def render_value(value, indent: int = 0) -> list:
+    pad = "  " * indent
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                lines.append(f"{pad}- {key}:")
+                lines.extend(render_value(item, indent + 1))
+            else:
+                lines.append(f"{pad}- {key}: {item}")
+        return lines
+    if isinstance(value, list):
+        lines = []
+        for item in value:
+            if isinstance(item, (dict, list)):
+                lines.append(f"{pad}-")
+                lines.extend(render_value(item, indent + 1))
+            else:
+                lines.append(f"{pad}- {item}")
+        return lines
+    return [f"{pad}{value}"]
+
+# kind => title of the rendered answer
+TEMPLATES = {
+    "product": "Product details:",
+    "inventory": "Inventory details:",
+    "order": "Order details:",
+    "health": "Service health:",
+}
+
+def render(response: dict):
+    """
+    Render a structured sub-agent response without a model generation, or None when it is not simple enough.
+    """
+    if not isinstance(response, dict):
+        return None
+
+    if response.get("status") == "error":
+        error_code = response.get("error_code")
+        if not error_code:
+            return None
+        return f"Error ({error_code}): {response.get('message') or 'the request could not be processed'}"
+
+    kind = response.get("kind")
+    data = response.get("data")
+    if kind == "message" and response.get("message"):
+        return response["message"]
+    if kind not in TEMPLATES or not isinstance(data, (dict, list)) or not data:
+        return None
+
+    lines = [response.get("message") or TEMPLATES[kind]]
+    lines.extend(render_value(data))
+    return "\n".join(lines)
+
+class TurnRender:
+    """
+    Turn scoped state of the template render mode, shared (by reference) with the tools through the invocation state.
+    """
+
+    def __init__(self):
+        self.tool_calls = 0
+        self.text = None
+
+def get_turn_render(invocation_state: dict):
+    if not invocation_state:
+        return None
+    return invocation_state.get("render")
+
+def try_render(invocation_state: dict, agent, result: str) -> None:
+    """
+    In template mode, end the turn with the rendered (sub-agent or workflow) result when it is the single tool call of the turn.
+    """
+    turn_render = get_turn_render(invocation_state)
+    if turn_render is None or agent is None:
+        return
+    turn_render.tool_calls += 1
+
+    # a multi-domain (or multi-step) request still needs the main agent to compose the answer
+    last_message = agent.messages[-1] if agent.messages else {}
+    tool_uses = [c for c in last_message.get("content", []) if "toolUse" in c]
+    if turn_render.tool_calls > 1 or len(tool_uses) > 1:
+        return
+
+    try:
+        text = render(json.loads(result))
+    except ValueError:
+        return
+
+    if text is not None:
+        logger.info("rendering the sub-agent result with a template, skipping the main agent generation")
+        turn_render.text = text
+        invocation_state.setdefault("request_state", {})["stop_event_loop"] = True
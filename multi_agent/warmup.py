@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from mcp_pool import mcp_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# load encvironment variables
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))   # first retry of a failed step (0 = no retry)
+WARMUP_MAX_BACKOFF = float(os.getenv("WARMUP_MAX_BACKOFF", "60"))        # max interval between retries
+
+class WarmUp:
+    """
+    Run the warm up steps in a background thread at process start, so the first user turn runs warm.
+    A step is (name, callable); its status is pending, running, ok or error.
+    The failed steps (a dependency unreachable at boot) are retried with backoff until they succeed,
+    so the readiness follows the recovery of the dependency.
+    """
+
+    def __init__(self, retry_interval: float = WARMUP_RETRY_INTERVAL):
+        self.steps = []
+        self.status = {}
+        self.retry_interval = retry_interval
+        self._done = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_step(self, name: str, func) -> None:
+        self.steps.append((name, func))
+        self.status[name] = {"status": "pending"}
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run_steps(self, steps: list) -> None:
+        # the steps are independent (network bound), run them side by side
+        if steps:
+            with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="warmup") as executor:
+                list(executor.map(lambda step: self._run_step(*step), steps))
+
+    def _run(self) -> None:
+        logger.info(f"Warm up started - steps: {[name for name, _ in self.steps]}")
+        start_warmup = time.time()
+
+        self._run_steps(self.steps)
+
+        self._done.set()
+        logger.info(f"Warm up completed - Duration: {time.time() - start_warmup:.2f}s - ready: {self.is_ready()}")
+
+        delay = self.retry_interval
+        while delay > 0:
+            failed = [step for step in self.steps if self.status[step[0]]["status"] == "error"]
+            if not failed or self._stop.wait(delay):
+                return
+            logger.info(f"Warm up retrying failed steps: {[name for name, _ in failed]}")
+            self._run_steps(failed)
+            delay = min(delay * 2, WARMUP_MAX_BACKOFF)
+            if self.is_ready():
+                logger.info("Warm up recovered - ready: True")
+
+    def _run_step(self, name: str, func) -> None:
+        self.status[name] = {"status": "running"}
+        start = time.time()
+        try:
+            func()
+            self.status[name] = {"status": "ok", "duration": round(time.time() - start, 3)}
+        except Exception as e:
+            logger.warning(f"Warm up step {name} failed. Reason: {e}")
+            self.status[name] = {"status": "error", "reason": str(e), "duration": round(time.time() - start, 3)}
+
+    def is_done(self) -> bool:
+        return self._done.is_set()
+
+    def is_ready(self) -> bool:
+        return self.is_done() and all(s["status"] == "ok" for s in self.status.values())
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until the first warm up pass is done (or timeout), return the readiness.
+        """
+        self._done.wait(timeout)
+        return self.is_ready()
+
+    def report(self) -> dict:
+        return {"done": self.is_done(), "ready": self.is_ready(), "steps": dict(self.status)}
+
+def warm_up_mcp(connection, allowed_tools: list = None) -> None:
+    """
+    Open the MCP session and prefetch its tool catalog.
+    """
+    connection.list_tools(allowed_tools)
+
+def warm_up_model(bedrock_model) -> None:
+    """
+    Resolve the AWS credentials and open the TLS connection used by the Bedrock client.
+    An empty converse request is rejected by the service (ValidationException) without invoking the model,
+    but it leaves an authenticated keep-alive connection in the client pool.
+    """
+    # unwrap the scheduler and cassette wrappers, a replay has no Bedrock client
+    while not hasattr(bedrock_model, "client"):
+        bedrock_model = getattr(bedrock_model, "model", None)
+        if bedrock_model is None:
+            return
+
+    try:
+        bedrock_model.client.converse(modelId=bedrock_model.config["model_id"], messages=[])
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ValidationException":
+            raise
+
+def create_warmup(models: dict, mcp_connections: list = None, checks: dict = None) -> WarmUp:
+    """
+    Create the default warm up: every pooled MCP session, every Bedrock model (name => model)
+    and the extra checks (name => callable).
+    """
+    warmup = WarmUp()
+
+    for name, check in (checks or {}).items():
+        warmup.add_step(name, check)
+
+    for connection in mcp_connections if mcp_connections is not None else mcp_pool.connections():
+        warmup.add_step(f"mcp:{connection.url}", lambda c=connection: warm_up_mcp(c))
+
+    for name, model in models.items():
+        warmup.add_step(f"model:{name}", lambda m=model: warm_up_model(m))
+
+    return warmup
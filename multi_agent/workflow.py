@@ -0,0 +1,289 @@
+import json
+import uuid
+import asyncio
+import logging
+
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from strands.types.tools import AgentTool
+
+from opentelemetry import metrics
+
+from mcp_pool import mcp_pool
+from agent_registry import registry
+from resilience import error_result
+from entity_store import parse_result, get_entity_store
+from structured_response import error_envelope, try_render
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Metrics
+meter = metrics.get_meter(__name__)
+workflow_runs_counter = meter.create_counter("workflow.runs", description="Workflow runs by workflow and outcome")
+workflow_steps_counter = meter.create_counter("workflow.steps", description="Workflow steps (direct MCP calls) by workflow, step and outcome")
+
+@dataclass
+class Compensation:
+    """Undo of a completed step, run when a later step fails."""
+    tool: str
+    build_input: Callable   # run context => tool arguments
+
+@dataclass
+class Step:
+    """One direct MCP call of a workflow."""
+    name: str
+    agent: str              # sub-agent owning the tool (its MCP server and tools allow-list)
+    tool: str
+    build_input: Callable   # run context => tool arguments
+    depends_on: list = field(default_factory=list)
+    check: Optional[Callable] = None         # (run context, data) => failure reason, or None when acceptable
+    compensate: Optional[Compensation] = None
+    created: Optional[Callable] = None       # run context => id of the entity the step created, reported when not compensated
+
+@dataclass
+class WorkflowSpec:
+    """Declaration of a deterministic multi-step operation, exposed to the main agent as a tool with typed parameters."""
+    name: str
+    description: str
+    parameters: type           # pydantic model of the parameters (extracted by the main agent tool call)
+    steps: list
+    kind: str = "order"        # kind of the result (template render)
+    result_step: str = None    # step whose data is the workflow result (default: the last one)
+
+class StepFailed(Exception):
+    pass
+
+def available_tools(agent: str, compensation: bool = False) -> list:
+    """
+    The tools a workflow may call for a sub-agent: its allow-list for the steps, the whole catalog of its MCP server
+    for the compensations (undo tools, e.g. cancel_order, the agent itself is not allowed to call).
+    """
+    if not compensation:
+        return registry.mcp_tools(agent)
+    return mcp_pool.get(registry.spec(agent).mcp_url).list_tools()
+
+def check_arguments(tool_spec: dict, arguments: dict) -> None:
+    """
+    Check the arguments against the tool input schema (the request context fields are added by the tool wrapper),
+    so a shape mismatch fails before the call instead of on the server.
+    """
+    schema = (tool_spec.get("inputSchema") or {}).get("json") or {}
+    properties = schema.get("properties")
+    if properties is None:
+        return
+    missing = [k for k in schema.get("required", []) if k not in arguments]
+    unknown = [k for k in arguments if k not in properties]
+    if missing or unknown:
+        raise StepFailed(f"arguments of {tool_spec.get('name')} do not match its input schema: missing {missing}, unknown {unknown}")
+
+def inline_refs(schema: dict) -> dict:
+    """
+    Inline the $defs of a pydantic json schema, for the tool input schema.
+    """
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].split("/")[-1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve(schema)
+
+class WorkflowRun:
+    """
+    Run the steps of a workflow with direct MCP calls (no LLM): the independent steps side by side,
+    and on a failure the compensations of the completed steps in reverse order.
+    """
+
+    def __init__(self, spec: WorkflowSpec, params: BaseModel, invocation_state: dict):
+        self.spec = spec
+        self.context = {"params": params, "results": {}}
+        self.invocation_state = invocation_state  # jwt of the request (or the memory token), added to the calls by the tool wrapper
+
+    async def call_tool(self, agent: str, tool_name: str, arguments: dict, compensation: bool = False):
+        tools = await asyncio.to_thread(available_tools, agent, compensation)
+        mcp_tool = next((t for t in tools if t.tool_name == tool_name), None)
+        if mcp_tool is None:
+            raise StepFailed(f"tool {tool_name} is not available for {agent}")
+        check_arguments(mcp_tool.tool_spec, arguments)
+
+        tool_use = {
+            "toolUseId": f"{self.spec.name}-{tool_name}-{uuid.uuid4()}",
+            "name": tool_name,
+            "input": arguments,
+        }
+        result = await mcp_tool.call(tool_use, self.invocation_state)
+
+        # the entities created or read by the workflow answer the follow-ups, its order writes drop the cached stock
+        entity_store = get_entity_store(self.invocation_state)
+        if entity_store is not None:
+            entity_store.record(tool_name, arguments, result)
+
+        if result.get("status") == "error":
+            raise StepFailed(" ".join(c.get("text", "") for c in result.get("content", []) if isinstance(c, dict)))
+        return parse_result(result)
+
+    async def run_step(self, step: Step):
+        logger.info(f"workflow {self.spec.name} - step {step.name}: {step.tool}")
+        try:
+            data = await self.call_tool(step.agent, step.tool, step.build_input(self.context))
+            reason = step.check(self.context, data) if step.check is not None else None
+            if reason:
+                raise StepFailed(reason)
+        except Exception:
+            workflow_steps_counter.add(1, {"workflow": self.spec.name, "step": step.name, "outcome": "error"})
+            raise
+        workflow_steps_counter.add(1, {"workflow": self.spec.name, "step": step.name, "outcome": "success"})
+        return data
+
+    def created(self, step: Step) -> str:
+        """The entity created by a step, for the steps left in place (an id, or why it is unknown)."""
+        try:
+            return f"{step.tool} id {step.created(self.context)}"
+        except Exception as e:
+            return str(e)
+
+    async def compensate(self, completed: list) -> dict:
+        compensations = {}
+        for step in reversed(completed):
+            if step.compensate is None:
+                if step.created is not None:
+                    compensations[step.name] = f"not compensated (no compensation tool): {self.created(step)}"
+                continue
+            try:
+                await self.call_tool(step.agent, step.compensate.tool, step.compensate.build_input(self.context), compensation=True)
+                compensations[step.name] = "compensated"
+            except Exception as e:
+                logger.error(f"workflow {self.spec.name} - compensation of {step.name} failed. Reason: {e}")
+                reason = f"not compensated: {e}"
+                if step.created is not None:
+                    reason += f" ({self.created(step)})"
+                compensations[step.name] = reason
+        return compensations
+
+    async def run(self) -> dict:
+        results = self.context["results"]
+        pending = list(self.spec.steps)
+        completed = []
+
+        while pending:
+            ready = [s for s in pending if all(d in results for d in s.depends_on)]
+            if not ready:
+                raise ValueError(f"workflow {self.spec.name} has unsatisfiable dependencies: {[s.name for s in pending]}")
+
+            outcomes = await asyncio.gather(*(self.run_step(s) for s in ready), return_exceptions=True)
+
+            failures = []
+            for step, outcome in zip(ready, outcomes):
+                pending.remove(step)
+                if isinstance(outcome, BaseException):
+                    failures.append(f"{step.name}: {outcome}")
+                else:
+                    results[step.name] = outcome
+                    completed.append(step)
+
+            if failures:
+                compensations = await self.compensate(completed)
+                workflow_runs_counter.add(1, {"workflow": self.spec.name, "outcome": "error"})
+                return {
+                    "status": "error",
+                    "error_code": "WORKFLOW_FAILED",
+                    "message": f"{self.spec.name} failed at {'; '.join(failures)}",
+                    "data": {"completed": [s.name for s in completed], "compensations": compensations},
+                }
+
+        workflow_runs_counter.add(1, {"workflow": self.spec.name, "outcome": "success"})
+        result_step = self.spec.result_step or self.spec.steps[-1].name
+        return {
+            "status": "success",
+            "kind": self.spec.kind,
+            "message": f"{self.spec.name} completed",
+            "data": results[result_step],
+        }
+
+class WorkflowTool(AgentTool):
+    """
+    A workflow exposed to the main agent: the tool call is the single model call extracting the parameters.
+    """
+
+    def __init__(self, spec: WorkflowSpec):
+        super().__init__()
+        self.spec = spec
+        self._tool_spec = {
+            "name": spec.name,
+            "description": spec.description,
+            "inputSchema": {"json": inline_refs(spec.parameters.model_json_schema())},
+        }
+
+    @property
+    def tool_name(self) -> str:
+        return self.spec.name
+
+    @property
+    def tool_spec(self):
+        return self._tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return "python"
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        logger.info(f"function => {self.spec.name}")
+        try:
+            params = self.spec.parameters.model_validate(tool_use.get("input") or {})
+        except ValidationError as e:
+            yield error_result(tool_use, error_envelope("INVALID_REQUEST", f"Invalid {self.spec.name} parameters: {e}"))
+            return
+
+        response = json.dumps(await WorkflowRun(self.spec, params, invocation_state).run(), default=str)
+
+        # template render mode: a single workflow result ends the turn without another generation
+        try_render(invocation_state, invocation_state.get("agent"), response)
+        yield {"toolUseId": tool_use.get("toolUseId"), "status": "success", "content": [{"text": response}]}
+
+class WorkflowRegistry:
+    """Workflows declared as data (WorkflowSpec), each one exposed to the main agent as a tool."""
+
+    def __init__(self):
+        self._specs = {}
+        self._tools = {}
+
+    def register(self, spec: WorkflowSpec) -> None:
+        for step in spec.steps:
+            if step.tool not in registry.spec(step.agent).tools:
+                raise ValueError(f"workflow {spec.name} - step {step.name}: {step.tool} is not allowed for {step.agent}")
+        self._specs[spec.name] = spec
+        self._tools[spec.name] = WorkflowTool(spec)
+
+    def check_tools(self) -> None:
+        """
+        Check every step tool is exposed by its MCP server (warm up step), raise with the missing ones.
+        A missing compensation tool only logs a warning: the workflow runs, a failure leaves the step in place.
+        """
+        missing = []
+        for spec in self.specs():
+            for step in spec.steps:
+                if step.tool not in {t.tool_name for t in available_tools(step.agent)}:
+                    missing.append(f"{spec.name}.{step.name}: {step.tool}")
+                if step.compensate and step.compensate.tool not in {t.tool_name for t in available_tools(step.agent, True)}:
+                    logger.warning(f"workflow {spec.name} - compensation tool {step.compensate.tool} of {step.name} is not available, "
+                                   f"a failure after {step.name} leaves it in place")
+        if missing:
+            raise RuntimeError(f"workflow tools not available: {missing}")
+
+    def specs(self) -> list:
+        return list(self._specs.values())
+
+    def tools(self) -> list:
+        return list(self._tools.values())
+
+# global instance
+workflow_registry = WorkflowRegistry()
@@ -0,0 +1,90 @@
+import os
+import json
+
+from typing import List
+
+from pydantic import BaseModel, Field
+
+import sub_agents  # registers the sub-agents owning the workflow tools
+from workflow import workflow_registry, WorkflowSpec, Step, Compensation, StepFailed
+
+# -------------------------------------------
+# Well known multi-step operations declared as data, run by the workflow engine with direct MCP calls.
+# The main agent only extracts the parameters (one tool call).
+# -------------------------------------------
+
+# cancel tool of the order server, used to compensate a created order when the checkout fails.
+# None by default (the order server has no cancel): a failed checkout leaves the order, its id is in the failure result
+ORDER_CANCEL_TOOL = os.getenv("ORDER_CANCEL_TOOL", "")
+
+class Payment(BaseModel):
+    type: str = Field(description="payment type, e.g. CREDIT, DEBIT, PIX")
+    currency: str = Field(description="currency, e.g. BRL, USD")
+    amount: float = Field(description="amount paid with this payment")
+
+class CheckoutParams(BaseModel):
+    """Create an order of a product and checkout it with a list of payments."""
+    user_id: str = Field(description="user of the order")
+    address: str = Field(description="delivery address")
+    sku: str = Field(description="product sku")
+    quantity: int = Field(gt=0, description="quantity of the product")
+    currency: str = Field(description="currency of the price")
+    price: float = Field(gt=0, description="unit price of the product")
+    payments: List[Payment] = Field(min_length=1, description="LIST of payments of the checkout")
+
+def order_id(context: dict):
+    """The id of the order created by the workflow (create_order response: the order, with its id)."""
+    order = context["results"].get("order")
+    if not isinstance(order, dict) or order.get("id") in (None, ""):
+        raise StepFailed(f"create_order returned no order id: {json.dumps(order, default=str)[:300]}")
+    return order["id"]
+
+def enough_inventory(context: dict, data) -> str:
+    params = context["params"]
+    available = (data or {}).get("available")
+    if available is not None and available < params.quantity:
+        return f"insufficient inventory for sku {params.sku}: available {available}, requested {params.quantity}"
+    return None
+
+workflow_registry.register(WorkflowSpec(
+    name="checkout_workflow",
+    description="Create an order of a product and checkout it (payment) in one step: checks the product and its inventory, "
+                "creates the order and checks it out with the LIST of payments. Use it for a full purchase request.",
+    parameters=CheckoutParams,
+    steps=[
+        # independent reads, run side by side
+        Step(name="product",
+             agent="inventory_agent",
+             tool="get_product",
+             build_input=lambda c: {"sku": c["params"].sku}),
+        Step(name="inventory",
+             agent="inventory_agent",
+             tool="get_inventory",
+             build_input=lambda c: {"sku": c["params"].sku},
+             check=enough_inventory),
+        Step(name="order",
+             agent="order_agent",
+             tool="create_order",
+             depends_on=["product", "inventory"],
+             build_input=lambda c: {
+                 "user_id": c["params"].user_id,
+                 "address": c["params"].address,
+                 "sku": c["params"].sku,
+                 "quantity": c["params"].quantity,
+                 "currency": c["params"].currency,
+                 "price": c["params"].price,
+             },
+             compensate=Compensation(tool=ORDER_CANCEL_TOOL,
+                                     build_input=lambda c: {"id": order_id(c)}) if ORDER_CANCEL_TOOL else None,
+             created=order_id),
+        Step(name="checkout",
+             agent="order_agent",
+             tool="checkout_order",
+             depends_on=["order"],
+             build_input=lambda c: {
+                 "id": order_id(c),
+                 "payment": [p.model_dump() for p in c["params"].payments],
+             }),
+    ],
+    kind="order",
+))
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# the modules of multi_agent import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "multi_agent"))
+
+# configuration read at import time, no call is made to these endpoints
+os.environ.setdefault("REGION", "us-east-2")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("MODEL_ID", "test-model")
+os.environ.setdefault("INVENTORY_MCP_URL", "http://127.0.0.1:1/mcp")
+os.environ.setdefault("ORDER_MCP_URL", "http://127.0.0.1:2/mcp")
@@ -0,0 +1,82 @@
+import pytest
+
+import accounting
+
+from accounting import TurnUsage, check_budget, check_degrade_tier, cost_of, snapshot, token_user
+from dev.identity_stub import issue_token
+
+class State:
+    def __init__(self, usage=None):
+        self.values = {"usage": usage} if usage else {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+class FakeAgent:
+    def __init__(self, usage=None):
+        self.state = State(usage)
+
+class FakeMetrics:
+    accumulated_usage = {"inputTokens": 1200, "outputTokens": 300, "cacheReadInputTokens": 1000, "totalTokens": 1500}
+    cycle_count = 2
+
+@pytest.fixture
+def prices(monkeypatch):
+    monkeypatch.setattr(accounting, "MODEL_PRICES", {"nova-pro": [0.8, 3.2], "nova-lite": [0.06, 0.24]})
+
+def session(tokens=0, cost=0.0):
+    return dict.fromkeys(accounting.COUNTERS, 0) | {"input": tokens, "cost": cost, "turns": 1}
+
+def test_snapshot_of_the_event_loop_metrics():
+    assert snapshot(FakeMetrics()) == {"input": 1200, "output": 300, "cache_read": 1000, "cache_write": 0, "model_calls": 2}
+
+def test_cost_of(prices):
+    usage = {"input": 1_000_000, "output": 500_000, "cache_read": 1_000_000, "cache_write": 0}
+    assert cost_of("nova-pro", usage) == pytest.approx(0.8 + 1.6 + 0.08)
+    assert cost_of("unpriced", usage) == 0.0
+
+def test_turn_usage_aggregates_the_agents(prices):
+    usage = TurnUsage("s-1", "admin")
+    usage.add("main", "nova-pro", {"input": 1000, "output": 100, "model_calls": 2})
+    usage.add("order_agent", "nova-lite", {"input": 500, "output": 50, "model_calls": 1})
+    usage.add("order_agent", "nova-lite", {"input": 500, "output": 50, "model_calls": 1})
+
+    assert usage.agents["order_agent"]["input"] == 1000 and usage.agents["order_agent"]["model_calls"] == 2
+    totals = usage.totals()
+    assert totals["input"] == 2000 and totals["output"] == 200 and totals["model_calls"] == 4
+    assert totals["cost"] == pytest.approx((1000 * 0.8 + 100 * 3.2 + 1000 * 0.06 + 100 * 0.24) / 1_000_000)
+
+def test_token_user():
+    assert token_user(issue_token("admin")) == "admin"
+    assert token_user(None) == "unknown"
+
+def test_no_budget(monkeypatch):
+    monkeypatch.setattr(accounting, "SESSION_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(accounting, "SESSION_COST_BUDGET", 0)
+    assert check_budget(FakeAgent(session(tokens=10**9, cost=10**6))) == "ok"
+
+@pytest.mark.parametrize("tokens, cost, decision", [
+    (0, 0.0, "ok"),
+    (7_999, 0.0, "ok"),
+    (8_000, 0.0, "degrade"),
+    (0, 0.9, "degrade"),      # the highest ratio decides
+    (10_000, 0.0, "refuse"),
+    (0, 1.0, "refuse"),
+])
+def test_budget_decisions(monkeypatch, tokens, cost, decision):
+    monkeypatch.setattr(accounting, "SESSION_TOKEN_BUDGET", 10_000)
+    monkeypatch.setattr(accounting, "SESSION_COST_BUDGET", 1.0)
+    assert check_budget(FakeAgent(session(tokens, cost))) == decision
+
+def test_new_session_within_the_budget(monkeypatch):
+    monkeypatch.setattr(accounting, "SESSION_TOKEN_BUDGET", 10_000)
+    assert check_budget(FakeAgent()) == "ok"
+
+def test_degrade_tier_warning(monkeypatch, caplog):
+    monkeypatch.setattr(accounting, "SESSION_TOKEN_BUDGET", 10_000)
+    assert check_degrade_tier("nova-pro", "nova-lite")
+    assert not check_degrade_tier("nova-pro", "nova-pro")
+    assert "MODEL_ID_LITE" in caplog.text
+
+    monkeypatch.setattr(accounting, "SESSION_TOKEN_BUDGET", 0)
+    assert check_degrade_tier("nova-pro", "nova-pro")
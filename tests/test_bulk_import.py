@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from pydantic import ValidationError
+
+from bulk_import import ImportRow, BulkImporter, Checkpoint, TokenExpired, read_rows
+
+def test_product_row():
+    row = ImportRow.model_validate({"sku": " A-1 ", "name": "pen", "type": "office", "status": "active"})
+    assert row.sku == "A-1"
+    assert row.has_product() and not row.has_inventory()
+    assert row.product_input() == {"sku": "A-1", "name": "pen", "type": "office", "status": "active"}
+
+def test_inventory_row():
+    row = ImportRow.model_validate({"sku": "A-1", "available": "10", "reserved": 0, "sold": 3})
+    assert row.has_inventory() and not row.has_product()
+    assert row.inventory_input() == {"sku": "A-1", "available": 10, "reserved": 0, "sold": 3}
+
+@pytest.mark.parametrize("fields", [
+    {"sku": "A 1", "name": "pen", "type": "office", "status": "active"},   # invalid sku
+    {"sku": "", "available": 1, "reserved": 0, "sold": 0},
+    {"sku": "A-1", "name": "pen"},                                          # partial product
+    {"sku": "A-1", "available": 10},                                        # partial inventory
+    {"sku": "A-1", "available": -1, "reserved": 0, "sold": 0},              # negative counter
+    {"sku": "A-1", "available": "ten", "reserved": 0, "sold": 0},
+    {"sku": "A-1"},                                                         # nothing to import
+    {"name": "pen", "type": "office", "status": "active"},                  # no sku
+])
+def test_invalid_rows(fields):
+    with pytest.raises(ValidationError):
+        ImportRow.model_validate(fields)
+
+def test_read_jsonl_rows(tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"sku": "A-1"}\n\n{not json\n[1, 2]\n')
+    rows = list(read_rows(str(path), "jsonl"))
+    assert rows[0] == (1, {"sku": "A-1"}, None)
+    assert rows[1][0] == 3 and rows[1][2].startswith("invalid json")
+    assert rows[2] == (4, [1, 2], None)
+
+def test_read_csv_rows(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("sku,name,available\nA-1, pen ,\n")
+    assert list(read_rows(str(path), "csv")) == [(1, {"sku": "A-1", "name": "pen", "available": None}, None)]
+
+def test_dry_run_reports_every_invalid_row():
+    batch = [
+        (1, {"sku": "A-1", "available": 1, "reserved": 0, "sold": 0}, None),
+        (2, None, "invalid json: x"),
+        (3, [1, 2], None),
+        (4, 42, None),
+        (5, {"sku": "A-1", "available": 1}, None),
+    ]
+    importer = BulkImporter(concurrency=1, batch_size=10, mode="auto")
+    errors = asyncio.run(importer.run_batch(batch, dry_run=True))
+
+    assert [(e["row"], e["stage"]) for e in errors] == [(2, "parse"), (3, "validation"), (4, "validation"), (5, "validation")]
+    assert errors[3]["sku"] == "A-1"
+    assert importer.stats["invalid"] == 4
+
+def test_checkpoint_round_trip(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "rows.checkpoint.json"))
+    assert checkpoint.load() == {"next_row": 1, "stats": {}}
+
+    checkpoint.save(501, {"imported": 500})
+    state = checkpoint.load()
+    assert state["next_row"] == 501 and state["stats"] == {"imported": 500}
+    assert not (tmp_path / "rows.checkpoint.json.tmp").exists()
+
+    checkpoint.clear()
+    assert checkpoint.load()["next_row"] == 1
+
+class FakeTool:
+    """Inventory MCP tool behind a closed breaker, recording the jwt of the calls."""
+
+    def __init__(self):
+        self.breaker = type("Breaker", (), {"state": "closed"})()
+        self.tokens = []
+
+    async def call(self, tool_use, invocation_state):
+        self.tokens.append(invocation_state["jwt"])
+        return {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": "{}"}]}
+
+def test_calls_use_the_token_provider():
+    async def token():
+        return "token-1"
+
+    importer = BulkImporter(concurrency=2, batch_size=10, mode="auto", token_provider=token)
+    importer.tools = {"create_inventory": FakeTool(), "update_inventory": FakeTool()}
+    batch = [(1, {"sku": "A-1", "name": "pen", "type": "office", "status": "active", "available": 1, "reserved": 0, "sold": 0}, None)]
+
+    assert asyncio.run(importer.run_batch(batch, dry_run=False)) == []
+    assert importer.tools["create_inventory"].tokens == ["token-1"]
+    assert importer.tools["update_inventory"].tokens == ["token-1"]
+    assert importer.stats["imported"] == 1
+
+def test_expired_token_stops_the_import():
+    async def expired():
+        return None
+
+    importer = BulkImporter(concurrency=2, batch_size=10, mode="update", token_provider=expired)
+    importer.tools = {"update_inventory": FakeTool()}
+    batch = [(1, {"sku": "A-1", "available": 1, "reserved": 0, "sold": 0}, None)]
+
+    with pytest.raises(TokenExpired):
+        asyncio.run(importer.run_batch(batch, dry_run=False))
+    assert importer.tools["update_inventory"].tokens == []
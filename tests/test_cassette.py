@@ -0,0 +1,110 @@
+import os
+import json
+import asyncio
+
+import pytest
+
+from strands.models.model import Model
+
+import cassette as cassette_module
+
+from cassette import Cassette, CassetteMCPTool, CassetteMissError, CassetteModel, tool_key
+
+EVENTS = [{"messageStart": {"role": "assistant"}}, {"contentBlockDelta": {"delta": {"text": "ok"}}}, {"messageStop": {"stopReason": "end_turn"}}]
+
+class FakeModel(Model):
+    """Model streaming fixed events, counting the calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def update_config(self, **model_config):
+        pass
+
+    def get_config(self):
+        return {"model_id": "test-model"}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        self.calls += 1
+        for event in EVENTS:
+            yield event
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        yield {"output": None}
+
+class FakeTool:
+    tool_name = "get_product"
+    tool_spec = {"name": "get_product", "inputSchema": {"json": {"properties": {"sku": {}}}}}
+    tool_type = "python"
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        yield {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": json.dumps({"sku": tool_use["input"]["sku"]})}]}
+
+@pytest.fixture(autouse=True)
+def zero_latency(monkeypatch):
+    monkeypatch.setattr(cassette_module, "CASSETTE_LATENCY", "zero")
+
+MESSAGES = [{"role": "user", "content": [{"text": "Show me the product sku milk-01"}]}]
+
+def stream_model(model):
+    async def run():
+        return [e async for e in model.stream(MESSAGES, system_prompt="prompt")]
+    return asyncio.run(run())
+
+def call_tool(tool, tool_use_id, sku, jwt):
+    async def run():
+        tool_use = {"toolUseId": tool_use_id, "name": "get_product", "input": {"sku": sku, "jwt": jwt}}
+        return [e async for e in tool.stream(tool_use, {})][-1]
+    return asyncio.run(run())
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassettes" / "run.jsonl")
+    recorder = Cassette(path, "record")
+    assert not os.path.exists(path)  # opened on the first record only
+
+    model = FakeModel()
+    assert stream_model(CassetteModel(model, "test-model", recorder)) == EVENTS
+    recorded = call_tool(CassetteMCPTool("http://mcp", recorder, tool=FakeTool()), "t-1", "milk-01", "token-a")
+    assert recorder.stats["recorded"] == 2
+
+    player = Cassette(path, "replay")
+    assert stream_model(CassetteModel(None, "test-model", player)) == EVENTS
+    # the jwt is not part of the key, the result gets the toolUseId of the replayed call
+    replayed = call_tool(CassetteMCPTool("http://mcp", player, spec=FakeTool.tool_spec), "t-2", "milk-01", "token-b")
+    assert replayed == dict(recorded, toolUseId="t-2")
+    assert model.calls == 1 and player.stats["replayed"] == 2
+
+    with pytest.raises(CassetteMissError):
+        call_tool(CassetteMCPTool("http://mcp", player, spec=FakeTool.tool_spec), "t-3", "milk-02", "token-b")
+
+def test_a_new_run_starts_the_file_over(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    Cassette(path, "record").record("mcp", "old")
+    Cassette(path, "record")  # constructed only: the previous recording is kept
+    assert Cassette(path, "replay")._entries.keys() == {"old"}
+
+    Cassette(path, "record").record("mcp", "new")
+    assert Cassette(path, "replay")._entries.keys() == {"new"}
+
+def test_forked_processes_append_to_the_same_run(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    recorder = Cassette(path, "record")
+    recorder.record("mcp", "parent-1")
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for i in range(50):
+                recorder.record("mcp", "child", index=i, payload="x" * 10000)
+        finally:
+            os._exit(0)
+    for i in range(50):
+        recorder.record("mcp", "parent", index=i, payload="y" * 10000)
+    os.waitpid(pid, 0)
+
+    # every line is a whole entry, none of them lost or interleaved
+    entries = Cassette(path, "replay")._entries
+    assert len(entries["child"]) == 50 and len(entries["parent"]) == 50 and len(entries["parent-1"]) == 1
+
+def test_replay_key_ignores_the_request_fields():
+    assert tool_key("u", "get_order", {"id": 1, "jwt": "a", "x-request-id": "1"}) == tool_key("u", "get_order", {"id": 1, "jwt": "b"})
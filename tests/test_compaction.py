@@ -0,0 +1,57 @@
+import json
+
+import compaction
+
+from compaction import compact_data, compact_result, compact_text, drop_empty, drop_fields, summarize_lists
+
+def test_drop_fields_at_any_depth():
+    data = {"sku": "A-1", "_links": {"self": "/a"}, "items": [{"sku": "B", "tenant_id": "t"}]}
+    assert drop_fields(data, {"_links", "tenant_id"}) == {"sku": "A-1", "items": [{"sku": "B"}]}
+
+def test_dropped_fields_per_tool(monkeypatch):
+    monkeypatch.setattr(compaction, "DROP_FIELDS", {"*": ["_links"], "get_order": ["audit"]})
+    assert compaction.dropped_fields("get_order") == {"_links", "audit"}
+    assert compaction.dropped_fields("get_product") == {"_links"}
+
+def test_drop_empty_values():
+    data = {"sku": "A-1", "note": "", "deleted": None, "updated_at": "0001-01-01T00:00:00Z",
+            "tags": [], "meta": {"x": None}, "available": 0, "active": False}
+    assert drop_empty(data) == {"sku": "A-1", "available": 0, "active": False}
+
+def test_summarize_lists():
+    assert summarize_lists({"items": list(range(5))}, 2) == {"items": [0, 1, {"_omitted": 3, "_total": 5}]}
+    assert summarize_lists([1, 2], 2) == [1, 2]
+
+def test_compact_text_within_the_budget():
+    assert compact_text("abc", 10) == "abc"
+    assert compact_text("a" * 20, 10) == "a" * 10 + "...[10 bytes omitted]"
+
+def test_compact_data_keeps_the_identifiers_and_fits_the_budget():
+    data = {"order": "O-1", "trace_id": "x", "lines": [{"sku": f"S-{i}", "price": 10.5, "description": "d" * 40} for i in range(100)]}
+    text = compact_data("get_order", data, max_bytes=1000)
+    assert len(text.encode()) <= 1000
+
+    compacted = json.loads(text)
+    assert compacted["order"] == "O-1"
+    assert "trace_id" not in compacted
+    assert compacted["lines"][0] == {"sku": "S-0", "price": 10.5, "description": "d" * 40}
+    assert compacted["lines"][-1]["_total"] == 100
+
+def test_compact_result_drops_the_structured_copy():
+    payload = {"sku": "A-1", "_links": {}, "name": "pen"}
+    result = {"toolUseId": "t-1", "status": "success", "structuredContent": payload,
+              "content": [{"text": json.dumps(payload)}, {"image": "bytes"}]}
+    compacted = compact_result("get_product", result)
+    assert "structuredContent" not in compacted
+    assert json.loads(compacted["content"][0]["text"]) == {"sku": "A-1", "name": "pen"}
+    assert compacted["content"][1] == {"image": "bytes"}
+    assert compacted["toolUseId"] == "t-1"
+
+def test_compact_result_plain_text():
+    result = {"status": "error", "content": [{"text": "product not found"}]}
+    assert compact_result("get_product", result) == result
+
+def test_compaction_disabled(monkeypatch):
+    monkeypatch.setattr(compaction, "COMPACTION_ENABLED", False)
+    result = {"status": "success", "content": [{"text": json.dumps({"_links": {}})}]}
+    assert compact_result("get_product", result) is result
@@ -0,0 +1,102 @@
+import json
+import asyncio
+
+import entity_store
+
+from entity_store import EntityStore, find_key
+from resilience import CircuitBreaker, LatencyTracker, ResilientMCPTool
+
+def success(payload):
+    return {"toolUseId": "t-1", "status": "success", "content": [{"text": json.dumps(payload)}]}
+
+ERROR = {"toolUseId": "t-1", "status": "error", "content": [{"text": "Tool execution failed: 503 unavailable"}]}
+
+def test_find_key_in_nested_data():
+    assert find_key("inventory", {"available": 3, "product": {"sku": "milk-01"}}) == "milk-01"
+    assert find_key("order", {"order_id": 95}) == "95"
+    assert find_key("product", {"name": "milk"}) is None
+
+def test_recorded_entities_answer_the_reads():
+    store = EntityStore()
+    store.record("get_product", {"sku": "milk-01"}, success({"sku": "milk-01", "name": "milk 01"}))
+    assert store.lookup("get_product", {"sku": "milk-01"}) == {"sku": "milk-01", "name": "milk 01"}
+    assert store.lookup("get_product", {"sku": "milk-02"}) is None
+    # writes are never answered from the store
+    assert store.lookup("create_inventory", {"sku": "milk-01"}) is None
+
+def test_failed_calls_are_not_recorded():
+    store = EntityStore()
+    store.record("get_product", {"sku": "milk-01"}, ERROR)
+    assert store.lookup("get_product", {"sku": "milk-01"}) is None
+
+def test_entities_expire_after_the_ttl():
+    store = EntityStore()
+    store.record("get_inventory", {"sku": "milk-01"}, success({"sku": "milk-01", "available": 3}))
+    store.entities["inventory"]["milk-01"]["ts"] -= entity_store.ENTITY_TTL_SECONDS + 1
+    assert store.lookup("get_inventory", {"sku": "milk-01"}) is None
+    assert store.get("inventory", "milk-01", max_age=float("inf")) is not None
+
+def test_order_write_drops_the_inventory_of_its_skus():
+    store = EntityStore()
+    store.record("get_inventory", {"sku": "milk-01"}, success({"sku": "milk-01", "available": 10}))
+    store.record("get_inventory", {"sku": "milk-02"}, success({"sku": "milk-02", "available": 10}))
+
+    store.record("create_order", {"user_id": "ELIEZER", "sku": "milk-01", "quantity": 2},
+                 success({"id": 95, "cart_item": [{"sku": "milk-01", "quantity": 2}]}))
+    assert store.lookup("get_inventory", {"sku": "milk-01"}) is None
+    assert store.lookup("get_inventory", {"sku": "milk-02"}) is not None
+    assert store.lookup("get_order", {"id": 95})["id"] == 95
+
+def test_checkout_drops_the_inventory_of_the_known_order():
+    store = EntityStore()
+    store.record("get_order", {"id": 95}, success({"id": 95, "cart_item": [{"sku": "milk-01"}]}))
+    store.record("get_inventory", {"sku": "milk-01"}, success({"sku": "milk-01", "available": 10}))
+
+    # the checkout arguments and result have no sku, the known order has it; a failed write may have been applied
+    store.record("checkout_order", {"id": 95, "payment": []}, ERROR)
+    assert store.lookup("get_inventory", {"sku": "milk-01"}) is None
+
+def test_entities_bounded_per_kind(monkeypatch):
+    monkeypatch.setattr(entity_store, "ENTITY_MAX_PER_KIND", 2)
+    store = EntityStore()
+    for sku in ("a", "b", "c"):
+        store.put("product", sku, {"sku": sku})
+    assert store.summary() == {"product": ["b", "c"]}
+
+def test_store_round_trip_through_the_agent_state():
+    store = EntityStore()
+    store.record("get_product", {"sku": "milk-01"}, success({"sku": "milk-01"}))
+    restored = EntityStore(json.loads(json.dumps(store.to_dict())))
+    assert restored.lookup("get_product", {"sku": "milk-01"}) == {"sku": "milk-01"}
+
+class FakeTool:
+    def __init__(self, name):
+        self.tool_name = name
+        self.tool_spec = {"name": name, "inputSchema": {"json": {"properties": {"sku": {}, "jwt": {}}}}}
+        self.tool_type = "python"
+        self.calls = 0
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        self.calls += 1
+        yield success({"sku": tool_use["input"]["sku"], "available": 3})
+
+def read(tool, store, sku="milk-01"):
+    wrapper = ResilientMCPTool(tool, CircuitBreaker("test"), LatencyTracker())
+
+    async def run():
+        tool_use = {"toolUseId": "t-1", "name": tool.tool_name, "input": {"sku": sku}}
+        return [e async for e in wrapper.stream(tool_use, {"jwt": "token", "entity_store": store})][-1]
+
+    return asyncio.run(run())
+
+def test_follow_up_answered_by_the_tool_wrapper():
+    tool = FakeTool("get_inventory")
+    store = EntityStore()
+    first = read(tool, store)
+    second = read(tool, store)
+    assert tool.calls == 1
+    assert json.loads(second["content"][0]["text"]) == json.loads(first["content"][0]["text"])
+
+    store.invalidate("inventory", "milk-01")
+    read(tool, store)
+    assert tool.calls == 2
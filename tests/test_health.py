@@ -0,0 +1,85 @@
+import json
+import asyncio
+
+import pytest
+
+import health
+import resilience
+
+from health import HealthSnapshot, service_health
+from resilience import CircuitBreaker, LatencyTracker, ResilientMCPTool
+
+def result(payload, status="success"):
+    return {"toolUseId": "poll", "status": status, "content": [{"text": json.dumps(payload)}]}
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    """A fresh snapshot in place of the global one."""
+    snapshot = HealthSnapshot()
+    monkeypatch.setattr(health, "health_snapshot", snapshot)
+    monkeypatch.setattr(resilience, "health_snapshot", snapshot)
+    return snapshot
+
+def make_stale(snapshot, tool_name):
+    snapshot._entries[tool_name]["checked_at"] -= health.HEALTH_MAX_AGE + 1
+
+class FakeTool:
+    """Live health tool, counting the calls."""
+
+    def __init__(self, name="inventory_health"):
+        self.tool_name = name
+        self.tool_spec = {"name": name, "inputSchema": {"json": {"properties": {"jwt": {}}}}}
+        self.tool_type = "python"
+        self.calls = 0
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        self.calls += 1
+        yield {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": json.dumps({"status": "live"})}]}
+
+def ask(tool):
+    wrapper = ResilientMCPTool(tool, CircuitBreaker("test"), LatencyTracker())
+
+    async def run():
+        tool_use = {"toolUseId": "t-1", "name": tool.tool_name, "input": {}}
+        return [e async for e in wrapper.stream(tool_use, {"jwt": "token"})][-1]
+
+    return json.loads(asyncio.run(run())["content"][0]["text"])
+
+def test_fresh_snapshot_answers_without_a_live_call(snapshot):
+    snapshot.update("inventory_health", result({"status": "healthy"}))
+    tool = FakeTool()
+    assert ask(tool) == {"status": "healthy"}
+    assert tool.calls == 0
+
+def test_missing_snapshot_falls_back_to_the_live_call(snapshot):
+    tool = FakeTool()
+    assert ask(tool) == {"status": "live"}
+    assert tool.calls == 1
+
+def test_stale_snapshot_falls_back_to_the_live_call(snapshot):
+    snapshot.update("inventory_health", result({"status": "healthy"}))
+    make_stale(snapshot, "inventory_health")
+    tool = FakeTool()
+    assert ask(tool) == {"status": "live"}
+    assert tool.calls == 1
+
+def test_failed_check_falls_back_to_the_live_call(snapshot):
+    snapshot.update("inventory_health", result("401 unauthorized", status="error"))
+    assert snapshot.get("inventory_health")["error"] == '"401 unauthorized"'
+    tool = FakeTool()
+    assert ask(tool) == {"status": "live"}
+    assert tool.calls == 1
+
+def test_service_health_from_the_snapshot(snapshot):
+    snapshot.update("inventory_health", result({"status": "healthy"}))
+    snapshot.update("order_health", result("503 unavailable", status="error"))
+
+    response = json.loads(service_health("all"))
+    assert response["status"] == "success" and list(response["response"]) == ["inventory"]
+    assert response["response"]["inventory"]["data"] == {"status": "healthy"}
+
+    # a failed check is not reported as the health of the service
+    assert json.loads(service_health("order"))["status"] == "not_found"
+
+    make_stale(snapshot, "inventory_health")
+    assert json.loads(service_health("inventory"))["status"] == "not_found"
@@ -0,0 +1,118 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from aiohttp import web
+
+from dev import identity_stub
+from loginManager import LoginManager, TokenCache, decode_jwt_exp
+
+@pytest.fixture
+def identity(monkeypatch):
+    """The identity stub served in-process on a free port, with fresh stats."""
+    monkeypatch.setattr(identity_stub, "stats", {"issued": 0, "rejected": 0})
+    monkeypatch.setattr(identity_stub, "STUB_TOKEN_TTL", 30)
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def start():
+        runner = web.AppRunner(identity_stub.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, runner.addresses[0][1]
+
+    runner, port = asyncio.run_coroutine_threadsafe(start(), loop).result()
+    yield f"http://127.0.0.1:{port}/identidy/oauth_credential"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+@pytest.fixture
+def manager(identity):
+    manager = LoginManager(identity_url=identity, refresh_margin=5, refresh_cooldown=0.2)
+    manager.token_cache = None
+    yield manager
+    manager.run(manager.close())
+
+def test_decode_exp():
+    before = time.time()
+    exp = decode_jwt_exp(identity_stub.issue_token("admin"))
+    assert before + 29 <= exp <= time.time() + 31
+    assert decode_jwt_exp("not-a-jwt") is None
+
+def test_login(manager):
+    assert not manager.run(manager.login("admin", "wrong"))
+    assert manager.run(manager.login("admin", "admin"))
+    assert manager.is_authenticated() and not manager.needs_refresh()
+    assert manager.get_valid_token_sync() == manager.get_token()
+    assert identity_stub.stats == {"issued": 1, "rejected": 1}
+
+def test_refresh_inside_the_margin(manager):
+    manager.run(manager.login("admin", "admin"))
+    manager.expires_at = time.time() + 2   # inside the 5s margin
+
+    assert manager.get_valid_token_sync() == manager.get_token()
+    assert manager.expires_at > time.time() + 20 and not manager.needs_refresh()
+    assert identity_stub.stats["issued"] == 2
+
+def test_concurrent_callers_share_one_refresh(manager, monkeypatch):
+    manager.run(manager.login("admin", "admin"))
+    manager.expires_at = time.time() + 2
+    monkeypatch.setattr(identity_stub, "STUB_LATENCY", 0.2)
+
+    async def callers():
+        return await asyncio.gather(*(manager.get_valid_token() for _ in range(10)))
+
+    tokens = manager.run(callers())
+    assert len(set(tokens)) == 1
+    assert identity_stub.stats["issued"] == 2
+
+def test_failed_refresh_keeps_the_token_and_cools_down(manager, monkeypatch):
+    manager.run(manager.login("admin", "admin"))
+    token = manager.get_token()
+    manager.expires_at = time.time() + 2
+    monkeypatch.setattr(identity_stub, "STUB_PASSWORD", "rotated")
+
+    # the token is still valid, the failed refresh is not retried during the cooldown
+    assert manager.get_valid_token_sync() == token
+    assert manager.get_valid_token_sync() == token
+    assert identity_stub.stats["rejected"] == 1
+
+    time.sleep(0.25)
+    assert manager.get_valid_token_sync() == token
+    assert identity_stub.stats["rejected"] == 2
+
+    # past its exp the token is no longer served
+    manager.expires_at = time.time() - 1
+    assert manager.get_valid_token_sync() is None
+    assert not manager.is_authenticated()
+
+def test_cache_round_trip(manager, tmp_path):
+    fernet = pytest.importorskip("cryptography.fernet")
+    cache = TokenCache(str(tmp_path / "token.bin"), fernet.Fernet.generate_key().decode())
+    manager.token_cache = cache
+    manager.run(manager.login("admin", "admin"))
+    assert b"admin" not in (tmp_path / "token.bin").read_bytes()
+
+    restored = LoginManager(identity_url=manager.identity_url, refresh_margin=5)
+    restored.token_cache = cache
+    assert restored.load_cached_token()
+    assert restored.get_token() == manager.get_token() and restored.username == "admin"
+
+    # no password cached: the token can not be refreshed, a login is asked ahead of its expiry
+    assert not restored.needs_login()
+    restored.expires_at = time.time() + 2
+    assert restored.is_authenticated() and restored.needs_login()
+
+def test_expired_cached_token_is_dropped(manager, tmp_path):
+    fernet = pytest.importorskip("cryptography.fernet")
+    cache = TokenCache(str(tmp_path / "token.bin"), fernet.Fernet.generate_key().decode())
+    cache.save({"username": "admin", "token": identity_stub.issue_token("admin")})
+    manager.token_cache = cache
+    manager.refresh_margin = 60   # longer than the 30s token
+
+    assert not manager.load_cached_token()
+    assert cache.load() is None
@@ -0,0 +1,17 @@
+import pytest
+
+import models
+
+def test_missing_model_id_fails_clearly(monkeypatch):
+    monkeypatch.setattr(models, "MODEL_TIERS", {"default": None, "lite": None})
+    with pytest.raises(ValueError, match="MODEL_ID is not set"):
+        models.get_model()
+
+def test_unknown_tier():
+    with pytest.raises(ValueError, match="Invalid model tier"):
+        models.get_model("premium")
+
+def test_tiers_with_the_same_model_share_it(monkeypatch):
+    monkeypatch.setattr(models, "MODEL_TIERS", {"default": "test-model", "lite": "test-model"})
+    monkeypatch.setattr(models, "_models", {})
+    assert models.get_model("default") is models.get_model("lite")
@@ -0,0 +1,88 @@
+import json
+import asyncio
+
+import pytest
+
+from strands import Agent
+from strands.models.model import Model
+from strands.session.file_session_manager import FileSessionManager
+
+import orchestrator
+
+from deadline import Deadline, DeadlineModel, timeout_response
+from structured_response import render
+
+class StubModel(Model):
+    """Answer "ok", after a delay (the first calls) to exceed the turn deadline."""
+
+    def __init__(self, delays=()):
+        self.delays = list(delays)
+        self.config = {"model_id": "stub"}
+
+    def update_config(self, **model_config) -> None:
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": "ok"}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        yield {"output": output_model()}
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    model = StubModel(delays=[5])
+    monkeypatch.setattr(orchestrator, "get_model", lambda tier="default": model)
+    return model
+
+def roles(messages):
+    return [m["role"] for m in messages]
+
+def test_turn_after_a_timeout_starts_on_a_valid_history(stub_model, tmp_path):
+    session_manager = FileSessionManager(session_id="s-1", storage_dir=str(tmp_path))
+    agent = Agent(model=DeadlineModel(stub_model), session_manager=session_manager, callback_handler=None)
+
+    response = orchestrator.run_turn(agent, "hi", mode="nested", timeout=0.2, token="token", session_id="s-1")
+    assert json.loads(response)["error_code"] == "DEADLINE_EXCEEDED"
+    assert roles(agent.messages) == ["user", "assistant"]
+
+    assert orchestrator.run_turn(agent, "hi again", mode="nested", timeout=5, token="token", session_id="s-1") == "ok\n"
+    assert roles(agent.messages) == ["user", "assistant", "user", "assistant"]
+
+    # the saved session has the same (alternating) history
+    restored = Agent(model=StubModel(), session_manager=FileSessionManager(session_id="s-1", storage_dir=str(tmp_path)),
+                     callback_handler=None)
+    assert roles(restored.messages) == ["user", "assistant", "user", "assistant"]
+
+def test_unanswered_tool_use_is_closed():
+    agent = Agent(model=StubModel(), callback_handler=None)
+    agent.messages.extend([
+        {"role": "user", "content": [{"text": "get A-1"}]},
+        {"role": "assistant", "content": [{"toolUse": {"toolUseId": "t-1", "name": "get_product", "input": {}}}]},
+    ])
+    orchestrator.close_failed_turn(agent, 0, "cancelled")
+
+    assert roles(agent.messages) == ["user", "assistant", "user", "assistant"]
+    assert agent.messages[2]["content"][0]["toolResult"]["toolUseId"] == "t-1"
+    assert agent.messages[2]["content"][0]["toolResult"]["status"] == "error"
+
+def test_completed_turn_is_left_as_is():
+    agent = Agent(model=StubModel(), callback_handler=None)
+    agent.messages.extend([
+        {"role": "user", "content": [{"text": "hi"}]},
+        {"role": "assistant", "content": [{"text": "ok"}]},
+    ])
+    orchestrator.close_failed_turn(agent, 0, "cancelled")
+    orchestrator.close_failed_turn(agent, 2, "cancelled")
+    assert roles(agent.messages) == ["user", "assistant"]
+
+def test_timeout_uses_the_error_envelope():
+    response = json.loads(timeout_response(Deadline(3), "main agent"))
+    assert set(response) == {"status", "error_code", "message"}
+    assert render(response) == f"Error (DEADLINE_EXCEEDED): {response['message']}"
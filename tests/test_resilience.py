@@ -0,0 +1,264 @@
+import time
+import asyncio
+
+import pytest
+
+import resilience
+
+from deadline import Deadline
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, ResilientMCPTool, is_session_error
+
+TOOL_SPEC = {
+    "name": "get_product",
+    "description": "get a product",
+    "inputSchema": {"json": {
+        "type": "object",
+        "properties": {"sku": {"type": "string"}, "jwt": {"type": "string"}, "x-request-id": {"type": "string"}},
+        "required": ["sku", "jwt"],
+    }},
+}
+
+def success(tool_use, text="ok"):
+    return {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": text}]}
+
+def failure(tool_use, text="Tool execution failed: 503 unavailable"):
+    return {"toolUseId": tool_use["toolUseId"], "status": "error", "content": [{"text": text}]}
+
+class FakeTool:
+    """MCP tool answering the results queued (or raising the exceptions), recording the calls."""
+
+    def __init__(self, name="get_product", results=(), delay=0.0):
+        self.tool_name = name
+        self.tool_spec = dict(TOOL_SPEC, name=name)
+        self.tool_type = "python"
+        self.results = list(results)
+        self.delay = delay
+        self.calls = []
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        self.calls.append(tool_use)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        result = self.results.pop(0) if self.results else success
+        if isinstance(result, Exception):
+            raise result
+        yield result(tool_use)
+
+def wrap(tool, breaker=None):
+    return ResilientMCPTool(tool, breaker or CircuitBreaker("test", failure_threshold=3, reset_timeout=30), LatencyTracker())
+
+def call(wrapper, invocation_state=None, arguments=None):
+    tool_use = {"toolUseId": "t-1", "name": wrapper.tool_name, "input": arguments or {"sku": "A-1"}}
+    return asyncio.run(wrapper.call(tool_use, {"jwt": "token", **(invocation_state or {})}))
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.0)
+
+# circuit breaker
+
+def test_breaker_opens_after_the_failure_threshold():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+def test_breaker_success_resets_the_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31
+
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+
+def test_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=30)
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = time.monotonic() - 31
+
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+def test_breaker_release_frees_the_trial_without_closing():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31
+
+    breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()
+
+# resilient tool
+
+def test_context_fields_hidden_from_the_model_and_added_to_the_call():
+    tool = FakeTool()
+    wrapper = wrap(tool)
+    schema = wrapper.tool_spec["inputSchema"]["json"]
+    assert set(schema["properties"]) == {"sku"}
+    assert schema["required"] == ["sku"]
+
+    call(wrapper)
+    sent = tool.calls[0]["input"]
+    assert sent["sku"] == "A-1"
+    assert sent["jwt"] == "token"
+    assert sent["x-request-id"]
+    assert "_trace" not in sent  # not declared by the tool
+
+def test_read_tool_retried_on_a_transient_failure():
+    tool = FakeTool(results=[failure, failure, success])
+    result = call(wrap(tool))
+    assert result["status"] == "success"
+    assert len(tool.calls) == 3
+
+def test_read_tool_gives_up_after_the_attempts(monkeypatch):
+    monkeypatch.setattr(resilience, "MCP_RETRY_ATTEMPTS", 2)
+    tool = FakeTool(results=[failure, failure, success])
+    result = call(wrap(tool))
+    assert result["status"] == "error"
+    assert len(tool.calls) == 2
+
+def test_write_tool_never_replayed():
+    tool = FakeTool(name="create_order", results=[failure, success])
+    result = call(wrap(tool))
+    assert result["status"] == "error"
+    assert len(tool.calls) == 1
+
+def test_tool_error_not_retried():
+    tool = FakeTool(results=[lambda tool_use: failure(tool_use, "product not found"), success])
+    result = call(wrap(tool))
+    assert result["content"][0]["text"] == "product not found"
+    assert len(tool.calls) == 1
+
+def test_validation_error_not_retried():
+    tool = FakeTool(results=[lambda tool_use: failure(tool_use, "Tool execution failed: validation error, sku is required"), success])
+    result = call(wrap(tool))
+    assert result["status"] == "error"
+    assert len(tool.calls) == 1
+
+def test_transport_exception_retried():
+    tool = FakeTool(results=[ConnectionError("connection refused"), success])
+    result = call(wrap(tool))
+    assert result["status"] == "success"
+    assert len(tool.calls) == 2
+
+def test_exception_becomes_an_error_result():
+    tool = FakeTool(name="create_order", results=[RuntimeError("boom")])
+    result = call(wrap(tool))
+    assert result["status"] == "error"
+    assert "boom" in result["content"][0]["text"]
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    tool = FakeTool()
+    result = call(wrap(tool, breaker))
+    assert result["status"] == "error"
+    assert "Circuit breaker open" in result["content"][0]["text"]
+    assert tool.calls == []
+
+def test_failures_open_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    tool = FakeTool(results=[failure] * 3)
+    call(wrap(tool, breaker))
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_attempt_timeout_counts_as_a_failure(monkeypatch):
+    monkeypatch.setattr(resilience, "MCP_CALL_TIMEOUT", 0.05)
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=30)
+    tool = FakeTool(name="create_order", delay=1.0)
+    result = call(wrap(tool, breaker))
+    assert "timed out" in result["content"][0]["text"]
+    assert breaker.failures == 1
+
+def test_attempt_timeout_cancels_the_unhedged_call(monkeypatch):
+    monkeypatch.setattr(resilience, "MCP_HEDGE_ENABLED", True)
+    monkeypatch.setattr(resilience, "MCP_HEDGE_DELAY", 10.0)
+    monkeypatch.setattr(resilience, "MCP_CALL_TIMEOUT", 0.05)
+    monkeypatch.setattr(resilience, "MCP_RETRY_ATTEMPTS", 1)
+    cancelled = []
+
+    class SlowTool(FakeTool):
+        async def stream(self, tool_use, invocation_state, **kwargs):
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled.append(tool_use["toolUseId"])
+                raise
+            yield success(tool_use)
+
+    async def run():
+        tool_use = {"toolUseId": "t-1", "name": "get_product", "input": {"sku": "A-1"}}
+        result = await wrap(SlowTool()).call(tool_use, {"jwt": "token"})
+        await asyncio.sleep(0.01)
+        return result, list(cancelled)  # before the loop shutdown cancels the leftover tasks
+
+    result, cancelled_in_loop = asyncio.run(run())
+    assert "timed out" in result["content"][0]["text"]
+    # the primary call is not left running after the attempt timed out before the hedge
+    assert cancelled_in_loop == ["t-1"]
+
+def test_expired_deadline_does_not_call_the_tool():
+    deadline = Deadline(10)
+    deadline.cancel()
+    tool = FakeTool()
+    result = call(wrap(tool), {"deadline": deadline})
+    assert result["status"] == "error"
+    assert "Deadline" in result["content"][0]["text"]
+    assert tool.calls == []
+
+def test_deadline_expiring_during_the_call_spares_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    tool = FakeTool(delay=1.0)
+    result = call(wrap(tool, breaker), {"deadline": Deadline(0.05)})
+    assert "Deadline" in result["content"][0]["text"]
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    assert len(tool.calls) == 1
+
+def test_retry_stops_when_the_deadline_cannot_cover_the_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 5.0)
+    tool = FakeTool(results=[failure, success])
+    result = call(wrap(tool), {"deadline": Deadline(1)})
+    assert result["status"] == "error"
+    assert len(tool.calls) == 1
+
+def test_session_errors():
+    assert is_session_error(ConnectionError("reset"))
+    assert is_session_error(RuntimeError("the client session is not running"))
+    assert is_session_error({"status": "error", "content": [{"text": "ClosedResourceError"}]})
+    assert not is_session_error(ValueError("invalid sku"))
+    assert not is_session_error({"status": "error", "content": [{"text": "product not found"}]})
+    assert not is_session_error({"status": "success", "content": [{"text": "connection closed"}]})
+
+def test_latency_p95_needs_enough_samples():
+    latency = LatencyTracker(size=100, min_samples=20)
+    for i in range(19):
+        latency.add(i)
+    assert latency.p95() is None
+    for i in range(19, 100):
+        latency.add(i)
+    assert latency.p95() == 94
@@ -0,0 +1,111 @@
+import time
+import asyncio
+
+import pytest
+
+from scheduler import TokenBucket, Scheduler, OverloadedError, PRIORITY_IN_PROGRESS, PRIORITY_NEW
+
+def test_bucket_without_rate_never_waits():
+    bucket = TokenBucket(0)
+    bucket.take(1000)
+    assert bucket.wait_time(1000, time.monotonic()) == 0.0
+
+def test_bucket_starts_full_and_refills_at_the_rate():
+    bucket = TokenBucket(60)  # one per second
+    now = time.monotonic()
+    assert bucket.wait_time(60, now) == 0.0
+
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0, abs=0.01)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0, abs=0.01)
+
+def test_bucket_refill_is_capped_at_the_capacity():
+    bucket = TokenBucket(60)
+    bucket.updated -= 3600
+    bucket.wait_time(1, time.monotonic())
+    assert bucket.tokens == 60
+
+def test_bucket_call_larger_than_the_burst_waits_for_a_full_bucket():
+    bucket = TokenBucket(60)
+    now = time.monotonic()
+    assert bucket.wait_time(1000, now) == 0.0
+    bucket.take(1000)
+    assert bucket.tokens == pytest.approx(0.0, abs=0.01)
+
+def test_bucket_adjust_and_drain():
+    bucket = TokenBucket(600)
+    bucket.take(100)
+    bucket.adjust(-50)  # used 50 less than estimated
+    assert bucket.tokens == pytest.approx(550, abs=1)
+    bucket.adjust(-1000)
+    assert bucket.tokens == 600
+    bucket.drain()
+    assert bucket.tokens == 0.0
+
+def test_disabled_scheduler_admits_immediately():
+    scheduler = Scheduler("test", rpm=0, tpm=0)
+    assert asyncio.run(scheduler.acquire(10, PRIORITY_NEW)) == 0.0
+
+def test_acquire_takes_from_both_buckets():
+    scheduler = Scheduler("test", rpm=60, tpm=6000)
+    asyncio.run(scheduler.acquire(1000, PRIORITY_NEW))
+    assert scheduler.requests.tokens == pytest.approx(59, abs=0.1)
+    assert scheduler.tokens.tokens == pytest.approx(5000, abs=1)
+    assert scheduler.depth() == 0
+
+def test_settle_replaces_the_estimate():
+    scheduler = Scheduler("test", rpm=0, tpm=6000)
+    asyncio.run(scheduler.acquire(1000, PRIORITY_NEW))
+    scheduler.settle(1000, 200)
+    assert scheduler.tokens.tokens == pytest.approx(5800, abs=1)
+
+def test_new_turn_rejected_when_the_queue_is_full():
+    scheduler = Scheduler("test", rpm=60, tpm=0, max_queue=0)
+    with pytest.raises(OverloadedError):
+        asyncio.run(scheduler.acquire(10, PRIORITY_NEW))
+    assert scheduler.depth() == 0
+
+def test_turn_in_progress_never_rejected_by_the_queue_size():
+    scheduler = Scheduler("test", rpm=60, tpm=0, max_queue=0)
+    asyncio.run(scheduler.acquire(10, PRIORITY_IN_PROGRESS))
+
+def test_new_turn_rejected_when_the_wait_exceeds_its_budget():
+    scheduler = Scheduler("test", rpm=1, tpm=0)
+    asyncio.run(scheduler.acquire(10, PRIORITY_NEW))
+    # the next request is a minute away
+    with pytest.raises(OverloadedError):
+        asyncio.run(scheduler.acquire(10, PRIORITY_NEW, max_wait=1))
+    assert scheduler.depth() == 0
+
+def test_throttling_pauses_the_admissions(monkeypatch):
+    import scheduler as scheduler_module
+    monkeypatch.setattr(scheduler_module, "SCHEDULER_THROTTLE_PAUSE", 0.2)
+    scheduler = Scheduler("test", rpm=600, tpm=0)
+    scheduler.throttled()
+
+    with pytest.raises(OverloadedError):
+        asyncio.run(scheduler.acquire(10, PRIORITY_NEW, max_wait=0.05))
+
+    scheduler.requests.tokens = scheduler.requests.capacity
+    scheduler.requests.updated = time.monotonic()
+    wait = asyncio.run(scheduler.acquire(10, PRIORITY_NEW, max_wait=5))
+    assert 0.1 < wait < 1.0
+
+def test_turns_in_progress_admitted_before_new_turns():
+    scheduler = Scheduler("test", rpm=600, tpm=0)  # one request every 0.1s once drained
+    scheduler.requests.drain()
+    order = []
+
+    async def call(name, priority, delay):
+        await asyncio.sleep(delay)
+        await scheduler.acquire(10, priority, max_wait=5)
+        order.append(name)
+
+    async def run():
+        await asyncio.gather(call("new-1", PRIORITY_NEW, 0),
+                             call("new-2", PRIORITY_NEW, 0.01),
+                             call("in-progress", PRIORITY_IN_PROGRESS, 0.02))
+
+    asyncio.run(run())
+    # new-1 is at the head (waiting for the bucket) when the in progress call arrives
+    assert order.index("in-progress") < order.index("new-2")
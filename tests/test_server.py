@@ -0,0 +1,130 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+from aiohttp import web, ClientSession
+from aiohttp.test_utils import TestServer, TestClient
+
+import server
+
+from dev.identity_stub import b64, issue_token
+from server import Router, Worker, owned_session, session_owner, worker_index
+
+def token_with(**claims) -> str:
+    return f"{b64({'alg': 'none'})}.{b64(claims)}.stub"
+
+# sticky routing and session ownership
+
+def test_worker_index_is_stable_and_in_range():
+    assert worker_index("eliezer-001", 4) == worker_index("eliezer-001", 4)
+    indexes = {worker_index(f"session-{i}", 4) for i in range(200)}
+    assert indexes == {0, 1, 2, 3}
+
+def test_session_owner():
+    assert session_owner(issue_token("admin")) == "admin"
+    assert session_owner(token_with(username="bob", exp=time.time() + 60)) == "bob"
+    assert session_owner(token_with(sub="admin", exp=time.time() - 1)) is None   # expired
+    assert session_owner(token_with(exp=time.time() + 60)) is None               # no owner claim
+    assert session_owner("") is None
+
+def test_owned_session_is_namespaced_by_its_owner():
+    assert owned_session("admin", "s-1") == owned_session("admin", "s-1")
+    assert owned_session("admin", "s-1") != owned_session("bob", "s-1")
+    assert owned_session("admin", "s-1").startswith("s-1.")
+
+# worker and router errors, in the common envelope
+
+def request(app: web.Application, method: str, path: str, **kwargs):
+    async def run():
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.request(method, path, **kwargs)
+            return resp.status, await resp.json()
+    return asyncio.run(run())
+
+def worker_app(worker: Worker) -> web.Application:
+    app = web.Application()
+    app.router.add_post("/chat", worker.chat)
+    app.router.add_delete("/session/{session_id}", worker.delete_session)
+    return app
+
+AUTH = {"Authorization": f"Bearer {issue_token('admin')}"}
+
+@pytest.mark.parametrize("body, status, message", [
+    ("{not json", 400, "invalid json body"),
+    ("[1, 2]", 400, "the body must be a json object"),
+    ('{"session_id": "s-1", "message": 42}', 400, "Please enter a valid message."),
+    ('{"session_id": 7, "message": "hi"}', 400, "invalid session_id"),
+    ('{"session_id": "bad id!", "message": "hi"}', 400, "invalid session_id"),
+])
+def test_worker_rejects_malformed_bodies(body, status, message):
+    assert request(worker_app(Worker(0)), "POST", "/chat", data=body, headers=AUTH) == (
+        status, {"status": "error", "error_code": "INVALID_REQUEST", "message": message})
+
+def test_worker_requires_a_valid_jwt():
+    status, body = request(worker_app(Worker(0)), "POST", "/chat", json={"session_id": "s-1", "message": "hi"})
+    assert status == 401 and body["error_code"] == "UNAUTHORIZED"
+
+    expired = {"Authorization": f"Bearer {token_with(sub='admin', exp=time.time() - 1)}"}
+    status, body = request(worker_app(Worker(0)), "DELETE", "/session/s-1", headers=expired)
+    assert status == 401 and body["error_code"] == "UNAUTHORIZED"
+
+def test_draining_worker_refuses_the_turns():
+    worker = Worker(0)
+    worker.draining = True
+    status, body = request(worker_app(worker), "POST", "/chat", json={"session_id": "s-1", "message": "hi"}, headers=AUTH)
+    assert status == 503 and body["error_code"] == "WORKER_DRAINING"
+
+@pytest.mark.parametrize("body", ["{not json", "[1]", '{"session_id": null}'])
+def test_router_rejects_malformed_bodies(body):
+    router_app = web.Application()
+    router_app.router.add_post("/chat", Router(2).chat)
+    status, response = request(router_app, "POST", "/chat", data=body)
+    assert status == 400 and response["error_code"] == "INVALID_REQUEST"
+
+# recycle hand-off: the router retries a draining (or restarting) worker
+
+def forward_to(fake_worker: web.Application, monkeypatch):
+    async def run():
+        async with TestServer(fake_worker) as worker_server:
+            monkeypatch.setattr(server, "WORKER_BASE_PORT", worker_server.port)
+            router = Router(1)
+            async with ClientSession() as router.client:
+                resp = await router.forward(0, "POST", "/chat", data=b"{}")
+                return resp.status, json.loads(resp.body)
+    return asyncio.run(run())
+
+def test_router_retries_a_draining_worker(monkeypatch):
+    calls = []
+
+    async def chat(request):
+        calls.append(1)
+        if len(calls) < 3:
+            return server.error_response(503, "WORKER_DRAINING", "restarting")
+        return web.json_response({"session_id": "s-1", "worker": 0, "response": "ok"})
+
+    app = web.Application()
+    app.router.add_post("/chat", chat)
+    assert forward_to(app, monkeypatch) == (200, {"session_id": "s-1", "worker": 0, "response": "ok"})
+    assert len(calls) == 3
+
+def test_router_gives_up_after_the_recycle_window(monkeypatch):
+    monkeypatch.setattr(server, "WORKER_SHUTDOWN_TIMEOUT", 0.1)
+    monkeypatch.setattr(server, "WORKER_START_TIMEOUT", 0.1)
+
+    async def chat(request):
+        return server.error_response(503, "WORKER_DRAINING", "restarting")
+
+    app = web.Application()
+    app.router.add_post("/chat", chat)
+    status, body = forward_to(app, monkeypatch)
+    assert status == 503 and body["error_code"] == "WORKER_UNAVAILABLE"
+
+def test_router_passes_the_worker_errors_through(monkeypatch):
+    async def chat(request):
+        return server.error_response(400, "INVALID_REQUEST", "invalid session_id")
+
+    app = web.Application()
+    app.router.add_post("/chat", chat)
+    assert forward_to(app, monkeypatch) == (400, {"status": "error", "error_code": "INVALID_REQUEST", "message": "invalid session_id"})
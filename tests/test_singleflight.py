@@ -0,0 +1,225 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+import resilience
+
+from singleflight import SingleFlight, LeaderCancelled, call_key, identity
+from resilience import CircuitBreaker, LatencyTracker, ResilientMCPTool
+
+class FakeTool:
+    """MCP tool answering after a delay, recording the calls."""
+
+    def __init__(self, name="get_product", delay=0.0):
+        self.tool_name = name
+        self.tool_spec = {"name": name, "inputSchema": {"json": {"type": "object", "properties": {"sku": {"type": "string"}, "jwt": {"type": "string"}}}}}
+        self.tool_type = "python"
+        self.delay = delay
+        self.calls = []
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        self.calls.append(tool_use)
+        await asyncio.sleep(self.delay)
+        yield {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": "ok"}]}
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.0)
+
+def test_key_ignores_the_request_fields():
+    first = call_key("inventory", "get_product", identity("a"), arguments={"sku": "A-1", "x-request-id": "1", "_trace": {"traceparent": "x"}})
+    second = call_key("inventory", "get_product", identity("a"), arguments={"_trace": {}, "sku": "A-1", "x-request-id": "2"})
+    assert first == second
+
+def test_key_separates_the_callers_and_arguments():
+    key = call_key("inventory", "get_product", identity("a"), arguments={"sku": "A-1"})
+    assert key != call_key("inventory", "get_product", identity("b"), arguments={"sku": "A-1"})
+    assert key != call_key("inventory", "get_product", identity("a"), arguments={"sku": "A-2"})
+    assert "token-a" not in call_key("inventory", identity("token-a"))
+
+def test_concurrent_async_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"sku": "A-1"}
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results == [{"sku": "A-1"}] * 5
+
+def test_followers_get_the_leader_exception():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_follower_takes_over_a_cancelled_leader():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(flight.do_async("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()  # e.g. the request of the leader hit its deadline
+        return await asyncio.gather(*followers), leader.cancelled()
+
+    results, cancelled = asyncio.run(run())
+    assert cancelled
+    # one follower ran the call again, the others shared its result
+    assert len(calls) == 2
+    assert results == [2, 2, 2]
+
+def test_follower_timeout():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.2)
+        return "late"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do_async("key", fetch, timeout=0.05)
+        return await leader
+
+    assert asyncio.run(run()) == "late"
+
+class Interrupted(BaseException):
+    pass
+
+def test_sync_follower_takes_over_an_interrupted_leader():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def interrupted():
+        calls.append("leader")
+        started.set()
+        release.wait(5)
+        raise Interrupted()
+
+    def fetch():
+        calls.append("follower")
+        return "retried"
+
+    def lead():
+        with pytest.raises(Interrupted):
+            flight.do("key", interrupted)
+
+    results = []
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", fetch, timeout=5)))
+    follower.start()
+    time.sleep(0.05)  # the follower waits on the leader
+    release.set()
+    for t in (leader, follower):
+        t.join(5)
+
+    assert calls == ["leader", "follower"]
+    assert results == ["retried"]
+
+def test_leader_exception_is_shared_not_retried():
+    flight = SingleFlight("test")
+    future, _ = flight._join("key")
+    flight._finish("key", future, error=RuntimeError("upstream down"))
+    with pytest.raises(RuntimeError):
+        future.result()
+
+    future, _ = flight._join("key")
+    flight._finish("key", future, error=Interrupted())
+    with pytest.raises(LeaderCancelled):
+        future.result()
+    assert "key" not in flight._calls
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("key", fetch) == 1
+    assert flight.do("key", fetch) == 2
+
+def test_sync_calls_across_threads_share_one_execution():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", fetch, timeout=5))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == ["done"] * 4
+
+def read_concurrently(tool, tokens):
+    wrapper = ResilientMCPTool(tool, CircuitBreaker("test"), LatencyTracker())
+
+    async def read(number, token):
+        tool_use = {"toolUseId": f"t-{number}", "name": tool.tool_name, "input": {"sku": "A-1"}}
+        return [e async for e in wrapper.stream(tool_use, {"jwt": token})][-1]
+
+    async def run():
+        return await asyncio.gather(*(read(n, token) for n, token in enumerate(tokens)))
+
+    return asyncio.run(run())
+
+def test_identical_reads_fan_out_one_upstream_call():
+    tool = FakeTool(delay=0.05)
+    results = read_concurrently(tool, ["token"] * 4)
+    assert len(tool.calls) == 1
+    # every waiter gets the result under its own toolUseId
+    assert [r["toolUseId"] for r in results] == ["t-0", "t-1", "t-2", "t-3"]
+    assert all(r["status"] == "success" for r in results)
+
+def test_reads_of_different_callers_are_not_shared():
+    tool = FakeTool(delay=0.05)
+    read_concurrently(tool, ["token-a", "token-b"])
+    assert len(tool.calls) == 2
+
+def test_writes_are_never_coalesced():
+    tool = FakeTool(name="create_order", delay=0.05)
+    read_concurrently(tool, ["token"] * 2)
+    assert len(tool.calls) == 2
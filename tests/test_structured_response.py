@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from pydantic import ValidationError
+
+from structured_response import SubAgentAnswer, TurnRender, build_response, error_envelope, render, try_render
+
+PRODUCT = {"sku": "milk-01", "name": "milk 01", "type": "beverage"}
+
+def tool_result(payload, status="success"):
+    return {"toolUseId": "t-1", "status": status, "content": [{"text": json.dumps(payload)}]}
+
+def test_answer_schema_has_no_data():
+    schema = SubAgentAnswer.model_json_schema()
+    assert set(schema["properties"]) == {"status", "kind", "message", "error_code"}
+    assert schema["required"] == ["status"]
+
+@pytest.mark.parametrize("fields", [{"status": "done"}, {"status": "success", "kind": "customer"}, {"kind": "product"}])
+def test_invalid_answers(fields):
+    with pytest.raises(ValidationError):
+        SubAgentAnswer.model_validate(fields)
+
+def test_data_taken_from_the_tool_result():
+    answer = SubAgentAnswer(status="success", kind="product", message="Here is the product")
+    response = build_response(answer, tool_result(PRODUCT))
+    assert response.data == PRODUCT
+    assert response.model_dump(exclude_none=True) == {"status": "success", "kind": "product", "message": "Here is the product", "data": PRODUCT}
+
+def test_structured_content_preferred():
+    result = dict(tool_result({"stale": True}), structuredContent=PRODUCT)
+    assert build_response(SubAgentAnswer(status="success", kind="product"), result).data == PRODUCT
+
+def test_no_data_without_a_successful_tool_result():
+    assert build_response(SubAgentAnswer(status="success", kind="message", message="hi")).data is None
+    assert build_response(SubAgentAnswer(status="success", kind="product"), tool_result("not found", "error")).data is None
+    error = SubAgentAnswer(status="error", error_code="NOT_FOUND", message="product not found")
+    assert build_response(error, tool_result(PRODUCT)).data is None
+
+def test_render_a_product():
+    text = render({"status": "success", "kind": "product", "data": {"sku": "milk-01", "tags": ["a"], "stock": {"available": 3}}})
+    assert text.splitlines() == ["Product details:", "- sku: milk-01", "- tags:", "  - a", "- stock:", "  - available: 3"]
+
+def test_render_uses_the_message_as_title():
+    text = render({"status": "success", "kind": "order", "message": "Order created", "data": [{"id": 95}]})
+    assert text.splitlines() == ["Order created", "-", "  - id: 95"]
+
+def test_render_errors_and_messages():
+    assert render(json.loads(error_envelope("NOT_FOUND", "product not found"))) == "Error (NOT_FOUND): product not found"
+    assert render({"status": "success", "kind": "message", "message": "done"}) == "done"
+
+@pytest.mark.parametrize("response", [
+    {"status": "error", "message": "no error code"},
+    {"status": "success", "kind": "product", "data": {}},
+    {"status": "success", "kind": "product", "data": "text"},
+    {"status": "success", "kind": "unknown", "data": PRODUCT},
+    "not a dict",
+])
+def test_not_rendered(response):
+    assert render(response) is None
+
+class FakeAgent:
+    def __init__(self, tool_uses=1):
+        self.messages = [{"role": "assistant", "content": [{"toolUse": {"toolUseId": f"t-{i}"}} for i in range(tool_uses)]}]
+
+def response_text():
+    return json.dumps({"status": "success", "kind": "product", "data": PRODUCT})
+
+def test_single_tool_call_ends_the_turn():
+    state = {"render": TurnRender()}
+    try_render(state, FakeAgent(), response_text())
+    assert state["render"].text.startswith("Product details:")
+    assert state["request_state"]["stop_event_loop"]
+
+def test_several_tool_calls_need_the_main_agent():
+    state = {"render": TurnRender()}
+    try_render(state, FakeAgent(tool_uses=2), response_text())
+    assert state["render"].text is None and "request_state" not in state
+
+def test_generate_mode_never_renders():
+    state = {}
+    try_render(state, FakeAgent(), response_text())
+    assert state == {}
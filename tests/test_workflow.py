@@ -0,0 +1,137 @@
+import json
+import asyncio
+import logging
+
+import pytest
+
+import workflow
+
+from workflow import WorkflowRun, WorkflowRegistry, WorkflowSpec, Step, Compensation, StepFailed, check_arguments
+from workflows import CheckoutParams, Payment, order_id, enough_inventory
+
+class FakeTool:
+    """MCP tool answering a fixed payload (or an error), recording the calls."""
+
+    def __init__(self, name, properties, required=None, response=None, error=None):
+        self.tool_name = name
+        self.tool_spec = {"name": name, "inputSchema": {"json": {"type": "object", "properties": {p: {} for p in properties},
+                                                                 "required": list(required or properties)}}}
+        self.response = response
+        self.error = error
+        self.calls = []
+
+    async def call(self, tool_use, invocation_state, **kwargs):
+        self.calls.append(tool_use["input"])
+        if self.error:
+            return {"toolUseId": tool_use["toolUseId"], "status": "error", "content": [{"text": self.error}]}
+        return {"toolUseId": tool_use["toolUseId"], "status": "success", "content": [{"text": json.dumps(self.response)}]}
+
+def order_tools():
+    return {
+        "get_product": FakeTool("get_product", ["sku"], response={"sku": "A-1", "name": "pen"}),
+        "get_inventory": FakeTool("get_inventory", ["sku"], response={"sku": "A-1", "available": 10}),
+        "create_order": FakeTool("create_order", ["user_id", "address", "sku", "quantity", "currency", "price"],
+                                 response={"id": 95, "status": "PENDING"}),
+        "checkout_order": FakeTool("checkout_order", ["id", "payment"], response={"id": 95, "status": "CHECKOUT"}),
+        "cancel_order": FakeTool("cancel_order", ["id"], response={"id": 95, "status": "CANCELLED"}),
+    }
+
+@pytest.fixture
+def tools(monkeypatch):
+    catalog = order_tools()
+    monkeypatch.setattr(workflow, "available_tools", lambda agent, compensation=False: list(catalog.values()))
+    return catalog
+
+def checkout_spec(cancel_tool=None):
+    """The checkout workflow, with or without the cancel compensation."""
+    spec = next(s for s in workflow.workflow_registry.specs() if s.name == "checkout_workflow")
+    steps = []
+    for step in spec.steps:
+        if step.name == "order":
+            step = Step(name=step.name, agent=step.agent, tool=step.tool, build_input=step.build_input,
+                        depends_on=step.depends_on, created=order_id,
+                        compensate=Compensation(tool=cancel_tool, build_input=lambda c: {"id": order_id(c)}) if cancel_tool else None)
+        steps.append(step)
+    return WorkflowSpec(name=spec.name, description=spec.description, parameters=spec.parameters, steps=steps, kind=spec.kind)
+
+def params(quantity=2):
+    return CheckoutParams(user_id="ELIEZER", address="RUE DE TEMPLE", sku="A-1", quantity=quantity, currency="USD",
+                          price=9, payments=[Payment(type="CASH", currency="USD", amount=18)])
+
+def run(spec, quantity=2):
+    return asyncio.run(WorkflowRun(spec, params(quantity), {}).run())
+
+def test_checkout_runs_every_step(tools):
+    result = run(checkout_spec())
+    assert result["status"] == "success"
+    assert result["data"] == {"id": 95, "status": "CHECKOUT"}
+    assert tools["checkout_order"].calls == [{"id": 95, "payment": [{"type": "CASH", "currency": "USD", "amount": 18.0}]}]
+
+def test_failed_check_stops_before_the_order(tools):
+    result = run(checkout_spec(), quantity=50)
+    assert result["status"] == "error" and result["error_code"] == "WORKFLOW_FAILED"
+    assert "insufficient inventory" in result["message"]
+    assert tools["create_order"].calls == []
+
+def test_failed_checkout_cancels_the_order(tools):
+    tools["checkout_order"].error = "payment refused"
+    result = run(checkout_spec(cancel_tool="cancel_order"))
+    assert result["status"] == "error" and "payment refused" in result["message"]
+    assert result["data"]["compensations"] == {"order": "compensated"}
+    assert tools["cancel_order"].calls == [{"id": 95}]
+
+def test_failed_checkout_without_compensation_reports_the_order(tools):
+    tools["checkout_order"].error = "payment refused"
+    result = run(checkout_spec())
+    assert result["data"]["compensations"] == {"order": "not compensated (no compensation tool): create_order id 95"}
+    assert tools["cancel_order"].calls == []
+
+def test_failed_compensation_reports_the_order(tools):
+    tools["checkout_order"].error = "payment refused"
+    tools["cancel_order"].error = "order already paid"
+    result = run(checkout_spec(cancel_tool="cancel_order"))
+    compensation = result["data"]["compensations"]["order"]
+    assert "order already paid" in compensation and "create_order id 95" in compensation
+
+def test_order_without_id_fails_with_the_raw_response(tools):
+    tools["create_order"].response = {"order_id": 95}
+    result = run(checkout_spec(cancel_tool="cancel_order"))
+    assert "create_order returned no order id" in result["message"]
+    assert tools["checkout_order"].calls == [] and tools["cancel_order"].calls == []
+    # the raw response is reported so the order can still be found
+    assert '"order_id": 95' in result["data"]["compensations"]["order"]
+
+def test_arguments_checked_against_the_input_schema(tools):
+    tools["create_order"].tool_spec["inputSchema"]["json"]["properties"]["customer"] = {}
+    tools["create_order"].tool_spec["inputSchema"]["json"]["required"].append("customer")
+    result = run(checkout_spec())
+    assert "do not match its input schema: missing ['customer']" in result["message"]
+    assert tools["create_order"].calls == []
+
+def test_check_arguments():
+    spec = {"name": "get_order", "inputSchema": {"json": {"properties": {"id": {}}, "required": ["id"]}}}
+    check_arguments(spec, {"id": 1})
+    with pytest.raises(StepFailed, match=r"unknown \['order_id'\]"):
+        check_arguments(spec, {"id": 1, "order_id": 1})
+    check_arguments({"name": "x", "inputSchema": {"json": {}}}, {"anything": 1})
+
+def test_enough_inventory():
+    context = {"params": params(quantity=5)}
+    assert enough_inventory(context, {"available": 5}) is None
+    assert enough_inventory(context, {}) is None
+    assert "available 4" in enough_inventory(context, {"available": 4})
+
+def test_missing_compensation_tool_is_only_a_warning(monkeypatch, caplog):
+    catalog = order_tools()
+    del catalog["cancel_order"]
+    monkeypatch.setattr(workflow, "available_tools", lambda agent, compensation=False: list(catalog.values()))
+
+    registry = WorkflowRegistry()
+    registry.register(checkout_spec(cancel_tool="cancel_order"))
+    with caplog.at_level(logging.WARNING, logger="workflow"):
+        registry.check_tools()
+    assert "cancel_order" in caplog.text
+
+    del catalog["checkout_order"]
+    with pytest.raises(RuntimeError, match="checkout_order"):
+        registry.check_tools()